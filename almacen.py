@@ -0,0 +1,303 @@
+import argparse
+import bisect
+import io
+import json
+import os
+import re
+import struct
+import sys
+from functools import lru_cache
+
+try:
+    import zstandard
+    ZSTD_DISPONIBLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_DISPONIBLE = False
+
+EXTENSION_COMPRIMIDA = ".zst"
+# Los .gbw quedan sin comprimir: ORCA los lee directamente con MORead y al reiniciar un trabajo guardado
+COMPRIMIBLES = (".out", ".hess", ".densities", ".xyz", ".engrad", ".property.txt")
+TAMANO_CUADRO = 1 << 20
+NIVEL_COMPRESION = 10
+
+# Formato "seekable" de zstd: cuadros independientes y una tabla de busqueda en un cuadro saltable al final
+MAGIA_TABLA = 0x184D2A5E
+MAGIA_INDICE = 0x184D2A50
+MAGIA_SEEKABLE = 0x8F92EAB1
+
+# Lineas sueltas de la salida que leen los extractores de una sola linea (energias, convergencia, SCF, tiempos):
+# se guardan en el indice para no recorrer el archivo entero. Subir VERSION_INDICE al cambiar la lista
+VERSION_INDICE = 2
+PATRONES_MARCA = {
+    ".out": re.compile(
+        rb'^(?:\|[ \t]*\d+>|[^\n]*(?:FINAL SINGLE POINT ENERGY|GEOMETRY OPTIMIZATION CYCLE'
+        rb'|OPTIMIZATION HAS CONVERGED|FINAL ENERGY EVALUATION AT THE STATIONARY POINT|SCF CONVERGED AFTER'
+        rb'|SCF NOT CONVERGED|ORCA TERMINATED NORMALLY|TOTAL RUN TIME|JOB NUMBER|Total Energy +:|Last Energy change'
+        rb'|Multiplicity +Mult|Number of basis functions'
+        rb'|Nuclear Repulsion +:|Electronic Energy +:|One Electron Energy|Two Electron Energy|Total Dipole Moment'
+        rb'|Rotational constants in cm-1|Symmetry Number|THERMOCHEMISTRY AT|Zero point energy|Total thermal energy'
+        rb'|Total thermal correction|Total Enthalpy|Final entropy term|Final Gibbs free energy|G-E\(el\)'
+        rb'|Timings for individual modules|sec \(=))[^\n]*', re.MULTILINE),
+}
+
+PATRONES_SECCION = {
+    ".out": re.compile(rb'\n([-*])\1{4,}\r?\n[ \t]*([A-Z][^\n]{2,80}?)[ \t]*\r?\n\1{5,}\r?\n'),
+    ".hess": re.compile(rb'\n()\$(\w+)'),
+    ".xyz": re.compile(rb'(?:^|\n)()[ \t]*(\d+)[ \t]*\r?\n'),
+}
+
+
+def ruta_comprimida(ruta):
+    return ruta + EXTENSION_COMPRIMIDA
+
+
+def resolver_artefacto(ruta):
+    if os.path.exists(ruta):
+        return ruta
+    if os.path.exists(ruta_comprimida(ruta)):
+        return ruta_comprimida(ruta)
+    return None
+
+
+def ruta_logica(ruta):
+    return ruta[:-len(EXTENSION_COMPRIMIDA)] if ruta.endswith(EXTENSION_COMPRIMIDA) else ruta
+
+
+def _extension(ruta):
+    ruta = ruta_logica(ruta)
+    if ruta.endswith("_trj.xyz"):
+        return ".xyz"
+    return os.path.splitext(ruta)[1].lower()
+
+
+def indexar_secciones(datos, extension):
+    patron = PATRONES_SECCION.get(extension)
+    if patron is None:
+        return []
+    secciones = []
+    for coincidencia in patron.finditer(datos):
+        inicio = coincidencia.start() + (1 if datos[coincidencia.start():coincidencia.start() + 1] == b"\n" else 0)
+        titulo = coincidencia.group(2).decode("utf-8", errors="ignore").strip()
+        secciones.append([titulo, inicio])
+    return secciones
+
+
+def indexar_artefacto(datos, extension):
+    indice = {"version": VERSION_INDICE, "secciones": indexar_secciones(datos, extension)}
+    patron = PATRONES_MARCA.get(extension)
+    if patron is not None:
+        indice["marcas"] = [m.group(0).rstrip(b"\r").decode("utf-8", errors="ignore") for m in patron.finditer(datos)]
+    return indice
+
+
+def comprimir_archivo(ruta, nivel=NIVEL_COMPRESION, tamano_cuadro=TAMANO_CUADRO, eliminar_original=True):
+    if not ZSTD_DISPONIBLE:
+        raise ImportError("La compresion de artefactos requiere el paquete 'zstandard' (pip install zstandard)")
+
+    with open(ruta, "rb") as f:
+        datos = f.read()
+
+    compresor = zstandard.ZstdCompressor(level=nivel)
+    destino = ruta_comprimida(ruta)
+    entradas = []
+    with open(destino + ".parcial", "wb") as f:
+        for inicio in range(0, len(datos), tamano_cuadro):
+            bloque = datos[inicio:inicio + tamano_cuadro]
+            cuadro = compresor.compress(bloque)
+            f.write(cuadro)
+            entradas.append((len(cuadro), len(bloque)))
+
+        # El indice de secciones va en un cuadro saltable propio (0 bytes descomprimidos en la tabla)
+        indice = json.dumps(indexar_artefacto(datos, _extension(ruta))).encode("utf-8")
+        cuadro_indice = struct.pack("<II", MAGIA_INDICE, len(indice)) + indice
+        f.write(cuadro_indice)
+        entradas.append((len(cuadro_indice), 0))
+
+        tabla = b"".join(struct.pack("<II", c, d) for c, d in entradas)
+        tabla += struct.pack("<IBI", len(entradas), 0, MAGIA_SEEKABLE)
+        f.write(struct.pack("<II", MAGIA_TABLA, len(tabla)) + tabla)
+
+    os.replace(destino + ".parcial", destino)
+    estado = os.stat(ruta)
+    os.utime(destino, (estado.st_atime, estado.st_mtime))
+    if eliminar_original:
+        os.remove(ruta)
+    return destino
+
+
+class LectorSeekable(io.RawIOBase):
+    def __init__(self, ruta):
+        if not ZSTD_DISPONIBLE:
+            raise ImportError(f"Para leer {ruta} se necesita el paquete 'zstandard' (pip install zstandard)")
+        self.archivo = open(ruta, "rb")
+        self.descompresor = zstandard.ZstdDecompressor()
+        self.posicion = 0
+        self.cache = (None, b"")
+        self.indice = {"secciones": []}
+
+        self.archivo.seek(-9, os.SEEK_END)
+        num_cuadros, descriptor, magia = struct.unpack("<IBI", self.archivo.read(9))
+        if magia != MAGIA_SEEKABLE:
+            self.archivo.close()
+            raise ValueError(f"{ruta} no tiene tabla de busqueda zstd")
+
+        tamano_entrada = 12 if descriptor & 0x80 else 8
+        self.archivo.seek(-(9 + num_cuadros * tamano_entrada), os.SEEK_END)
+        tabla = self.archivo.read(num_cuadros * tamano_entrada)
+
+        self.cuadros = []
+        inicio_comprimido = inicio = 0
+        for i in range(num_cuadros):
+            comprimido, descomprimido = struct.unpack_from("<II", tabla, i * tamano_entrada)
+            if descomprimido:
+                self.cuadros.append((inicio, descomprimido, inicio_comprimido, comprimido))
+            elif comprimido > 8:
+                self._leer_indice(inicio_comprimido, comprimido)
+            inicio += descomprimido
+            inicio_comprimido += comprimido
+        self.tamano = inicio
+        self.inicios = [c[0] for c in self.cuadros]
+
+    def _leer_indice(self, desplazamiento, tamano):
+        self.archivo.seek(desplazamiento)
+        magia, longitud = struct.unpack("<II", self.archivo.read(8))
+        if magia == MAGIA_INDICE:
+            self.indice = json.loads(self.archivo.read(longitud))
+
+    def _cuadro(self, k):
+        if self.cache[0] != k:
+            _, descomprimido, desplazamiento, comprimido = self.cuadros[k]
+            self.archivo.seek(desplazamiento)
+            datos = self.descompresor.decompress(self.archivo.read(comprimido), max_output_size=descomprimido)
+            self.cache = (k, datos)
+        return self.cache[1]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.posicion
+
+    def seek(self, desplazamiento, origen=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.posicion, os.SEEK_END: self.tamano}[origen]
+        self.posicion = max(0, base + desplazamiento)
+        return self.posicion
+
+    def readinto(self, destino):
+        if self.posicion >= self.tamano:
+            return 0
+        k = bisect.bisect_right(self.inicios, self.posicion) - 1
+        datos = self._cuadro(k)
+        desde = self.posicion - self.cuadros[k][0]
+        n = min(len(destino), len(datos) - desde)
+        destino[:n] = datos[desde:desde + n]
+        self.posicion += n
+        return n
+
+    def close(self):
+        self.archivo.close()
+        super().close()
+
+
+def abrir_artefacto(ruta, binario=False):
+    real = resolver_artefacto(ruta)
+    if real is None:
+        raise FileNotFoundError(ruta)
+
+    if real.endswith(EXTENSION_COMPRIMIDA):
+        try:
+            flujo = io.BufferedReader(LectorSeekable(real), buffer_size=TAMANO_CUADRO)
+        except ValueError:
+            # zstd sin tabla de busqueda (p. ej. comprimido con la herramienta de linea de comandos)
+            with open(real, "rb") as f:
+                flujo = io.BytesIO(zstandard.ZstdDecompressor().stream_reader(f).read())
+    else:
+        flujo = open(real, "rb")
+
+    return flujo if binario else io.TextIOWrapper(flujo, encoding="utf-8", errors="ignore")
+
+
+def leer_artefacto(ruta):
+    with abrir_artefacto(ruta) as f:
+        return f.read()
+
+
+@lru_cache(maxsize=256)
+def _indice_cacheado(real, mtime_ns, tamano):
+    with abrir_artefacto(real, binario=True) as f:
+        lector = getattr(f, "raw", None)
+        if isinstance(lector, LectorSeekable):
+            return lector.indice
+        return indexar_artefacto(f.read(), _extension(real))
+
+
+def indice_artefacto(ruta):
+    # Un archivo sin comprimir se indexa una sola vez mientras no cambie (mtime y tamano forman la clave)
+    real = resolver_artefacto(ruta)
+    if real is None:
+        raise FileNotFoundError(ruta)
+    estado = os.stat(real)
+    return _indice_cacheado(real, estado.st_mtime_ns, estado.st_size)
+
+
+def secciones_artefacto(ruta):
+    return indice_artefacto(ruta)["secciones"]
+
+
+def leer_seccion(ruta, titulo=None, ocurrencia=-1, exacto=False):
+    # titulo=None recorre todas las secciones (p. ej. los cuadros de una trayectoria)
+    secciones = secciones_artefacto(ruta)
+    titulo = titulo.upper() if titulo is not None else None
+    posiciones = [i for i, (nombre, _) in enumerate(secciones) if titulo is None or nombre.upper() == titulo
+                  or (not exacto and nombre.upper().startswith(titulo))]
+    if not posiciones:
+        return None
+
+    i = posiciones[ocurrencia]
+    inicio = secciones[i][1]
+    fin = secciones[i + 1][1] if i + 1 < len(secciones) else None
+    with abrir_artefacto(ruta, binario=True) as f:
+        f.seek(inicio)
+        datos = f.read() if fin is None else f.read(fin - inicio)
+    return datos.decode("utf-8", errors="ignore")
+
+
+def comprimir_directorio(directorio, extensiones=COMPRIMIBLES, nivel=NIVEL_COMPRESION):
+    original = comprimido = 0
+    for raiz, _, archivos in os.walk(directorio):
+        for archivo in archivos:
+            if not archivo.endswith(extensiones):
+                continue
+            ruta = os.path.join(raiz, archivo)
+            original += os.path.getsize(ruta)
+            comprimido += os.path.getsize(comprimir_archivo(ruta, nivel))
+    return original, comprimido
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Compresion zstd (seekable) de artefactos de ORCA")
+    parser.add_argument("rutas", nargs="+", help="Archivos o directorios a comprimir")
+    parser.add_argument("--nivel", type=int, default=NIVEL_COMPRESION, help="Nivel de compresion zstd")
+    args = parser.parse_args(argumentos)
+
+    original = comprimido = 0
+    for ruta in args.rutas:
+        if os.path.isdir(ruta):
+            antes, despues = comprimir_directorio(ruta, nivel=args.nivel)
+        else:
+            antes = os.path.getsize(ruta)
+            despues = os.path.getsize(comprimir_archivo(ruta, args.nivel))
+        original += antes
+        comprimido += despues
+
+    if comprimido:
+        print(f"{original / 1e6:.1f} MB -> {comprimido / 1e6:.1f} MB ({original / comprimido:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
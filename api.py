@@ -0,0 +1,559 @@
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pandas as pd
+
+from almacen import abrir_artefacto, resolver_artefacto
+from basedatos import BaseResultados
+from concurrencia import LimitadorConcurrencia
+from ejecucion import PRIORIDAD_BAJA, EspacioTrabajo
+from estimacion import ModeloCoste, decidir_admision, estimar_coste, paso_estimacion
+from frecuencias_numericas import TRABAJOS_NUMFREQ, anexar_a_salida, calcular_frecuencias_numericas, escribir_hess
+from molecula import Molecula
+from preoptimizacion import NIVELES_PREOPTIMIZACION, preoptimizar
+from recuperacion import ejecutar_con_recuperacion
+from simetria import detectar_simetria
+from utils import TIPOS_CALCULO, Orca, modulo_disponible
+
+DIR_CALCULOS = os.environ.get("ORCA_DIR_CALCULOS", "calculations")
+# Si esta definida, app.py levanta la API dentro del proceso de Streamlit (mismo limitador y base de resultados)
+PUERTO_API = os.environ.get("ORCA_API_PUERTO")
+HOST_API = os.environ.get("ORCA_API_HOST", "127.0.0.1")
+# Hilos que siguen un calculo con plaza concedida; el numero de ORCA simultaneos lo fija el limitador
+MAX_TRABAJOS_API = int(os.environ.get("ORCA_API_TRABAJOS", 32))
+# Los trabajos terminados se olvidan pasado este tiempo o por encima de este numero (los archivos se conservan)
+RETENCION_TRABAJOS_S = float(os.environ.get("ORCA_API_RETENCION_S", 24 * 3600))
+MAX_TRABAJOS_TERMINADOS = int(os.environ.get("ORCA_API_MAX_TERMINADOS", 500))
+ESPERA_MAXIMA = 30.0
+INTERVALO_LOG = 1.0
+VIGENCIA_MODELO_COSTE = 300
+ESTADOS_FINALES = ("terminado", "fallido")
+TIPOS_CONTENIDO = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+class ErrorAPI(Exception):
+    def __init__(self, codigo, mensaje):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+def _texto(datos, clave, defecto=""):
+    valor = str(datos.get(clave) or defecto)
+    if "\n" in valor or "\r" in valor:
+        raise ErrorAPI(400, f"'{clave}' no puede contener saltos de linea")
+    return valor
+
+
+def _registros(tabla):
+    if not isinstance(tabla.index, pd.RangeIndex):
+        tabla = tabla.reset_index()
+    return json.loads(tabla.to_json(orient="records"))
+
+
+def extraer_resultados(analizador, tipo_calculo):
+    cargas = analizador.extraer_cargas_atomicas() or {}
+    tablas = {
+        "componentes_energia": analizador.extraer_componentes_energia(),
+        "orbitales": analizador.extraer_energias_orbitales(),
+        "nmr": analizador.extraer_datos_nmr(),
+        "tiempos": analizador.extraer_tiempos_modulos(),
+        "iteraciones_scf": analizador.extraer_iteraciones_scf(),
+    }
+    for esquema, tabla in cargas.items():
+        tablas[f"cargas_{esquema.lower()}"] = tabla
+    for esquema, tabla in (analizador.extraer_cargas_orbitales_reducidas() or {}).items():
+        tablas[f"cargas_orbitales_{esquema.lower()}"] = tabla
+    if "FREQ" in TIPOS_CALCULO[tipo_calculo]:
+        tablas["ir"] = analizador.extraer_espectro_ir()
+        tablas["termoquimica"] = analizador.extraer_termoquimica()
+    tablas = {nombre: t for nombre, t in tablas.items() if isinstance(t, pd.DataFrame) and not t.empty}
+
+    resumen = {
+        "energia_final": analizador.extraer_energia_final(),
+        "convergido": analizador.calculo_convergido(),
+        "geometria_xyz": analizador.extraer_geometria_optimizada(),
+        "palabras_clave": analizador.extraer_palabras_clave(),
+        "rendimiento": analizador.resumen_rendimiento(),
+    }
+    return resumen, tablas, cargas
+
+
+class ServicioTrabajos:
+    def __init__(self, directorio_resultados=DIR_CALCULOS, limitador=None, base_resultados=None,
+                 max_trabajos=MAX_TRABAJOS_API):
+        self.directorio_resultados = directorio_resultados
+        os.makedirs(directorio_resultados, exist_ok=True)
+        self.limitador = limitador or LimitadorConcurrencia()
+        self.base_resultados = base_resultados or BaseResultados(os.path.join(directorio_resultados,
+                                                                              "resultados.db"))
+        self.trabajos = {}
+        self.cerrojo = threading.Lock()
+        self.ejecutor = ThreadPoolExecutor(max_workers=max_trabajos, thread_name_prefix="api")
+        self.modelo_coste = None
+        self.modelo_ajustado = 0.0
+        threading.Thread(target=self._vigilar_cola, daemon=True, name="api-cola").start()
+
+    def _trabajo(self, id_trabajo):
+        if id_trabajo not in self.trabajos:
+            raise ErrorAPI(404, f"Trabajo desconocido: {id_trabajo}")
+        return self.trabajos[id_trabajo]
+
+    @staticmethod
+    def _publico(trabajo):
+        return {clave: valor for clave, valor in trabajo.items() if not clave.startswith("_")}
+
+    def _actualizar(self, trabajo, **cambios):
+        # El estado se serializa una sola vez por cambio: los sondeos solo copian bytes
+        with self.cerrojo:
+            trabajo.update(cambios)
+            trabajo["version"] += 1
+            trabajo["_json"] = json.dumps(self._publico(trabajo)).encode("utf-8")
+            trabajo["_condicion"].notify_all()
+
+    def _modelo(self):
+        if self.modelo_coste is None or time.monotonic() - self.modelo_ajustado > VIGENCIA_MODELO_COSTE:
+            self.modelo_coste = ModeloCoste.ajustar(self.base_resultados.historial_tiempos())
+            self.modelo_ajustado = time.monotonic()
+        return self.modelo_coste
+
+    def crear_trabajo(self, datos, usuario):
+        try:
+            molecula = Molecula.desde_xyz(datos["xyz"])
+        except KeyError:
+            raise ErrorAPI(400, "Falta el campo 'xyz'")
+        except ValueError as e:
+            raise ErrorAPI(400, f"Formato XYZ invalido: {e}")
+
+        tipo_calculo = datos.get("tipo_calculo", "Optimización de Geometría")
+        if tipo_calculo not in TIPOS_CALCULO:
+            raise ErrorAPI(400, f"tipo_calculo desconocido: {tipo_calculo}")
+        pasos = []
+        for paso in datos.get("pasos_adicionales") or []:
+            if paso.get("tipo_calculo") not in TIPOS_CALCULO or not paso.get("metodo") or not paso.get("base"):
+                raise ErrorAPI(400, "Cada paso adicional necesita tipo_calculo, metodo y base validos")
+            pasos.append({"tipo_calculo": paso["tipo_calculo"], "metodo": _texto(paso, "metodo"),
+                          "base": _texto(paso, "base"), "palabras_clave": _texto(paso, "palabras_clave"),
+                          "calc_nmr": bool(paso.get("calc_nmr", False))})
+        parametros = {
+            "tipo_calculo": tipo_calculo,
+            "metodo": _texto(datos, "metodo", "B3LYP"),
+            "base": _texto(datos, "base", "def2-SVP"),
+            "palabras_clave": _texto(datos, "palabras_clave"),
+            "calc_nmr": bool(datos.get("calc_nmr", False)),
+            "pasos_adicionales": pasos,
+            "usar_simetria": bool(datos.get("usar_simetria", False)),
+        }
+        simetria = detectar_simetria(molecula)
+        if datos.get("simetrizar") or parametros["usar_simetria"]:
+            molecula = simetria["molecula"]
+        preoptimizacion = datos.get("preoptimizacion")
+        if preoptimizacion and preoptimizacion not in NIVELES_PREOPTIMIZACION:
+            raise ErrorAPI(400, f"Nivel de preoptimizacion desconocido: {preoptimizacion}")
+        frecuencias_distribuidas = bool(datos.get("frecuencias_distribuidas", False))
+        if frecuencias_distribuidas and "FREQ" not in TIPOS_CALCULO[tipo_calculo]:
+            raise ErrorAPI(400, "frecuencias_distribuidas solo se admite en calculos de frecuencias")
+
+        # Mismo control de admision que la interfaz
+        pasos_coste = [paso_estimacion(tipo_calculo, parametros["base"], parametros["palabras_clave"],
+                                       parametros["calc_nmr"])] + [
+            paso_estimacion(p["tipo_calculo"], p["base"], p["palabras_clave"], p["calc_nmr"]) for p in pasos]
+        admision = decidir_admision(estimar_coste(molecula, pasos_coste, self._modelo()),
+                                    politica=datos.get("politica", "rechazar"))
+        if admision["decision"] == "rechazar":
+            raise ErrorAPI(422, "Trabajo rechazado por el control de admision: " + "; ".join(admision["motivos"]))
+
+        id_trabajo = uuid.uuid4().hex[:12]
+        trabajo = {
+            "id": id_trabajo,
+            "nombre": re.sub(r"[^\w.-]", "_", datos.get("nombre") or molecula.formula),
+            "usuario": usuario,
+            "estado": "en_cola",
+            "posicion": None,
+            "parametros": parametros,
+            "preoptimizacion": preoptimizacion,
+            "frecuencias_distribuidas": frecuencias_distribuidas,
+            "grupo_puntual": simetria["grupo_puntual"],
+            "prioridad": PRIORIDAD_BAJA if admision["decision"] == "baja_prioridad" else 0,
+            "admision": admision,
+            "reintentos": [],
+            "convergido": None,
+            "energia_final": None,
+            "error": None,
+            "creado": time.time(),
+            "iniciado": None,
+            "terminado": None,
+            "version": 0,
+            "_molecula": molecula,
+            "_salidas": [],
+            "_condicion": threading.Condition(self.cerrojo),
+        }
+        # El turno se pide ya: la cola la lleva el limitador y ningun hilo del ejecutor queda bloqueado esperando
+        # Las frecuencias distribuidas reservan desde el principio las plazas de los gradientes desplazados
+        trabajo["_turno"] = self.limitador.solicitar("orca", usuario,
+                                                     TRABAJOS_NUMFREQ if frecuencias_distribuidas else 1,
+                                                     baja_prioridad=trabajo["prioridad"] == PRIORIDAD_BAJA)
+        with self.cerrojo:
+            self.trabajos[id_trabajo] = trabajo
+        self._actualizar(trabajo)
+        with self.limitador.condicion:
+            self.limitador.condicion.notify_all()
+        return self._publico(trabajo)
+
+    def _vigilar_cola(self):
+        # Un solo hilo mantiene vivos los turnos en cola y entrega al ejecutor los que el limitador concede
+        while True:
+            with self.cerrojo:
+                en_cola = [t for t in self.trabajos.values() if t["estado"] == "en_cola"]
+            for trabajo in en_cola:
+                turno = trabajo["_turno"]
+                try:
+                    concedido = self.limitador.esperar(turno, timeout=0)
+                except RuntimeError as e:
+                    self._actualizar(trabajo, estado="fallido", error=str(e), posicion=None, terminado=time.time())
+                    continue
+                if concedido:
+                    self._actualizar(trabajo, estado="ejecutando", posicion=None, iniciado=time.time())
+                    self.ejecutor.submit(self._ejecutar, trabajo)
+                else:
+                    posicion, _ = self.limitador.posicion(turno)
+                    if posicion != trabajo["posicion"]:
+                        self._actualizar(trabajo, posicion=posicion)
+            self._olvidar_terminados()
+            with self.limitador.condicion:
+                self.limitador.condicion.wait(1.0)
+
+    def _olvidar_terminados(self):
+        limite = time.time() - RETENCION_TRABAJOS_S
+        with self.cerrojo:
+            terminados = sorted((t["terminado"], id_trabajo) for id_trabajo, t in self.trabajos.items()
+                                if t["estado"] in ESTADOS_FINALES)
+            sobrantes = len(terminados) - MAX_TRABAJOS_TERMINADOS
+            for n, (terminado, id_trabajo) in enumerate(terminados):
+                if n < sobrantes or terminado < limite:
+                    del self.trabajos[id_trabajo]
+
+    def _agregar_salida(self, trabajo, ruta_salida):
+        with self.cerrojo:
+            trabajo["_salidas"].append(ruta_salida)
+
+    def _ejecutar(self, trabajo):
+        turno = trabajo["_turno"]
+        try:
+            parametros, nombre = trabajo["parametros"], trabajo["nombre"]
+            espacio = EspacioTrabajo(nombre, self.directorio_resultados)
+            try:
+                molecula, orbitales = trabajo["_molecula"], None
+                if trabajo["preoptimizacion"]:
+                    self._agregar_salida(trabajo, os.path.join(espacio.directorio, f"{nombre}_preopt.out"))
+                    resultado = preoptimizar(molecula, nombre, espacio.directorio, trabajo["preoptimizacion"],
+                                             trabajo["prioridad"])
+                    if "error" not in resultado:
+                        molecula = resultado["molecula"]
+                        if parametros["usar_simetria"]:
+                            molecula = detectar_simetria(molecula)["molecula"]
+                        orbitales = None if parametros["pasos_adicionales"] else resultado["orbitales"]
+                tipo_orca = "Optimización de Geometría" if trabajo["frecuencias_distribuidas"] else \
+                    parametros["tipo_calculo"]
+                ruta_salida, reintentos = ejecutar_con_recuperacion(
+                    espacio, molecula, **dict(parametros, tipo_calculo=tipo_orca), prioridad=trabajo["prioridad"],
+                    orbitales=orbitales, al_iniciar=lambda ruta: self._agregar_salida(trabajo, ruta))
+                if trabajo["frecuencias_distribuidas"]:
+                    self._frecuencias_numericas(trabajo, espacio, ruta_salida, turno.unidades)
+            finally:
+                espacio.promover()
+                with self.cerrojo:
+                    trabajo["_salidas"] = [espacio.ruta_durable(ruta) for ruta in trabajo["_salidas"]]
+
+            ruta_salida = espacio.ruta_durable(ruta_salida)
+            self.base_resultados.registrar(ruta_salida, metodo=parametros["metodo"], base=parametros["base"],
+                                           tipo_calculo=parametros["tipo_calculo"])
+            resumen, tablas, cargas = extraer_resultados(Orca(ruta_salida), parametros["tipo_calculo"])
+            resultados = dict(resumen, id=trabajo["id"], tablas={n: _registros(t) for n, t in tablas.items()})
+            self._actualizar(trabajo, estado="terminado", convergido=resumen["convergido"],
+                             energia_final=resumen["energia_final"], reintentos=reintentos, terminado=time.time(),
+                             _tablas=tablas, _cargas=cargas,
+                             _resultados=json.dumps(resultados).encode("utf-8"))
+        except Exception as e:
+            self._actualizar(trabajo, estado="fallido", error=str(e), posicion=None, terminado=time.time())
+        finally:
+            self.limitador.liberar(turno)
+
+    def _frecuencias_numericas(self, trabajo, espacio, ruta_salida, trabajos_paralelos):
+        parametros = trabajo["parametros"]
+        analizador = Orca(ruta_salida)
+        if not analizador.verificar_convergencia():
+            raise RuntimeError("La optimización no convergió; no se calculan las frecuencias numéricas")
+        molecula = analizador.extraer_molecula()
+        base_nombre = os.path.splitext(ruta_salida)[0]
+        resultado = calcular_frecuencias_numericas(
+            molecula, trabajo["nombre"], espacio.directorio, parametros["metodo"], parametros["base"],
+            parametros["palabras_clave"], trabajos_paralelos=trabajos_paralelos,
+            orbitales=base_nombre + ".gbw" if resolver_artefacto(base_nombre + ".gbw") else None,
+            prioridad=trabajo["prioridad"])
+        if "error" in resultado:
+            raise RuntimeError(resultado["error"])
+        escribir_hess(base_nombre + ".hess", molecula, resultado)
+        anexar_a_salida(ruta_salida, resultado, molecula)
+
+    def estado_trabajo(self, id_trabajo, version=-1, espera=0.0):
+        # Sondeo largo: responde en cuanto la version supera la que ya tiene el cliente
+        limite = time.monotonic() + min(espera, ESPERA_MAXIMA)
+        with self.cerrojo:
+            trabajo = self._trabajo(id_trabajo)
+            while trabajo["version"] <= version and trabajo["estado"] not in ESTADOS_FINALES:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                trabajo["_condicion"].wait(restante)
+            return trabajo["_json"], trabajo["version"]
+
+    def _leer_salidas(self, id_trabajo, desde):
+        with self.cerrojo:
+            trabajo = self._trabajo(id_trabajo)
+            salidas, terminado = list(trabajo["_salidas"]), trabajo["estado"] in ESTADOS_FINALES
+        # Las salidas de la preoptimizacion y de cada reintento forman un unico log continuo
+        partes, inicio = [], 0
+        for ruta in salidas:
+            try:
+                with abrir_artefacto(ruta, binario=True) as f:
+                    tamano = f.seek(0, os.SEEK_END)
+                    if desde < inicio + tamano:
+                        f.seek(max(0, desde - inicio))
+                        partes.append(f.read())
+            except FileNotFoundError:
+                # Se esta promoviendo al almacenamiento durable o ORCA aun no la ha creado
+                break
+            inicio += tamano
+        return b"".join(partes), terminado
+
+    def leer_log(self, id_trabajo, desde=0, espera=0.0):
+        limite = time.monotonic() + min(espera, ESPERA_MAXIMA)
+        while True:
+            datos, terminado = self._leer_salidas(id_trabajo, desde)
+            restante = limite - time.monotonic()
+            if datos or terminado or restante <= 0:
+                return datos, terminado
+            with self.cerrojo:
+                self._trabajo(id_trabajo)["_condicion"].wait(min(INTERVALO_LOG, restante))
+
+    def _terminado(self, id_trabajo):
+        with self.cerrojo:
+            trabajo = self._trabajo(id_trabajo)
+        if trabajo["estado"] != "terminado":
+            raise ErrorAPI(409, f"El trabajo {id_trabajo} esta '{trabajo['estado']}'")
+        return trabajo
+
+    def resultados(self, id_trabajo):
+        return self._terminado(id_trabajo)["_resultados"]
+
+    def tabla(self, id_trabajo, nombre, formato="json"):
+        tablas = self._terminado(id_trabajo)["_tablas"]
+        if nombre not in tablas:
+            raise ErrorAPI(404, f"Tabla no disponible: {nombre} (hay: {', '.join(sorted(tablas))})")
+        tabla = tablas[nombre]
+        if formato == "csv":
+            return tabla.to_csv().encode("utf-8")
+        if formato == "arrow":
+            if not modulo_disponible("pyarrow"):
+                raise ErrorAPI(501, "El formato Arrow requiere pyarrow (pip install pyarrow)")
+            buffer = io.BytesIO()
+            tabla.reset_index().to_feather(buffer)
+            return buffer.getvalue()
+        if formato == "json":
+            return json.dumps(_registros(tabla)).encode("utf-8")
+        raise ErrorAPI(400, f"Formato desconocido: {formato}")
+
+    def reporte(self, id_trabajo):
+        trabajo = self._terminado(id_trabajo)
+        if "_pdf" not in trabajo:
+            if not (modulo_disponible("reportlab") and modulo_disponible("matplotlib")):
+                raise ErrorAPI(501, "El reporte PDF requiere reportlab y matplotlib")
+            from documento import generar_reporte_completo
+
+            tablas = trabajo["_tablas"]
+            pdf = generar_reporte_completo(
+                nombre_trabajo=f"{trabajo['nombre']}_{trabajo['id']}",
+                metodo=trabajo["parametros"]["metodo"],
+                base=trabajo["parametros"]["base"],
+                energia_final=trabajo["energia_final"],
+                convergida=trabajo["convergido"],
+                datos_energia=tablas.get("componentes_energia"),
+                datos_ir=tablas.get("ir"),
+                datos_nmr=tablas.get("nmr"),
+                datos_cargas=trabajo["_cargas"] or None,
+                datos_orbitales=tablas.get("orbitales"),
+            )
+            with self.cerrojo:
+                trabajo["_pdf"] = pdf.getvalue()
+        return trabajo["_pdf"]
+
+    def estado_general(self):
+        with self.cerrojo:
+            estados = [t["estado"] for t in self.trabajos.values()]
+        return {
+            "trabajos": {estado: estados.count(estado) for estado in sorted(set(estados))},
+            "servidor": self.limitador.estado(),
+        }
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    # HTTP/1.1: los clientes que sondean reutilizan la conexion
+    protocol_version = "HTTP/1.1"
+    RUTAS = [
+        ("GET", r"/estado", "estado_general"),
+        ("POST", r"/trabajos", "crear_trabajo"),
+        ("GET", r"/trabajos/(\w+)", "estado_trabajo"),
+        ("GET", r"/trabajos/(\w+)/log", "leer_log"),
+        ("GET", r"/trabajos/(\w+)/resultados", "resultados"),
+        ("GET", r"/trabajos/(\w+)/tablas/(\w+)", "tabla"),
+        ("GET", r"/trabajos/(\w+)/reporte\.pdf", "reporte"),
+    ]
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo, tipo="application/json", cabeceras=None):
+        datos = cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(datos)))
+        for clave, valor in (cabeceras or {}).items():
+            self.send_header(clave, str(valor))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _usuario(self):
+        usuario = self.headers.get("X-Forwarded-User") or self.headers.get("X-Forwarded-For", "").split(",")[0]
+        return usuario.strip() or self.client_address[0]
+
+    def _seguir_log(self, servicio, id_trabajo, desde):
+        # Transferencia por trozos hasta que el trabajo termina (curl -N .../log?seguir=1)
+        servicio.estado_trabajo(id_trabajo)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        terminado = False
+        try:
+            while not terminado:
+                try:
+                    datos, terminado = servicio.leer_log(id_trabajo, desde, ESPERA_MAXIMA)
+                except ErrorAPI:
+                    # El trabajo se olvido mientras se seguia su log: ya habia terminado, se cierra el flujo
+                    break
+                if datos:
+                    self.wfile.write(f"{len(datos):x}\r\n".encode("ascii") + datos + b"\r\n")
+                    self.wfile.flush()
+                    desde += len(datos)
+            self.wfile.write(b"0\r\n\r\n")
+        except ConnectionError:
+            self.close_connection = True
+
+    def _despachar(self, metodo):
+        url = urlparse(self.path)
+        ruta = unquote(url.path)
+        consulta = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+        longitud = int(self.headers.get("Content-Length") or 0)
+        cuerpo = self.rfile.read(longitud) if longitud else b""
+        servicio = self.server.servicio
+
+        try:
+            for metodo_ruta, patron, accion in self.RUTAS:
+                coincidencia = re.fullmatch(patron, ruta)
+                if metodo_ruta != metodo or not coincidencia:
+                    continue
+                argumentos = coincidencia.groups()
+                if accion == "crear_trabajo":
+                    self._responder(202, servicio.crear_trabajo(json.loads(cuerpo or b"{}"), self._usuario()))
+                elif accion == "estado_trabajo":
+                    espera = float(consulta.get("espera", 0))
+                    version = int(consulta.get("version", -1))
+                    etiqueta_cliente = self.headers.get("If-None-Match")
+                    if etiqueta_cliente:
+                        version = max(version, int(etiqueta_cliente.strip('"').rsplit("-", 1)[-1]))
+                    datos, version_actual = servicio.estado_trabajo(argumentos[0], version, espera)
+                    etiqueta = f'"{argumentos[0]}-{version_actual}"'
+                    if etiqueta == etiqueta_cliente:
+                        self.send_response(304)
+                        self.send_header("ETag", etiqueta)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                    else:
+                        self._responder(200, datos, cabeceras={"ETag": etiqueta})
+                elif accion == "leer_log":
+                    desde = int(consulta.get("desde", 0))
+                    if consulta.get("seguir") == "1":
+                        self._seguir_log(servicio, argumentos[0], desde)
+                    else:
+                        datos, terminado = servicio.leer_log(argumentos[0], desde, float(consulta.get("espera", 0)))
+                        self._responder(200, datos, "text/plain; charset=utf-8",
+                                        {"X-Siguiente": desde + len(datos), "X-Terminado": int(terminado)})
+                elif accion == "resultados":
+                    self._responder(200, servicio.resultados(argumentos[0]))
+                elif accion == "tabla":
+                    formato = consulta.get("formato", "json")
+                    self._responder(200, servicio.tabla(*argumentos, formato),
+                                    TIPOS_CONTENIDO.get(formato, "application/octet-stream"))
+                elif accion == "reporte":
+                    self._responder(200, servicio.reporte(argumentos[0]), "application/pdf",
+                                    {"Content-Disposition": f'attachment; filename="{argumentos[0]}.pdf"'})
+                else:
+                    self._responder(200, getattr(servicio, accion)(*argumentos))
+                return
+            self._responder(404, {"error": f"Ruta desconocida: {metodo} {ruta}"})
+        except ErrorAPI as e:
+            self._responder(e.codigo, {"error": str(e)})
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            self._responder(400, {"error": f"Peticion invalida: {e}"})
+
+    def do_GET(self):
+        self._despachar("GET")
+
+    def do_POST(self):
+        self._despachar("POST")
+
+
+class ServidorAPI(ThreadingHTTPServer):
+    daemon_threads = True
+    # Cola de conexiones pendientes para cientos de clientes sondeando a la vez
+    request_queue_size = 1024
+
+
+def servir_api(servicio=None, host=HOST_API, puerto=8766):
+    servidor = ServidorAPI((host, puerto), ManejadorAPI)
+    servidor.servicio = servicio or ServicioTrabajos()
+    return servidor
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="API HTTP para enviar calculos de ORCA y consultar sus resultados")
+    parser.add_argument("--host", default=HOST_API)
+    parser.add_argument("--puerto", type=int, default=int(PUERTO_API or 8766))
+    parser.add_argument("--directorio", default=DIR_CALCULOS, help="Directorio de resultados (el mismo que la app)")
+    args = parser.parse_args(argumentos)
+
+    servidor = servir_api(ServicioTrabajos(args.directorio), args.host, args.puerto)
+    print(f"API escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,13 +2,34 @@
 import streamlit as st
 import os
 import subprocess
+import json
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-import py3Dmol
-from stmol import showmol
-import matplotlib.pyplot as plt
-
-from documento import generar_reporte_completo
-from utils import Orca, PySCFCalculator
+import streamlit.components.v1 as componentes
+
+from almacen import resolver_artefacto
+from basedatos import BaseResultados
+from concurrencia import LimitadorConcurrencia
+from constantes import ISOTOPOS
+from cribado import BASES_COSTE_BAJOS, NIVELES_BAJOS, ejecutar_cribado
+from desplazamientos import convertir_a_desplazamientos, obtener_referencias, referencias_faltantes
+from ejecucion import (COORDINADOR_ORCA, PRIORIDAD_BAJA, EspacioTrabajo, aplicar_retencion, leer_final,
+                       limpiar_scratch)
+from estimacion import (PRESUPUESTO_HORAS, PRESUPUESTO_MEMORIA_MB, ModeloCoste, decidir_admision, estimar_coste,
+                        formatear_duracion, paso_estimacion)
+from frecuencias_numericas import TRABAJOS_NUMFREQ, anexar_a_salida, calcular_frecuencias_numericas, escribir_hess
+from molecula import Molecula
+from preoptimizacion import NIVELES_PREOPTIMIZACION, preoptimizar, resumen_ahorro
+from recuperacion import MAX_REINTENTOS, ejecutar_con_recuperacion
+from simetria import TOLERANCIA_SIMETRIA, detectar_simetria
+from termoquimica import calcular_termoquimica, parametros_desde_orca, tabla_termoquimica
+from utils import PYSCF_AVAILABLE, Orca, PySCFCalculator, SeguimientoOrca, modulo_disponible
+from vibraciones import (PROYECCIONES, interpretar_sustituciones, isotopologo, leer_hessiana,
+                         parametros_termoquimica_isotopologo, tabla_isotopologo)
+from visualizacion import desplazamiento_modo_normal, html_visor_3d
 
 st.set_page_config(
     page_title="ORCA Molecular",
@@ -45,8 +66,6 @@ if "datos_cargas_reducidas" not in st.session_state:
     st.session_state.datos_cargas_reducidas = None
 if "resumen_log_orca" not in st.session_state:
     st.session_state.resumen_log_orca = None
-if "log_completo_orca" not in st.session_state:
-    st.session_state.log_completo_orca = None
 if "nombre_trabajo" not in st.session_state:
     st.session_state.nombre_trabajo = ""
 if "datos_nmr" not in st.session_state:
@@ -58,10 +77,135 @@ if "datos_susceptibilidad" not in st.session_state:
     st.session_state.datos_susceptibilidad = None
 if "pdf_generado" not in st.session_state:
     st.session_state.pdf_generado = None
+if "datos_tiempos" not in st.session_state:
+    st.session_state.datos_tiempos = None
+if "datos_iteraciones_scf" not in st.session_state:
+    st.session_state.datos_iteraciones_scf = None
+if "resumen_rendimiento" not in st.session_state:
+    st.session_state.resumen_rendimiento = None
+if "datos_cribado" not in st.session_state:
+    st.session_state.datos_cribado = None
+if "proceso_orca" not in st.session_state:
+    st.session_state.proceso_orca = None
+if "datos_pasos" not in st.session_state:
+    st.session_state.datos_pasos = None
+if "intentos_recuperacion" not in st.session_state:
+    st.session_state.intentos_recuperacion = None
+if "datos_preoptimizacion" not in st.session_state:
+    st.session_state.datos_preoptimizacion = None
+if "datos_termoquimica" not in st.session_state:
+    st.session_state.datos_termoquimica = None
+if "parametros_termoquimica" not in st.session_state:
+    st.session_state.parametros_termoquimica = None
+if "datos_modos_normales" not in st.session_state:
+    st.session_state.datos_modos_normales = None
+if "ruta_hess" not in st.session_state:
+    st.session_state.ruta_hess = None
+if not st.session_state.get("id_sesion"):
+    st.session_state.id_sesion = uuid.uuid4().hex
+
+REPORTE_DISPONIBLE = modulo_disponible("reportlab") and modulo_disponible("matplotlib")
 
 DIR_CALCULOS = "calculations"
 os.makedirs(DIR_CALCULOS, exist_ok=True)
 
+
+@st.cache_resource
+def obtener_base_resultados():
+    return BaseResultados(os.path.join(DIR_CALCULOS, "resultados.db"))
+
+
+base_resultados = obtener_base_resultados()
+
+
+# Un unico limitador para todo el servidor: cada sesion de Streamlit corre en su propio hilo
+@st.cache_resource
+def obtener_limitador():
+    return LimitadorConcurrencia()
+
+
+limitador = obtener_limitador()
+
+
+# Con ORCA_API_PUERTO la API HTTP corre en este mismo proceso: comparte limitador y base de resultados con la interfaz
+@st.cache_resource
+def iniciar_api(puerto):
+    from api import HOST_API, ServicioTrabajos, servir_api
+
+    servidor = servir_api(ServicioTrabajos(DIR_CALCULOS, limitador, base_resultados), HOST_API, int(puerto))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+if os.environ.get("ORCA_API_PUERTO"):
+    iniciar_api(os.environ["ORCA_API_PUERTO"])
+
+
+def usuario_actual():
+    # Detras de un proxy con autenticacion se usa su cabecera; si no, la IP del cliente o la propia sesion
+    contexto = getattr(st, "context", None)
+    cabeceras = contexto.headers if contexto is not None else {}
+    usuario = cabeceras.get("X-Forwarded-User") or cabeceras.get("X-Forwarded-For", "").split(",")[0].strip()
+    return usuario or getattr(contexto, "ip_address", None) or st.session_state.id_sesion
+
+
+def esperar_turno(recurso, etiqueta, unidades=1, baja_prioridad=False):
+    turno = limitador.solicitar(recurso, usuario_actual(), unidades, baja_prioridad)
+    aviso = st.empty()
+    try:
+        while not limitador.esperar(turno):
+            posicion, total = limitador.posicion(turno)
+            carga = limitador.estado()[recurso]
+            aviso.info(f"⏳ En cola{' de baja prioridad' if baja_prioridad else ''} para {etiqueta}: "
+                       f"posición {posicion} de {total} "
+                       f"({carga['en_curso']}/{carga['maximo']} en ejecución en el servidor)")
+    except BaseException:
+        limitador.liberar(turno)
+        raise
+    aviso.empty()
+    return turno
+
+
+@contextmanager
+def plaza_orca(baja_prioridad=False):
+    turno = esperar_turno("orca", "ORCA", baja_prioridad=baja_prioridad)
+    try:
+        yield turno
+    finally:
+        limitador.liberar(turno)
+
+
+@st.cache_data(ttl=3600)
+def mantenimiento_almacenamiento():
+    limpiar_scratch()
+    return aplicar_retencion(DIR_CALCULOS)
+
+
+mantenimiento_almacenamiento()
+
+
+@st.cache_data(max_entries=16)
+def html_geometria(xyz, ancho, alto):
+    return html_visor_3d(Molecula.desde_xyz(xyz), ancho, alto)
+
+
+@st.cache_data(max_entries=16)
+def html_modo_normal(xyz, modo, amplitud, num_cuadros):
+    return html_visor_3d(Molecula.desde_xyz(xyz), 520, 420, desplazamiento=desplazamiento_modo_normal(modo, amplitud),
+                         num_cuadros=num_cuadros)
+
+
+@st.cache_data(max_entries=16)
+def simetria_geometria(xyz, tolerancia):
+    resultado = detectar_simetria(Molecula.leer_xyz_multiple(xyz)[0], tolerancia)
+    return resultado["grupo_puntual"], resultado["desviacion_maxima"]
+
+
+@st.cache_data(ttl=300)
+def obtener_modelo_coste():
+    return ModeloCoste.ajustar(base_resultados.historial_tiempos())
+
+
 with st.sidebar:
     st.markdown("### ⚛️ Panel de Control")
     st.markdown("---")
@@ -78,6 +222,51 @@ with st.sidebar:
         st.session_state.nombre_trabajo = os.path.splitext(archivo_subido.name)[0]
         st.success(f"✅ {archivo_subido.name}")
 
+    conformeros = []
+    if st.session_state.xyz_inicial:
+        try:
+            conformeros = Molecula.leer_xyz_multiple(st.session_state.xyz_inicial)
+        except ValueError as e:
+            st.error(f"❌ Archivo XYZ inválido: {e}")
+            conformeros = []
+
+    modo_cribado = False
+    if len(conformeros) > 1:
+        st.info(f"📚 El archivo contiene {len(conformeros)} estructuras.")
+        modo_cribado = st.checkbox(
+            "Cribado de confórmeros",
+            value=True,
+            help="Optimiza todos los confórmeros a nivel bajo, descarta duplicados y solo promueve los mejores"
+        )
+        if modo_cribado:
+            with st.expander("Parámetros de Cribado", expanded=False):
+                nivel_bajo = st.selectbox("Nivel bajo", list(NIVELES_BAJOS.keys()))
+                ventana_kcal = st.number_input("Ventana de energía (kcal/mol)", min_value=0.1, value=5.0, step=0.5)
+                umbral_rmsd = st.number_input("Umbral RMSD duplicados (Å)", min_value=0.01, value=0.25, step=0.05)
+                top_k = st.number_input("Confórmeros a promover (top-k)", min_value=1, value=3, step=1)
+                cupo_orca = min(limitador.limites["orca"])
+                trabajos_paralelos = st.number_input("Trabajos en paralelo", min_value=1,
+                                                     value=min(os.cpu_count() or 1, cupo_orca), step=1,
+                                                     help="Se recorta al cupo de procesos de ORCA por usuario")
+                if trabajos_paralelos > cupo_orca:
+                    st.warning(f"Solo hay {cupo_orca} plaza(s) de ORCA por usuario (ORCA_MAX_TRABAJOS_USUARIO): el "
+                               f"cribado correrá {cupo_orca} confórmero(s) a la vez, no {int(trabajos_paralelos)}. "
+                               "Sube el cupo para aprovechar más procesos.")
+
+    simetrizar, usar_simetria, tolerancia_simetria = False, False, TOLERANCIA_SIMETRIA
+    if conformeros:
+        with st.expander("🔷 Simetría", expanded=False):
+            tolerancia_simetria = st.number_input("Tolerancia (Å)", min_value=0.001, max_value=0.5,
+                                                  value=TOLERANCIA_SIMETRIA, step=0.01, format="%.3f")
+            grupo_puntual, desviacion = simetria_geometria(st.session_state.xyz_inicial, tolerancia_simetria)
+            st.caption(f"Grupo puntual: **{grupo_puntual}** (desviación máxima {desviacion:.2e} Å)")
+            simetrizar = st.checkbox("Simetrizar la geometría", value=False, disabled=modo_cribado,
+                                     help="Lleva los átomos a posiciones exactamente simétricas antes de enviar el "
+                                          "cálculo, para que el optimizador no persiga el ruido")
+            usar_simetria = st.checkbox("Usar simetría en ORCA (UseSym)", value=False,
+                                        help="ORCA conserva el grupo puntual durante la optimización. En el cribado "
+                                             "se aplica a los confórmeros promovidos, ya simetrizados")
+
     st.markdown("---")
 
     st.markdown("#### 🧮 **Tipo de Cálculo**")
@@ -89,6 +278,7 @@ with st.sidebar:
     )
 
     factor_escalamiento = 1.0
+    frecuencias_distribuidas = False
     if tipo_calculo == "Frecuencias Vibracionales (IR)":
         st.markdown("##### 📊 Factor de Escalamiento")
         factor_escalamiento = st.slider(
@@ -96,6 +286,20 @@ with st.sidebar:
             min_value=0.80, max_value=1.20, value=0.9679, step=0.001,
             help="Corrección para frecuencias calculadas"
         )
+        frecuencias_distribuidas = st.checkbox(
+            "Frecuencias numéricas distribuidas",
+            value=False,
+            disabled=modo_cribado,
+            help="Optimiza con ORCA y calcula la Hessiana por diferencias finitas: cada uno de los 6N gradientes "
+                 "desplazados es un trabajo independiente que se reparte entre los procesos disponibles"
+        )
+        # Sin coordinador los gradientes se reparten en las plazas del usuario; con una sola corren uno a uno
+        if frecuencias_distribuidas and not COORDINADOR_ORCA and min(limitador.limites["orca"]) == 1:
+            st.warning("Solo hay una plaza de ORCA por usuario (ORCA_MAX_TRABAJOS_USUARIO=1): los 6N gradientes "
+                       "correrán uno a uno, más despacio que NumFreq dentro de ORCA. Sube el cupo o usa un "
+                       "coordinador para aprovechar el modo distribuido.")
+    # En el modo distribuido ORCA solo optimiza; la Hessiana se ensambla despues a partir de los gradientes
+    tipo_orca = "Optimización de Geometría" if frecuencias_distribuidas else tipo_calculo
 
     st.markdown("##### 🔬 Propiedades Adicionales")
     calc_nmr = st.checkbox(
@@ -103,11 +307,20 @@ with st.sidebar:
         help="Calcula las propiedades de RMN (Apantallamiento Isotrópico)",
         value=False
     )
+    calc_desplazamientos = st.checkbox(
+        "Convertir a desplazamientos químicos (δ)",
+        help="Resta los apantallamientos de la referencia (TMS para H/C/Si, CFCl3 para F) calculada al mismo "
+             "nivel de teoría. Cada referencia se calcula una sola vez por nivel y queda guardada.",
+        value=True,
+        disabled=not calc_nmr
+    )
 
     calc_susceptibilidad = st.checkbox(
         "🧲 Calcular Susceptibilidad Magnética (PySCF)",
-        help="Calcula magnetismo/diamagnetismo usando PySCF",
-        value=False
+        help="Calcula magnetismo/diamagnetismo usando PySCF" if PYSCF_AVAILABLE
+        else "PySCF no está instalado (pip install pyscf)",
+        value=False,
+        disabled=not PYSCF_AVAILABLE
     )
 
     st.markdown("---")
@@ -122,6 +335,89 @@ with st.sidebar:
 
         palabras_clave = st.text_input("Palabras clave extra", "D3BJ TIGHTSCF")
 
+    pasos_adicionales = []
+    nivel_preoptimizacion = None
+    if not modo_cribado:
+        if st.checkbox("⚡ Preoptimizar con un nivel barato", value=False,
+                       help="Optimiza primero con un método económico y entrega su geometría y orbitales al "
+                            "cálculo principal, que arranca ya cerca del mínimo"):
+            nivel_preoptimizacion = st.selectbox("Nivel de preoptimización", list(NIVELES_PREOPTIMIZACION.keys()))
+
+        trabajo_compuesto = st.checkbox(
+            "🔗 Trabajo compuesto (multi-paso)",
+            value=False,
+            help="Encadena pasos adicionales en una sola entrada de ORCA ($new_job), reutilizando geometría y orbitales"
+        )
+        if trabajo_compuesto:
+            st.caption("Pasos que se ejecutan después del cálculo principal, sobre su geometría final:")
+            tabla_pasos = st.data_editor(
+                pd.DataFrame([{"Tipo": "Punto Simple", "Método": "B3LYP", "Base": "def2-TZVP",
+                               "Palabras clave": "D3BJ TIGHTSCF", "NMR": True}]),
+                num_rows="dynamic",
+                hide_index=True,
+                column_config={
+                    "Tipo": st.column_config.SelectboxColumn(
+                        options=["Punto Simple", "Frecuencias (sin optimizar)", "Optimización de Geometría"],
+                        required=True),
+                    "Método": st.column_config.SelectboxColumn(
+                        options=["B3LYP", "PBE0", "M06-2X", "wB97X-D"], required=True),
+                    "Base": st.column_config.SelectboxColumn(
+                        options=["def2-SVP", "6-31+G(d,p)", "6-311++G(d,p)", "cc-pVDZ", "def2-TZVP",
+                                 "def2-TZVP-ZORA"], required=True),
+                    "NMR": st.column_config.CheckboxColumn(default=False),
+                }
+            )
+            pasos_adicionales = [
+                {"tipo_calculo": fila["Tipo"], "metodo": fila["Método"], "base": fila["Base"],
+                 "palabras_clave": fila["Palabras clave"] or "", "calc_nmr": bool(fila["NMR"])}
+                for _, fila in tabla_pasos.dropna(subset=["Tipo", "Método", "Base"]).iterrows()
+            ]
+
+    admision = {"decision": "aceptar", "motivos": []}
+    if conformeros:
+        st.markdown("---")
+        st.markdown("#### ⏱️ **Estimación de Coste**")
+        with st.expander("Presupuesto del Trabajo", expanded=False):
+            max_horas = st.number_input("Tiempo máximo (h)", min_value=0.1, value=PRESUPUESTO_HORAS)
+            max_memoria_mb = st.number_input("Memoria máxima (MB)", min_value=100.0, value=PRESUPUESTO_MEMORIA_MB,
+                                             step=1000.0)
+            politica = st.radio("Si se excede el presupuesto", ["rechazar", "baja_prioridad"],
+                                format_func=lambda p: {"rechazar": "Rechazar",
+                                                       "baja_prioridad": "Cola de baja prioridad"}[p])
+
+        pasos_coste = [paso_estimacion(tipo_calculo, conjunto_base, palabras_clave, calc_nmr)] + [
+            paso_estimacion(p["tipo_calculo"], p["base"], p["palabras_clave"], p["calc_nmr"]) for p in pasos_adicionales
+        ]
+        estimacion_coste = estimar_coste(conformeros[0], pasos_coste, obtener_modelo_coste())
+        if modo_cribado and estimacion_coste["tiempo_s"] is not None:
+            estimacion_coste["tiempo_s"] *= int(top_k)
+            # El nivel bajo corre siempre sobre todos los conformeros, repartido entre los procesos concedidos
+            if nivel_bajo in BASES_COSTE_BAJOS:
+                coste_bajo = estimar_coste(conformeros[0], [paso_estimacion("Optimización de Geometría",
+                                                                            BASES_COSTE_BAJOS[nivel_bajo])],
+                                           obtener_modelo_coste())
+                paralelos = max(1, min(int(trabajos_paralelos), *limitador.limites["orca"]))
+                estimacion_coste["tiempo_s"] += len(conformeros) * coste_bajo["tiempo_s"] / paralelos
+
+        if estimacion_coste["tiempo_s"] is None:
+            st.caption("No hay datos de la base seleccionada para estimar el coste.")
+        else:
+            col_a, col_b, col_c = st.columns(3)
+            with col_a:
+                st.metric("Funciones", estimacion_coste["num_funciones_base"])
+            with col_b:
+                st.metric("Tiempo", formatear_duracion(estimacion_coste["tiempo_s"]))
+            with col_c:
+                st.metric("Memoria", f"{estimacion_coste['memoria_mb'] / 1000:.1f} GB")
+            st.caption(f"Modelo ajustado con {estimacion_coste['trabajos_ajuste']} trabajos del historial"
+                       + (f" (top-{int(top_k)} confórmeros)" if modo_cribado else ""))
+
+            admision = decidir_admision(estimacion_coste, max_horas, max_memoria_mb, politica)
+            if admision["decision"] == "rechazar":
+                st.error("🚫 Excede el presupuesto: " + "; ".join(admision["motivos"]))
+            elif admision["decision"] == "baja_prioridad":
+                st.warning("🐢 Se ejecutará con baja prioridad: " + "; ".join(admision["motivos"]))
+
     st.markdown("---")
 
     st.markdown("#### 🚀 **Ejecutar Cálculo**")
@@ -130,18 +426,46 @@ with st.sidebar:
         type="primary",
         help="Inicia el cálculo cuántico con ORCA"
     )
+    carga_orca = limitador.estado()["orca"]
+    st.caption(f"🖥️ Servidor: {carga_orca['en_curso']}/{carga_orca['maximo']} trabajos ORCA en curso, "
+               f"{carga_orca['en_cola']} en cola, {carga_orca['baja_prioridad_en_cola']} en la cola de baja prioridad")
+
+    # Un proceso que sigue registrado al empezar la ejecucion del script quedo huerfano: el rerun interrumpio el
+    # bucle que lo vigilaba y libero su plaza, asi que no puede seguir corriendo fuera del limitador
+    if st.session_state.proceso_orca is not None:
+        if st.session_state.proceso_orca.poll() is None:
+            st.session_state.proceso_orca.kill()
+            st.session_state.proceso_orca.wait()
+            if not st.session_state.get("detener_orca"):
+                st.warning("⛔ El cálculo en curso se detuvo al interactuar con la página")
+        if st.session_state.get("detener_orca"):
+            st.warning("⛔ Cálculo detenido por el usuario")
+        st.session_state.proceso_orca = None
 
     if st.session_state.calculo_completado:
         if st.session_state.opt_convergida:
             st.success("✅ Cálculo completado")
         else:
             st.warning("⚠️ No convergió")
+        if st.session_state.intentos_recuperacion:
+            st.caption(f"🔁 {len(st.session_state.intentos_recuperacion)} reintento(s) automático(s)")
+        if st.session_state.datos_preoptimizacion is not None:
+            ahorrados = st.session_state.datos_preoptimizacion["Ciclos de alto nivel ahorrados (estimado)"]
+            if ahorrados is not None:
+                st.caption(f"⚡ Preoptimización: ~{ahorrados:.0f} ciclos caros ahorrados")
 
 if boton_ejecutar:
     if st.session_state.xyz_inicial is None:
         st.sidebar.error("Por favor, carga un archivo .xyz primero.")
+    elif not conformeros:
+        st.sidebar.error("El archivo .xyz no contiene una geometría válida.")
+    elif admision["decision"] == "rechazar":
+        st.sidebar.error("Trabajo rechazado por el control de admisión: " + "; ".join(admision["motivos"]))
     else:
-        claves_a_preservar = ['xyz_inicial', 'nombre_trabajo']
+        # Fuera de presupuesto: cola aparte que solo avanza cuando no espera nadie mas, y ORCA con nice
+        baja_prioridad = admision["decision"] == "baja_prioridad"
+        prioridad = PRIORIDAD_BAJA if baja_prioridad else 0
+        claves_a_preservar = ['xyz_inicial', 'nombre_trabajo', 'id_sesion']
         for key in st.session_state.keys():
             if key not in claves_a_preservar:
                 st.session_state[key] = None if not isinstance(st.session_state[key], bool) else False
@@ -149,49 +473,160 @@ if boton_ejecutar:
         st.session_state.ultimo_tipo_calculo = tipo_calculo
         nombre_trabajo = st.session_state.nombre_trabajo
 
-        contenido_entrada = Orca.generar_entrada(
-            st.session_state.xyz_inicial, tipo_calculo, metodo, conjunto_base, palabras_clave,
-            calc_nmr=calc_nmr
-        )
-
-        ruta_entrada = os.path.join(DIR_CALCULOS, f"{nombre_trabajo}.inp")
-        ruta_salida = os.path.join(DIR_CALCULOS, f"{nombre_trabajo}.out")
+        # Cada ejecucion tiene su propio directorio en el scratch; al terminar se promueve a DIR_CALCULOS
+        espacio = EspacioTrabajo(nombre_trabajo, DIR_CALCULOS)
+        ruta_salida = espacio.ruta(".out")
+        resultado_preopt = None
 
-        with open(ruta_entrada, "w") as f:
-            f.write(contenido_entrada)
+        if modo_cribado:
+            # El cribado ocupa tantas plazas como procesos paralelos, recortado al cupo del usuario
+            turno = esperar_turno("orca", "ORCA", int(trabajos_paralelos), baja_prioridad)
+            try:
+                with st.spinner(f"Cribando {len(conformeros)} confórmeros con {nivel_bajo}..."):
+                    resultado_cribado = ejecutar_cribado(
+                        conformeros, nombre_trabajo, espacio.directorio, nivel_bajo,
+                        (tipo_calculo, metodo, conjunto_base, palabras_clave, calc_nmr),
+                        ventana_kcal=ventana_kcal, umbral_rmsd=umbral_rmsd, top_k=int(top_k),
+                        trabajos_paralelos=turno.unidades, prioridad=prioridad, usar_simetria=usar_simetria,
+                        tolerancia_simetria=tolerancia_simetria
+                    )
+            finally:
+                limitador.liberar(turno)
+            st.session_state.datos_cribado = resultado_cribado["tabla"]
+            if resultado_cribado["ruta_salida_mejor"]:
+                ruta_salida = resultado_cribado["ruta_salida_mejor"]
+                st.session_state.calculo_completado = True
+            else:
+                st.error("Ningún confórmero completó el cálculo de alto nivel.")
+                ruta_salida = None
+        else:
+            st.sidebar.button("⛔ Detener cálculo", key="detener_orca",
+                              help="Termina el proceso de ORCA en curso (por ejemplo, si la optimización diverge)")
 
-        with st.spinner(f"Ejecutando ORCA para '{nombre_trabajo}'... Esto puede tardar varios minutos."):
+            turno = esperar_turno("orca", "ORCA", baja_prioridad=baja_prioridad)
             try:
-                comando = f"orca {ruta_entrada}"
-                proceso = subprocess.run(
-                    comando,
-                    shell=True,
-                    check=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=54000
+                molecula_inicial, orbitales_iniciales = conformeros[0], None
+                if simetrizar or usar_simetria:
+                    molecula_inicial = detectar_simetria(molecula_inicial, tolerancia_simetria)["molecula"]
+                if nivel_preoptimizacion:
+                    with st.spinner(f"⚡ Preoptimizando con {nivel_preoptimizacion}..."):
+                        resultado_preopt = preoptimizar(molecula_inicial, nombre_trabajo, espacio.directorio,
+                                                        nivel_preoptimizacion, prioridad)
+                    if "error" in resultado_preopt:
+                        st.warning(f"La preoptimización falló; se parte de la geometría original: "
+                                   f"{resultado_preopt['error']}")
+                    else:
+                        molecula_inicial = resultado_preopt["molecula"]
+                        if simetrizar or usar_simetria:
+                            molecula_inicial = detectar_simetria(molecula_inicial, tolerancia_simetria)["molecula"]
+                        # En trabajos encadenados %moinp pasaria a los $new_job siguientes: solo la geometria
+                        if not pasos_adicionales:
+                            orbitales_iniciales = resultado_preopt["orbitales"]
+
+                st.session_state.intentos_recuperacion = []
+                st.markdown(f"### ⏳ **Ejecutando ORCA para '{nombre_trabajo}'**")
+                panel_progreso = st.empty()
+                seguimientos = {}
+
+                def mostrar_progreso(proceso, ruta, transcurrido):
+                    st.session_state.proceso_orca = proceso
+                    seguimiento = seguimientos.setdefault(ruta, SeguimientoOrca(ruta))
+                    seguimiento.actualizar()
+                    progreso = seguimiento.estado()
+
+                    with panel_progreso.container():
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            st.metric("Paso de Geometría", progreso["paso_optimizacion"])
+                        with col2:
+                            st.metric("Iteración SCF", progreso["iteracion_scf"],
+                                      help=f"Energía SCF actual: {progreso['energia_scf']}")
+                        with col3:
+                            cambio = progreso["cambio_energia"]
+                            st.metric("ΔE (Eh)", f"{cambio:.2e}" if cambio is not None else "-")
+                        with col4:
+                            norma = progreso["norma_gradiente"]
+                            st.metric("|Gradiente|", f"{norma:.2e}" if norma is not None else "-")
+
+                        if len(seguimiento.energias_finales) > 1:
+                            st.line_chart(pd.DataFrame({"Energía (Eh)": seguimiento.energias_finales}))
+                        elif seguimiento.energias_scf:
+                            st.line_chart(pd.DataFrame({"Energía SCF (Eh)": seguimiento.energias_scf}))
+                        st.caption(f"⏱️ {transcurrido:.0f} s transcurridos")
+
+                # Fallos recuperables: se reanuda desde la ultima geometria y los orbitales con ajustes escalados
+                ruta_salida, intentos = ejecutar_con_recuperacion(
+                    espacio, molecula_inicial, tipo_orca, metodo, conjunto_base, palabras_clave, calc_nmr=calc_nmr,
+                    pasos_adicionales=pasos_adicionales, prioridad=prioridad, orbitales=orbitales_iniciales,
+                    usar_simetria=usar_simetria, al_sondear=mostrar_progreso
                 )
-                with open(ruta_salida, "w") as f_out:
-                    f_out.write(proceso.stdout)
-                    f_out.write(proceso.stderr)
-
+                st.session_state.proceso_orca = None
+                st.session_state.intentos_recuperacion = intentos
+                nombre_intento = os.path.splitext(os.path.basename(ruta_salida))[0]
+                for reintento in intentos:
+                    st.info(f"🔁 {reintento['Fallo'].capitalize()}: reintento {reintento['Intento']} de "
+                            f"{MAX_REINTENTOS} desde la última geometría ({reintento['Ajustes']})")
                 st.session_state.calculo_completado = True
             except subprocess.TimeoutExpired:
-                st.error("El cálculo de ORCA tardó demasiado (más de 10 minutos) y fue cancelado.")
+                st.error("El cálculo de ORCA tardó demasiado y fue cancelado.")
             except subprocess.CalledProcessError as e:
                 st.error("Error al ejecutar ORCA. Revisa los parámetros y el log.")
                 st.code(e.stderr)
             except Exception as e:
                 st.error(f"Error inesperado: {e}")
-
-        if os.path.exists(ruta_salida):
+            finally:
+                # Si un rerun interrumpe el bucle, ORCA no puede seguir corriendo despues de liberar la plaza
+                proceso_vivo = st.session_state.proceso_orca
+                if proceso_vivo is not None and proceso_vivo.poll() is None:
+                    proceso_vivo.kill()
+                    proceso_vivo.wait()
+                limitador.liberar(turno)
+
+            numfreq_pendiente = frecuencias_distribuidas and st.session_state.calculo_completado
+            if numfreq_pendiente and not Orca(ruta_salida).verificar_convergencia():
+                st.error("La optimización no convergió: no se calculan las frecuencias numéricas sobre una "
+                         "geometría que no es un punto estacionario.")
+            elif numfreq_pendiente:
+                turno = esperar_turno("orca", "ORCA", TRABAJOS_NUMFREQ, baja_prioridad)
+                try:
+                    molecula_optimizada = Orca(ruta_salida).extraer_molecula()
+                    orbitales = os.path.join(espacio.directorio, f"{nombre_intento}.gbw")
+                    if turno.unidades == 1 and not COORDINADOR_ORCA:
+                        st.warning("Los gradientes desplazados se ejecutarán de uno en uno (cupo de una plaza).")
+                    with st.spinner(f"📐 Calculando {6 * molecula_optimizada.num_atomos} gradientes desplazados "
+                                    f"en {turno.unidades} procesos..."):
+                        resultado_numfreq = calcular_frecuencias_numericas(
+                            molecula_optimizada, nombre_trabajo, espacio.directorio, metodo, conjunto_base,
+                            palabras_clave, trabajos_paralelos=turno.unidades,
+                            orbitales=orbitales if os.path.exists(orbitales) else None, prioridad=prioridad
+                        )
+                    if "error" in resultado_numfreq:
+                        st.error(f"Las frecuencias numéricas no se completaron: {resultado_numfreq['error']}")
+                    else:
+                        # El .hess alimenta los isotopologos y la seccion anexada al .out el espectro IR y el PDF
+                        escribir_hess(os.path.join(espacio.directorio, f"{nombre_intento}.hess"),
+                                      molecula_optimizada, resultado_numfreq)
+                        anexar_a_salida(ruta_salida, resultado_numfreq, molecula_optimizada)
+                except Exception as e:
+                    st.error(f"Error en las frecuencias numéricas: {e}")
+                finally:
+                    limitador.liberar(turno)
+
+        espacio.promover()
+        if ruta_salida:
+            ruta_salida = espacio.ruta_durable(ruta_salida)
+
+        if ruta_salida and resolver_artefacto(ruta_salida):
             try:
                 analizador = Orca(ruta_salida)
 
-                st.session_state.log_completo_orca = analizador.contenido
-                st.session_state.resumen_log_orca = "".join(analizador.contenido.splitlines(True)[-50:])
+                st.session_state.resumen_log_orca = "".join(leer_final(ruta_salida, 16000).splitlines(True)[-50:])
 
                 st.session_state.opt_convergida = analizador.verificar_convergencia()
+                if resultado_preopt is not None and "error" not in resultado_preopt:
+                    st.session_state.datos_preoptimizacion = resumen_ahorro(
+                        resultado_preopt, analizador.dividir_pasos()[0].extraer_pasos_optimizacion(),
+                        base_resultados.ciclos_optimizacion_tipicos(resultado_preopt["molecula"].num_atomos))
                 st.session_state.xyz_optimizada = analizador.extraer_geometria_optimizada()
                 st.session_state.energia_final = analizador.extraer_energia_final()
                 st.session_state.datos_energia = analizador.extraer_componentes_energia()
@@ -199,9 +634,51 @@ if boton_ejecutar:
                 st.session_state.datos_orbitales = analizador.extraer_energias_orbitales()
                 st.session_state.datos_cargas_reducidas = analizador.extraer_cargas_orbitales_reducidas()
                 st.session_state.datos_nmr = analizador.extraer_datos_nmr()
+                st.session_state.datos_tiempos = analizador.extraer_tiempos_modulos()
+                st.session_state.datos_iteraciones_scf = analizador.extraer_iteraciones_scf()
+                st.session_state.resumen_rendimiento = analizador.resumen_rendimiento()
+                if len(analizador.dividir_pasos()) > 1:
+                    st.session_state.datos_pasos = analizador.resumen_pasos()
+
+                ruta_rendimiento = os.path.join(espacio.destino, f"{nombre_trabajo}.rendimiento.json")
+                with open(ruta_rendimiento, "w") as f_rend:
+                    json.dump({
+                        "metodo": metodo,
+                        "base": conjunto_base,
+                        "palabras_clave": palabras_clave,
+                        "tipo_calculo": tipo_calculo,
+                        "calc_nmr": calc_nmr,
+                        **st.session_state.resumen_rendimiento
+                    }, f_rend, indent=2)
+
+                # Las palabras clave se leen del eco de la entrada (incluyen OPT/FREQ/NMR), igual que en la ingesta,
+                # para que el modelo de coste vea el calculo completo
+                base_resultados.registrar(ruta_salida, metodo=metodo, base=conjunto_base, tipo_calculo=tipo_calculo)
+                obtener_modelo_coste.clear()
+
+                if calc_nmr and calc_desplazamientos and st.session_state.datos_nmr is not None:
+                    elementos_nmr = st.session_state.datos_nmr["Elemento"].unique()
+                    faltantes = referencias_faltantes(base_resultados, elementos_nmr, metodo, conjunto_base,
+                                                      palabras_clave)
+                    try:
+                        aviso = (f"Calculando la referencia {', '.join(faltantes)} a {metodo}/{conjunto_base} "
+                                 f"(solo la primera vez para este nivel)..." if faltantes
+                                 else "Convirtiendo a desplazamientos químicos...")
+                        with st.spinner(aviso):
+                            referencias = obtener_referencias(base_resultados, elementos_nmr, metodo, conjunto_base,
+                                                              palabras_clave, DIR_CALCULOS, prioridad=prioridad,
+                                                              reservar_plaza=lambda: plaza_orca(baja_prioridad))
+                        st.session_state.datos_nmr = convertir_a_desplazamientos(st.session_state.datos_nmr,
+                                                                                 referencias)
+                    except Exception as e:
+                        st.warning(f"No se pudieron calcular los desplazamientos químicos: {e}")
 
                 if tipo_calculo == "Frecuencias Vibracionales (IR)":
                     st.session_state.datos_ir = analizador.extraer_espectro_ir(factor_escalamiento)
+                    st.session_state.datos_termoquimica = analizador.extraer_termoquimica()
+                    st.session_state.parametros_termoquimica = parametros_desde_orca(analizador)
+                    st.session_state.datos_modos_normales = analizador.extraer_modos_normales()
+                    st.session_state.ruta_hess = resolver_artefacto(os.path.splitext(ruta_salida)[0] + ".hess")
 
             except Exception as e:
                 st.error(f"Ocurrió un error al analizar el archivo de salida: {e}")
@@ -209,13 +686,17 @@ if boton_ejecutar:
         if calc_susceptibilidad:
             xyz_para_pyscf = st.session_state.xyz_optimizada if st.session_state.xyz_optimizada else st.session_state.xyz_inicial
 
-            with st.spinner("🧲 Calculando susceptibilidad magnética con PySCF..."):
-                resultados = PySCFCalculator.calcular_susceptibilidad(
-                    xyz_para_pyscf,
-                    metodo=metodo,
-                    base=conjunto_base
-                )
-                st.session_state.datos_susceptibilidad = resultados
+            turno = esperar_turno("pyscf", "PySCF")
+            try:
+                with st.spinner("🧲 Calculando susceptibilidad magnética con PySCF..."):
+                    resultados = PySCFCalculator.calcular_susceptibilidad(
+                        xyz_para_pyscf,
+                        metodo=metodo,
+                        base=conjunto_base
+                    )
+                    st.session_state.datos_susceptibilidad = resultados
+            finally:
+                limitador.liberar(turno)
 
         st.rerun()
 
@@ -229,14 +710,14 @@ if st.session_state.energia_final is not None:
         st.metric("📊 Estado", estado)
     with col3:
         if st.session_state.xyz_optimizada:
-            num_atomos = len([l for l in st.session_state.xyz_optimizada.split('\n')[2:] if l.strip()])
+            num_atomos = Molecula.desde_xyz(st.session_state.xyz_optimizada).num_atomos
             st.metric("⚛️ Átomos", f"{num_atomos}")
     with col4:
         st.metric("🧮 Método", f"{metodo}/{conjunto_base}")
     st.markdown("---")
 
 tabs = st.tabs(["🔬 **Visualización 3D**", "📈 **Espectroscopía**", "🧲 **Magnetismo**", "⚡ **Análisis Energético**",
-                "🔧 **Datos Técnicos**"])
+                "🔧 **Datos Técnicos**", "🗄️ **Resultados Guardados**"])
 
 with tabs[0]:
     if not st.session_state.calculo_completado and st.session_state.xyz_inicial is None:
@@ -246,24 +727,14 @@ with tabs[0]:
     with col1:
         st.markdown("### 🧪 **Geometría Inicial**")
         if st.session_state.xyz_inicial:
-            vista = py3Dmol.view(width=400, height=400)
-            vista.addModel(st.session_state.xyz_inicial, 'xyz')
-            vista.setStyle({'stick': {'radius': 0.15}, 'sphere': {'radius': 0.3}})
-            vista.setBackgroundColor('#F7F7F7')
-            vista.zoomTo()
-            showmol(vista, height=450, width=450)
+            componentes.html(html_geometria(st.session_state.xyz_inicial, 450, 450), height=460, width=460)
 
     with col2:
         st.markdown("### 🎯 **Geometría Optimizada**")
         if st.session_state.xyz_optimizada:
             if not st.session_state.opt_convergida:
                 st.warning("⚠️ Geometría no completamente optimizada.")
-            vista_opt = py3Dmol.view(width=400, height=400)
-            vista_opt.addModel(st.session_state.xyz_optimizada, 'xyz')
-            vista_opt.setStyle({'stick': {'radius': 0.15}, 'sphere': {'radius': 0.3}})
-            vista_opt.setBackgroundColor('#F7F7F7')
-            vista_opt.zoomTo()
-            showmol(vista_opt, height=450, width=450)
+            componentes.html(html_geometria(st.session_state.xyz_optimizada, 450, 450), height=460, width=460)
 
 with tabs[1]:
     ir_disponible = st.session_state.datos_ir is not None and not st.session_state.datos_ir.empty
@@ -271,6 +742,8 @@ with tabs[1]:
 
     if ir_disponible:
         st.markdown("### 📊 **Espectro Infrarrojo (IR)**")
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=(12, 6))
         ax.stem(st.session_state.datos_ir["Frequency"], st.session_state.datos_ir["Intensity"], basefmt=' ',
                 linefmt='red', markerfmt='ro')
@@ -282,6 +755,46 @@ with tabs[1]:
         st.pyplot(fig)
         st.dataframe(st.session_state.datos_ir.style.format({"Frequency": "{:.2f}", "Intensity": "{:.2f}"}))
 
+        modos_normales = st.session_state.datos_modos_normales
+        frecuencias = (st.session_state.parametros_termoquimica or {}).get("frecuencias_cm")
+        if modos_normales is not None and frecuencias is not None and st.session_state.xyz_optimizada:
+            st.markdown("### 🎞️ **Modos Normales**")
+            modos_vibracionales = [i for i, f in enumerate(frecuencias) if abs(f) > 1.0]
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                modo = st.selectbox("Modo", modos_vibracionales,
+                                    format_func=lambda i: f"Modo {i}: {frecuencias[i]:.2f} cm⁻¹")
+                amplitud = st.slider("Amplitud (Å)", min_value=0.1, max_value=1.5, value=0.5, step=0.1)
+                num_cuadros = st.slider("Cuadros por ciclo", min_value=8, max_value=60, value=20, step=2)
+
+            with col2:
+                componentes.html(html_modo_normal(st.session_state.xyz_optimizada, modos_normales[:, modo], amplitud,
+                                                  num_cuadros), height=430, width=530)
+
+        if st.session_state.ruta_hess:
+            st.markdown("### 🧬 **Isotopólogos**")
+            st.caption("Frecuencias recalculadas desde la Hessiana del archivo .hess, sin volver a ejecutar ORCA. "
+                       "Índices de átomo desde 0, como en ORCA. Isótopos: " + ", ".join(ISOTOPOS))
+            col1, col2 = st.columns(2)
+            with col1:
+                texto_sustituciones = st.text_input("Sustituciones (átomo:isótopo)", "",
+                                                    placeholder="1:D, 2:D")
+            with col2:
+                proyeccion = st.selectbox("Proyección", list(PROYECCIONES), format_func=PROYECCIONES.get)
+            try:
+                datos_hess = leer_hessiana(st.session_state.ruta_hess)
+                referencia = isotopologo(datos_hess, proyeccion=proyeccion, factor_escala=factor_escalamiento)
+                sustituido = isotopologo(datos_hess, interpretar_sustituciones(texto_sustituciones), proyeccion,
+                                         factor_escalamiento)
+                st.dataframe(tabla_isotopologo(referencia, sustituido).style.format(precision=2),
+                             use_container_width=True, hide_index=True)
+                if st.session_state.parametros_termoquimica is not None:
+                    zpe = [calcular_termoquimica(**parametros_termoquimica_isotopologo(
+                        st.session_state.parametros_termoquimica, r))["zpe"] for r in (referencia, sustituido)]
+                    st.metric("ZPE del isotopólogo (Eh)", f"{zpe[1]:.6f}", f"{zpe[1] - zpe[0]:+.6f}")
+            except ValueError as e:
+                st.error(f"Sustitución isotópica inválida: {e}")
+
     elif not ir_disponible and st.session_state.ultimo_tipo_calculo == "Frecuencias Vibracionales (IR)":
         st.warning("⚠️ No se encontraron datos IR. Verifica que la optimización haya convergido.")
 
@@ -290,12 +803,15 @@ with tabs[1]:
 
     if nmr_disponible:
         st.markdown("### 🛡️ **Apantallamiento Nuclear (NMR)**")
-        st.info("Valores de apantallamiento isotrópico (ppm). Valores más altos indican mayor apantallamiento.")
+        st.info("Valores de apantallamiento isotrópico (ppm). Valores más altos indican mayor apantallamiento."
+                + (" El desplazamiento químico δ = σ(referencia) − σ está calculado al mismo nivel de teoría."
+                   if "Desplazamiento (ppm)" in st.session_state.datos_nmr else ""))
         st.dataframe(st.session_state.datos_nmr.style.format({
             "Núcleo": "{}",
             "Elemento": "{}",
             "Isotrópico (ppm)": "{:.3f}",
-            "Anisotropía (ppm)": "{:.3f}"
+            "Anisotropía (ppm)": "{:.3f}",
+            "Desplazamiento (ppm)": "{:.2f}"
         }), use_container_width=True)
 
     if not ir_disponible and not nmr_disponible:
@@ -343,6 +859,8 @@ with tabs[2]:
         st.dataframe(tensor_df.style.format("{:.6f}"), use_container_width=True)
 
         st.markdown("#### 📈 **Componentes del Tensor**")
+        import matplotlib.pyplot as plt
+
         fig, ax = plt.subplots(figsize=(10, 6))
         componentes = ['χ_XX', 'χ_YY', 'χ_ZZ']
         valores = [datos['tensor'][0][0], datos['tensor'][1][1], datos['tensor'][2][2]]
@@ -378,10 +896,83 @@ with tabs[3]:
     if not st.session_state.calculo_completado:
         st.info("💡 Ejecuta un cálculo para ver el análisis detallado.")
     else:
+        if st.session_state.datos_cribado is not None:
+            st.markdown("### 🧬 **Cribado de Confórmeros**")
+            tabla_cribado = st.session_state.datos_cribado
+            promovidos = int((tabla_cribado["Estado"] == "Promovido").sum())
+            st.caption(f"{promovidos} de {len(tabla_cribado)} confórmeros calculados al nivel {metodo}/{conjunto_base}")
+            st.dataframe(tabla_cribado, use_container_width=True, hide_index=True)
+
+        if st.session_state.datos_preoptimizacion is not None:
+            ahorro = st.session_state.datos_preoptimizacion
+            st.markdown("### ⚡ **Preoptimización**")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(f"Ciclos {ahorro['Nivel barato']} ejecutados", ahorro["Ciclos nivel barato"])
+            with col2:
+                st.metric("Ciclos de alto nivel", ahorro["Ciclos nivel alto"])
+            with col3:
+                referencia = ahorro["Ciclos de referencia (historial)"]
+                st.metric("Ciclos caros ahorrados (est.)",
+                          "-" if referencia is None else f"{ahorro['Ciclos de alto nivel ahorrados (estimado)']:.0f}",
+                          help="Mediana de ciclos de optimizaciones convergidas de tamaño parecido (±25 % de átomos) "
+                               "que partieron sin orbitales previos, menos los ciclos de alto nivel de este trabajo")
+            if ahorro["Ahorro estimado (%)"] is not None:
+                st.caption(f"Ahorro estimado en evaluaciones de gradiente de alto nivel: "
+                           f"{ahorro['Ahorro estimado (%)']}% (referencia: {referencia:.0f} ciclos en el historial)")
+            else:
+                st.caption("Aún no hay optimizaciones de tamaño parecido en la base de resultados para estimar el "
+                           "ahorro.")
+
+        if st.session_state.intentos_recuperacion:
+            st.markdown("### 🔁 **Recuperación Automática**")
+            st.caption("Cada reintento reanudó desde la última geometría (y los orbitales, si existían) del anterior")
+            st.dataframe(pd.DataFrame(st.session_state.intentos_recuperacion), use_container_width=True,
+                         hide_index=True)
+
+        if st.session_state.datos_pasos is not None:
+            st.markdown("### 🔗 **Resultados por Paso**")
+            st.dataframe(st.session_state.datos_pasos, use_container_width=True, hide_index=True)
+
         st.markdown("### ⚡ **Componentes Energéticos**")
         if st.session_state.datos_energia is not None and not st.session_state.datos_energia.empty:
             st.dataframe(st.session_state.datos_energia)
 
+        if st.session_state.parametros_termoquimica is not None:
+            st.markdown("### 🌡️ **Termoquímica**")
+            if st.session_state.datos_termoquimica is not None:
+                st.write("**Valores de ORCA (Eh)**")
+                st.dataframe(st.session_state.datos_termoquimica.style.format("{:.8f}"))
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                rango_t = st.slider("Temperatura (K)", min_value=10, max_value=2000, value=(200, 800), step=10)
+                puntos_t = st.number_input("Puntos de temperatura", min_value=2, max_value=5000, value=61)
+            with col2:
+                texto_presiones = st.text_input("Presiones (atm, separadas por coma)", "1.0, 10.0")
+            with col3:
+                usar_qrrho = st.checkbox("Quasi-RRHO (Grimme)", value=True,
+                                         help="Trata las frecuencias bajas como rotores libres en la entropía")
+                frecuencia_referencia = st.number_input("Frecuencia de referencia (cm⁻¹)", min_value=1.0,
+                                                        value=100.0, step=10.0)
+
+            try:
+                presiones = [float(v) for v in texto_presiones.split(',') if v.strip()]
+                barrido = calcular_termoquimica(
+                    **st.session_state.parametros_termoquimica,
+                    temperaturas=np.linspace(rango_t[0], rango_t[1], int(puntos_t)),
+                    presiones_atm=presiones,
+                    qrrho=usar_qrrho,
+                    frecuencia_referencia=frecuencia_referencia
+                )
+                st.line_chart(pd.DataFrame(
+                    barrido["G"], index=barrido["temperaturas"],
+                    columns=[f"G a {p:g} atm (Eh)" for p in barrido["presiones_atm"]]
+                ))
+                st.dataframe(tabla_termoquimica(barrido), use_container_width=True, hide_index=True)
+            except ValueError as e:
+                st.error(f"Parámetros de termoquímica inválidos: {e}")
+
         st.markdown("### 🔋 **Energías Orbitales**")
         if st.session_state.datos_orbitales is not None and not st.session_state.datos_orbitales.empty:
             st.dataframe(st.session_state.datos_orbitales)
@@ -411,6 +1002,32 @@ with tabs[4]:
     if not st.session_state.calculo_completado:
         st.info("💡 Ejecuta un cálculo para generar el reporte.")
     else:
+        if st.session_state.resumen_rendimiento:
+            st.markdown("### ⏱️ **Rendimiento del Cálculo**")
+            resumen = st.session_state.resumen_rendimiento
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                tiempo_total = resumen["tiempo_total_s"]
+                st.metric("Tiempo Total", f"{tiempo_total:.1f} s" if tiempo_total is not None else "N/D")
+            with col2:
+                st.metric("Pasos de Optimización", resumen["pasos_optimizacion"])
+            with col3:
+                st.metric("Cálculos SCF", resumen["calculos_scf"])
+            with col4:
+                st.metric("Iteraciones SCF", resumen["iteraciones_scf_total"])
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("#### Tiempo por Módulo")
+                if st.session_state.datos_tiempos is not None:
+                    st.dataframe(st.session_state.datos_tiempos.style.format(
+                        {"Tiempo (s)": "{:.3f}", "Porcentaje": "{:.1f}"}), use_container_width=True)
+            with col2:
+                st.markdown("#### Iteraciones SCF por Paso")
+                if st.session_state.datos_iteraciones_scf is not None:
+                    st.dataframe(st.session_state.datos_iteraciones_scf, use_container_width=True)
+            st.markdown("---")
+
         st.markdown("### 📄 **Generación de Reporte PDF**")
         st.markdown("---")
 
@@ -470,9 +1087,13 @@ with tabs[4]:
         col_btn1, col_btn2, col_btn3 = st.columns([1, 1, 2])
 
         with col_btn1:
-            if st.button("📥 **Generar PDF**", type="primary", use_container_width=True):
+            if st.button("📥 **Generar PDF**", type="primary", use_container_width=True,
+                         disabled=not REPORTE_DISPONIBLE,
+                         help=None if REPORTE_DISPONIBLE else "Requiere reportlab y matplotlib"):
                 with st.spinner("🔄 Generando reporte PDF..."):
                     try:
+                        from documento import generar_reporte_completo
+
                         pdf_buffer = generar_reporte_completo(
                             nombre_trabajo=st.session_state.nombre_trabajo,
                             metodo=metodo,
@@ -507,5 +1128,44 @@ with tabs[4]:
                     use_container_width=True
                 )
 
+with tabs[5]:
+    st.markdown("### 🗄️ **Consulta de Resultados**")
+    st.caption(f"{base_resultados.contar()} trabajos registrados")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        filtro_formula = st.text_input("Fórmula (Hill)", "", help="Ej. H2O, CH4, C6H6")
+        filtro_metodo = st.text_input("Método", "")
+    with col2:
+        filtro_base = st.text_input("Base", "")
+        filtro_atomos = st.number_input("Átomos máximos", min_value=0, value=0, help="0 = sin límite")
+    with col3:
+        filtro_gap = st.number_input("Gap HOMO-LUMO mínimo (eV)", value=0.0, step=0.5)
+        filtro_convergidos = st.checkbox("Solo convergidos", value=True)
+
+    resultados_bd = base_resultados.consultar(
+        formula=filtro_formula.strip() or None,
+        metodo=filtro_metodo.strip() or None,
+        base=filtro_base.strip() or None,
+        gap_min=filtro_gap if filtro_gap > 0 else None,
+        num_atomos_max=filtro_atomos or None,
+        solo_convergidos=filtro_convergidos
+    )
+
+    if resultados_bd.empty:
+        st.info("💡 No hay trabajos que cumplan los filtros.")
+    else:
+        st.dataframe(resultados_bd, use_container_width=True, hide_index=True)
+
+        trabajo_id = st.selectbox("Ver detalle del trabajo", resultados_bd["id"].tolist(),
+                                  format_func=lambda i: f"{i} - {resultados_bd.set_index('id').loc[i, 'nombre']}")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("#### Átomos")
+            st.dataframe(base_resultados.obtener_atomos(trabajo_id), use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("#### Modos Vibracionales")
+            st.dataframe(base_resultados.obtener_modos(trabajo_id), use_container_width=True, hide_index=True)
+
 st.markdown("---")
 st.markdown("*Desarrollado con Streamlit • Cálculos cuánticos con ORCA y PySCF*")
\ No newline at end of file
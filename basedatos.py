@@ -0,0 +1,365 @@
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from almacen import resolver_artefacto, ruta_logica
+from utils import Orca
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY,
+    ruta TEXT UNIQUE NOT NULL,
+    nombre TEXT,
+    formula TEXT,
+    num_atomos INTEGER,
+    num_funciones_base INTEGER,
+    metodo TEXT COLLATE NOCASE,
+    base TEXT COLLATE NOCASE,
+    palabras_clave TEXT,
+    tipo_calculo TEXT,
+    convergido INTEGER,
+    energia_final REAL,
+    homo_ev REAL,
+    lumo_ev REAL,
+    gap_ev REAL,
+    tiempo_total_s REAL,
+    pasos_optimizacion INTEGER,
+    iteraciones_scf_total INTEGER,
+    mtime REAL,
+    tamano INTEGER,
+    fecha_registro REAL
+);
+CREATE TABLE IF NOT EXISTS atomos (
+    trabajo_id INTEGER NOT NULL REFERENCES trabajos(id) ON DELETE CASCADE,
+    indice INTEGER NOT NULL,
+    elemento TEXT,
+    x REAL,
+    y REAL,
+    z REAL,
+    carga_mulliken REAL,
+    carga_loewdin REAL,
+    nmr_isotropico REAL,
+    nmr_anisotropia REAL,
+    PRIMARY KEY (trabajo_id, indice)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS modos (
+    trabajo_id INTEGER NOT NULL REFERENCES trabajos(id) ON DELETE CASCADE,
+    indice INTEGER NOT NULL,
+    frecuencia REAL,
+    intensidad REAL,
+    PRIMARY KEY (trabajo_id, indice)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS referencias_nmr (
+    referencia TEXT NOT NULL,
+    nucleo TEXT NOT NULL,
+    metodo TEXT NOT NULL,
+    base TEXT NOT NULL,
+    palabras_clave TEXT NOT NULL,
+    apantallamiento REAL,
+    ruta TEXT,
+    fecha REAL,
+    PRIMARY KEY (referencia, nucleo, metodo, base, palabras_clave)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fallos_ingesta (
+    ruta TEXT PRIMARY KEY,
+    mtime REAL,
+    tamano INTEGER,
+    error TEXT,
+    fecha REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_nivel_gap ON trabajos (metodo, base, gap_ev);
+CREATE INDEX IF NOT EXISTS idx_trabajos_formula ON trabajos (formula);
+CREATE INDEX IF NOT EXISTS idx_trabajos_gap ON trabajos (gap_ev);
+CREATE INDEX IF NOT EXISTS idx_trabajos_energia ON trabajos (energia_final);
+CREATE INDEX IF NOT EXISTS idx_trabajos_num_atomos ON trabajos (num_atomos);
+CREATE INDEX IF NOT EXISTS idx_atomos_elemento ON atomos (elemento);
+CREATE INDEX IF NOT EXISTS idx_modos_frecuencia ON modos (frecuencia);
+"""
+
+COLUMNAS_TRABAJO = [
+    "ruta", "nombre", "formula", "num_atomos", "num_funciones_base", "metodo", "base", "palabras_clave",
+    "tipo_calculo", "convergido", "energia_final", "homo_ev", "lumo_ev", "gap_ev", "tiempo_total_s",
+    "pasos_optimizacion", "iteraciones_scf_total", "mtime", "tamano", "fecha_registro"
+]
+
+# Columnas agregadas despues de la primera version del esquema (se anaden a bases existentes)
+COLUMNAS_AGREGADAS = [("num_funciones_base", "INTEGER")]
+
+
+def extraer_registro(ruta_salida, metodo=None, base=None, palabras_clave=None, tipo_calculo=None):
+    ruta_salida = ruta_logica(ruta_salida)
+    analizador = Orca(ruta_salida)
+
+    linea_clave = analizador.extraer_palabras_clave()
+    tokens = linea_clave.split()
+    if metodo is None and tokens:
+        metodo = tokens[0]
+    if base is None and len(tokens) > 1:
+        base = tokens[1]
+    if palabras_clave is None:
+        palabras_clave = linea_clave
+    if tipo_calculo is None:
+        claves = {token.upper() for token in tokens}
+        tipo_calculo = "FREQ" if "FREQ" in claves else "OPT" if "OPT" in claves else "SP"
+
+    atomos = []
+    molecula = analizador.extraer_molecula()
+    if molecula is not None:
+        for indice, (elemento, (x, y, z)) in enumerate(zip(molecula.elementos, molecula.coordenadas.tolist())):
+            atomos.append({
+                "indice": indice, "elemento": elemento, "x": x, "y": y, "z": z,
+                "carga_mulliken": None, "carga_loewdin": None,
+                "nmr_isotropico": None, "nmr_anisotropia": None
+            })
+
+    cargas = analizador.extraer_cargas_atomicas() or {}
+    for tipo, columna in (("Mulliken", "carga_mulliken"), ("Loewdin", "carga_loewdin")):
+        if tipo in cargas:
+            for atomo, carga in zip(atomos, cargas[tipo]["Carga"]):
+                atomo[columna] = float(carga)
+
+    datos_nmr = analizador.extraer_datos_nmr()
+    if datos_nmr is not None:
+        for _, fila in datos_nmr.iterrows():
+            if 0 <= fila["Nucleo"] < len(atomos):
+                atomos[fila["Nucleo"]]["nmr_isotropico"] = float(fila["Isotropico (ppm)"])
+                atomos[fila["Nucleo"]]["nmr_anisotropia"] = float(fila["Anisotropia (ppm)"])
+
+    modos = []
+    datos_ir = analizador.extraer_espectro_ir()
+    if not datos_ir.empty:
+        modos = [{"indice": i, "frecuencia": float(f), "intensidad": float(inten)}
+                 for i, (f, inten) in enumerate(zip(datos_ir["Frequency"], datos_ir["Intensity"]))]
+
+    homo = lumo = gap = None
+    orbitales = analizador.extraer_energias_orbitales()
+    if orbitales is not None:
+        ocupados = orbitales[orbitales["Ocupacion"] > 0]
+        vacios = orbitales[orbitales["Ocupacion"] == 0]
+        if not ocupados.empty and not vacios.empty:
+            homo = float(ocupados["Energia (eV)"].iloc[-1])
+            lumo = float(vacios["Energia (eV)"].iloc[0])
+            gap = lumo - homo
+
+    rendimiento = analizador.resumen_rendimiento()
+    estado = os.stat(resolver_artefacto(ruta_salida))
+
+    trabajo = {
+        "ruta": os.path.abspath(ruta_salida),
+        "nombre": os.path.splitext(os.path.basename(ruta_salida))[0],
+        "formula": molecula.formula if atomos else None,
+        "num_atomos": len(atomos),
+        "num_funciones_base": rendimiento["num_funciones_base"],
+        "metodo": metodo,
+        "base": base,
+        "palabras_clave": palabras_clave,
+        "tipo_calculo": tipo_calculo,
+        "convergido": int(analizador.calculo_convergido()),
+        "energia_final": analizador.extraer_energia_final(),
+        "homo_ev": homo,
+        "lumo_ev": lumo,
+        "gap_ev": gap,
+        "tiempo_total_s": rendimiento["tiempo_total_s"],
+        "pasos_optimizacion": rendimiento["pasos_optimizacion"],
+        "iteraciones_scf_total": rendimiento["iteraciones_scf_total"],
+        "mtime": estado.st_mtime,
+        "tamano": estado.st_size,
+        "fecha_registro": time.time()
+    }
+
+    return {"trabajo": trabajo, "atomos": atomos, "modos": modos}
+
+
+class BaseResultados:
+    def __init__(self, ruta_bd):
+        self.ruta_bd = ruta_bd
+        directorio = os.path.dirname(ruta_bd)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        conexion = self._conectar()
+        try:
+            conexion.executescript(ESQUEMA)
+            existentes = {fila[1] for fila in conexion.execute("PRAGMA table_info(trabajos)")}
+            for columna, tipo in COLUMNAS_AGREGADAS:
+                if columna not in existentes:
+                    conexion.execute(f"ALTER TABLE trabajos ADD COLUMN {columna} {tipo}")
+            if conexion.execute("PRAGMA user_version").fetchone()[0] < 1:
+                conexion.execute("UPDATE trabajos SET mtime = NULL WHERE convergido = 0 AND pasos_optimizacion = 0")
+                conexion.execute("PRAGMA user_version = 1")
+            conexion.commit()
+        finally:
+            conexion.close()
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta_bd, timeout=30)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.execute("PRAGMA foreign_keys=ON")
+        return conexion
+
+    def guardar(self, registros):
+        if not registros:
+            return 0
+
+        columnas = ", ".join(COLUMNAS_TRABAJO)
+        marcadores = ", ".join(f":{c}" for c in COLUMNAS_TRABAJO)
+        actualizacion = ", ".join(f"{c}=excluded.{c}" for c in COLUMNAS_TRABAJO if c != "ruta")
+
+        conexion = self._conectar()
+        try:
+            with conexion:
+                for registro in registros:
+                    trabajo_id = conexion.execute(
+                        f"INSERT INTO trabajos ({columnas}) VALUES ({marcadores}) "
+                        f"ON CONFLICT(ruta) DO UPDATE SET {actualizacion} RETURNING id",
+                        registro["trabajo"]
+                    ).fetchone()[0]
+
+                    conexion.execute("DELETE FROM atomos WHERE trabajo_id = ?", (trabajo_id,))
+                    conexion.execute("DELETE FROM modos WHERE trabajo_id = ?", (trabajo_id,))
+                    conexion.executemany(
+                        "INSERT INTO atomos VALUES (:trabajo_id, :indice, :elemento, :x, :y, :z, "
+                        ":carga_mulliken, :carga_loewdin, :nmr_isotropico, :nmr_anisotropia)",
+                        [{**atomo, "trabajo_id": trabajo_id} for atomo in registro["atomos"]]
+                    )
+                    conexion.execute("DELETE FROM fallos_ingesta WHERE ruta = ?", (registro["trabajo"]["ruta"],))
+                    conexion.executemany(
+                        "INSERT INTO modos VALUES (:trabajo_id, :indice, :frecuencia, :intensidad)",
+                        [{**modo, "trabajo_id": trabajo_id} for modo in registro["modos"]]
+                    )
+        finally:
+            conexion.close()
+
+        return len(registros)
+
+    def registrar_fallos(self, fallos):
+        conexion = self._conectar()
+        try:
+            with conexion:
+                conexion.executemany(
+                    "INSERT OR REPLACE INTO fallos_ingesta VALUES (:ruta, :mtime, :tamano, :error, :fecha)", fallos)
+        finally:
+            conexion.close()
+
+    def huellas_archivos(self, incluir_fallos=True):
+        conexion = self._conectar()
+        try:
+            huellas = {ruta: (mtime, tamano) for ruta, mtime, tamano in
+                       conexion.execute("SELECT ruta, mtime, tamano FROM trabajos")}
+            if incluir_fallos:
+                huellas.update({ruta: (mtime, tamano) for ruta, mtime, tamano in
+                                conexion.execute("SELECT ruta, mtime, tamano FROM fallos_ingesta")})
+            return huellas
+        finally:
+            conexion.close()
+
+    def registrar(self, ruta_salida, metodo=None, base=None, palabras_clave=None, tipo_calculo=None):
+        registro = extraer_registro(ruta_salida, metodo, base, palabras_clave, tipo_calculo)
+        self.guardar([registro])
+        return registro["trabajo"]
+
+    def consultar(self, formula=None, metodo=None, base=None, gap_min=None, gap_max=None,
+                  num_atomos_max=None, solo_convergidos=False, limite=1000):
+        condiciones = []
+        parametros = []
+        if formula:
+            condiciones.append("formula = ?")
+            parametros.append(formula)
+        if metodo:
+            condiciones.append("metodo = ?")
+            parametros.append(metodo)
+        if base:
+            condiciones.append("base = ?")
+            parametros.append(base)
+        if gap_min is not None:
+            condiciones.append("gap_ev >= ?")
+            parametros.append(gap_min)
+        if gap_max is not None:
+            condiciones.append("gap_ev <= ?")
+            parametros.append(gap_max)
+        if num_atomos_max is not None:
+            condiciones.append("num_atomos <= ?")
+            parametros.append(num_atomos_max)
+        if solo_convergidos:
+            condiciones.append("convergido = 1")
+
+        consulta = ("SELECT id, nombre, formula, num_atomos, metodo, base, palabras_clave, tipo_calculo, "
+                    "convergido, energia_final, homo_ev, lumo_ev, gap_ev, tiempo_total_s, ruta FROM trabajos")
+        if condiciones:
+            consulta += " WHERE " + " AND ".join(condiciones)
+        consulta += " ORDER BY id DESC LIMIT ?"
+        parametros.append(int(limite))
+
+        conexion = self._conectar()
+        try:
+            return pd.read_sql_query(consulta, conexion, params=parametros)
+        finally:
+            conexion.close()
+
+    def obtener_atomos(self, trabajo_id):
+        conexion = self._conectar()
+        try:
+            return pd.read_sql_query("SELECT * FROM atomos WHERE trabajo_id = ? ORDER BY indice",
+                                     conexion, params=(trabajo_id,))
+        finally:
+            conexion.close()
+
+    def obtener_modos(self, trabajo_id):
+        conexion = self._conectar()
+        try:
+            return pd.read_sql_query("SELECT * FROM modos WHERE trabajo_id = ? ORDER BY indice",
+                                     conexion, params=(trabajo_id,))
+        finally:
+            conexion.close()
+
+    def historial_tiempos(self):
+        conexion = self._conectar()
+        try:
+            return pd.read_sql_query(
+                "SELECT num_atomos, num_funciones_base, palabras_clave, tiempo_total_s, pasos_optimizacion "
+                "FROM trabajos WHERE tiempo_total_s > 0 AND num_funciones_base > 0", conexion)
+        finally:
+            conexion.close()
+
+    def ciclos_optimizacion_tipicos(self, num_atomos, margen=0.25):
+        # Mediana de ciclos de optimizaciones convergidas de tamano parecido que partieron de cero: las que leyeron
+        # orbitales (MORead) venian de una preoptimizacion o de un reintento y acortarian la referencia
+        conexion = self._conectar()
+        try:
+            ciclos = pd.read_sql_query(
+                "SELECT pasos_optimizacion FROM trabajos WHERE convergido = 1 AND pasos_optimizacion > 0 "
+                "AND num_atomos BETWEEN ? AND ? AND upper(coalesce(palabras_clave, '')) NOT LIKE '%MOREAD%'",
+                conexion, params=(num_atomos * (1 - margen), num_atomos * (1 + margen)))["pasos_optimizacion"]
+        finally:
+            conexion.close()
+        return float(ciclos.median()) if len(ciclos) else None
+
+    def referencias_nmr(self, referencia, metodo, base, palabras_clave):
+        conexion = self._conectar()
+        try:
+            return {nucleo: apantallamiento for nucleo, apantallamiento in conexion.execute(
+                "SELECT nucleo, apantallamiento FROM referencias_nmr "
+                "WHERE referencia = ? AND metodo = ? AND base = ? AND palabras_clave = ?",
+                (referencia, metodo, base, palabras_clave))}
+        finally:
+            conexion.close()
+
+    def guardar_referencias_nmr(self, referencia, metodo, base, palabras_clave, apantallamientos, ruta=None):
+        conexion = self._conectar()
+        try:
+            with conexion:
+                conexion.executemany(
+                    "INSERT OR REPLACE INTO referencias_nmr VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(referencia, nucleo, metodo, base, palabras_clave, float(valor), ruta, time.time())
+                     for nucleo, valor in apantallamientos.items()])
+        finally:
+            conexion.close()
+
+    def contar(self):
+        conexion = self._conectar()
+        try:
+            return conexion.execute("SELECT COUNT(*) FROM trabajos").fetchone()[0]
+        finally:
+            conexion.close()
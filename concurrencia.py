@@ -0,0 +1,181 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# (maximo global, maximo por usuario) de unidades en curso; una unidad es un proceso de ORCA o un calculo de PySCF
+LIMITES = {
+    "orca": (int(os.environ.get("ORCA_MAX_TRABAJOS", max(1, (os.cpu_count() or 2) // 2))),
+             int(os.environ.get("ORCA_MAX_TRABAJOS_USUARIO", 1))),
+    "pyscf": (int(os.environ.get("ORCA_MAX_PYSCF", 2)),
+              int(os.environ.get("ORCA_MAX_PYSCF_USUARIO", 1))),
+}
+# Turnos de baja prioridad (trabajos que exceden el presupuesto): solo se atienden cuando no espera ningun turno
+# normal, y nunca ocupan mas de estas unidades a la vez, para que un trabajo de horas no deje sin plaza al resto
+LIMITES_BAJA_PRIORIDAD = {
+    "orca": int(os.environ.get("ORCA_MAX_BAJA_PRIORIDAD", 1)),
+}
+# Un turno en cola que nadie consulta en este tiempo pertenece a una sesion cerrada y se descarta
+TIEMPO_ABANDONO = 60
+
+
+class Turno:
+    def __init__(self, identificador, recurso, usuario, unidades, baja_prioridad=False):
+        self.id = identificador
+        self.recurso = recurso
+        self.usuario = usuario
+        self.unidades = unidades
+        self.baja_prioridad = baja_prioridad
+        self.estado = "en_cola"
+        self.ultimo_contacto = time.monotonic()
+
+
+class LimitadorConcurrencia:
+    def __init__(self, limites=None, tiempo_abandono=TIEMPO_ABANDONO, limites_baja_prioridad=None):
+        self.limites = dict(LIMITES if limites is None else limites)
+        self.limites_baja_prioridad = dict(LIMITES_BAJA_PRIORIDAD if limites_baja_prioridad is None
+                                           else limites_baja_prioridad)
+        self.tiempo_abandono = tiempo_abandono
+        self.condicion = threading.Condition()
+        self.secuencia = itertools.count(1)
+        # Por recurso: colas FIFO por usuario; el orden del OrderedDict es la rotacion round-robin
+        self.colas = {recurso: OrderedDict() for recurso in self.limites}
+        self.colas_baja = {recurso: OrderedDict() for recurso in self.limites}
+        self.en_curso = {recurso: {} for recurso in self.limites}
+        self.en_curso_baja = {recurso: 0 for recurso in self.limites}
+
+    def _maximo_baja(self, recurso):
+        maximo_global = self.limites[recurso][0]
+        return max(1, min(self.limites_baja_prioridad.get(recurso, maximo_global), maximo_global))
+
+    def solicitar(self, recurso, usuario, unidades=1, baja_prioridad=False):
+        maximo_global, maximo_usuario = self.limites[recurso]
+        tope = self._maximo_baja(recurso) if baja_prioridad else maximo_global
+        unidades = max(1, min(unidades, tope, maximo_usuario))
+        with self.condicion:
+            turno = Turno(next(self.secuencia), recurso, usuario, unidades, baja_prioridad)
+            colas = self.colas_baja if baja_prioridad else self.colas
+            colas[recurso].setdefault(usuario, deque()).append(turno)
+            self._despachar(recurso)
+        return turno
+
+    def _purgar(self, colas):
+        limite = time.monotonic() - self.tiempo_abandono
+        for usuario in list(colas):
+            vigentes = deque(t for t in colas[usuario] if t.ultimo_contacto >= limite)
+            for turno in colas[usuario]:
+                if turno.ultimo_contacto < limite:
+                    turno.estado = "abandonado"
+            if vigentes:
+                colas[usuario] = vigentes
+            else:
+                del colas[usuario]
+
+    def _despachar(self, recurso):
+        self._purgar(self.colas[recurso])
+        self._purgar(self.colas_baja[recurso])
+        maximo_global = self.limites[recurso][0]
+        if self._despachar_colas(recurso, self.colas[recurso], maximo_global) and not self.colas[recurso]:
+            self._despachar_colas(recurso, self.colas_baja[recurso], self._maximo_baja(recurso))
+
+    def _despachar_colas(self, recurso, colas, maximo):
+        # Devuelve False si el siguiente turno espera a que se libere hueco en el servidor
+        maximo_global, maximo_usuario = self.limites[recurso]
+        en_curso = self.en_curso[recurso]
+        baja = colas is self.colas_baja[recurso]
+
+        asignado = True
+        while asignado and colas:
+            asignado = False
+            for usuario in list(colas):
+                turno = colas[usuario][0]
+                if en_curso.get(usuario, 0) + turno.unidades > maximo_usuario:
+                    continue
+                if sum(en_curso.values()) + turno.unidades > maximo_global or \
+                        baja and self.en_curso_baja[recurso] + turno.unidades > maximo:
+                    # El siguiente en la rotacion espera a que haya hueco: los turnos grandes no se saltan
+                    return False
+                colas[usuario].popleft()
+                turno.estado = "en_curso"
+                en_curso[usuario] = en_curso.get(usuario, 0) + turno.unidades
+                if baja:
+                    self.en_curso_baja[recurso] += turno.unidades
+                if colas[usuario]:
+                    colas.move_to_end(usuario)
+                else:
+                    del colas[usuario]
+                asignado = True
+                self.condicion.notify_all()
+                break
+        return True
+
+    def esperar(self, turno, timeout=1.0):
+        with self.condicion:
+            turno.ultimo_contacto = time.monotonic()
+            if turno.estado == "en_cola":
+                self._despachar(turno.recurso)
+            if turno.estado == "en_cola":
+                self.condicion.wait(timeout)
+            if turno.estado == "abandonado":
+                raise RuntimeError("El turno caduco en la cola")
+            return turno.estado == "en_curso"
+
+    def posicion(self, turno):
+        with self.condicion:
+            maximo_usuario = self.limites[turno.recurso][1]
+            en_curso = self.en_curso[turno.recurso]
+            # Orden estimado de atencion: una ronda por usuario, retrasando a quien ya llena su cupo
+            # Los turnos de baja prioridad van detras de todos los normales
+            orden = sorted((baja, k + en_curso.get(usuario, 0) // maximo_usuario, i, t.id)
+                           for baja, colas in enumerate((self.colas[turno.recurso], self.colas_baja[turno.recurso]))
+                           for i, (usuario, cola) in enumerate(colas.items())
+                           for k, t in enumerate(cola))
+            posicion = next((n + 1 for n, (*_, identificador) in enumerate(orden) if identificador == turno.id), 0)
+            return posicion, len(orden)
+
+    def liberar(self, turno):
+        with self.condicion:
+            if turno.estado == "en_curso":
+                en_curso = self.en_curso[turno.recurso]
+                en_curso[turno.usuario] -= turno.unidades
+                if en_curso[turno.usuario] <= 0:
+                    del en_curso[turno.usuario]
+                if turno.baja_prioridad:
+                    self.en_curso_baja[turno.recurso] -= turno.unidades
+            elif turno.estado == "en_cola":
+                colas = (self.colas_baja if turno.baja_prioridad else self.colas)[turno.recurso]
+                cola = colas.get(turno.usuario)
+                if cola is not None and turno in cola:
+                    cola.remove(turno)
+                    if not cola:
+                        del colas[turno.usuario]
+            turno.estado = "liberado"
+            self._despachar(turno.recurso)
+            self.condicion.notify_all()
+
+    @contextmanager
+    def reservar(self, recurso, usuario, unidades=1, al_esperar=None, baja_prioridad=False):
+        turno = self.solicitar(recurso, usuario, unidades, baja_prioridad)
+        try:
+            while not self.esperar(turno):
+                if al_esperar is not None:
+                    al_esperar(*self.posicion(turno))
+            yield turno
+        finally:
+            self.liberar(turno)
+
+    def estado(self):
+        with self.condicion:
+            return {
+                recurso: {
+                    "en_curso": sum(self.en_curso[recurso].values()),
+                    "maximo": self.limites[recurso][0],
+                    "en_cola": sum(len(c) for c in self.colas[recurso].values()),
+                    "usuarios_en_cola": len(self.colas[recurso]),
+                    "baja_prioridad_en_curso": self.en_curso_baja[recurso],
+                    "baja_prioridad_en_cola": sum(len(c) for c in self.colas_baja[recurso].values()),
+                }
+                for recurso in self.limites
+            }
@@ -0,0 +1,46 @@
+H_PLANCK = 6.62607015e-34
+K_BOLTZMANN = 1.380649e-23
+C_LUZ_CM = 2.99792458e10
+N_AVOGADRO = 6.02214076e23
+AMU_KG = 1.66053906660e-27
+ME_KG = 9.1093837015e-31
+HARTREE_J = 4.3597447222071e-18
+HARTREE_A_KCAL = 627.5095
+HARTREE_A_EV = 27.211386
+BOHR_A_ANGSTROM = 0.529177210903
+ATM_PA = 101325.0
+# Magnetizabilidad molar: 1 u.a. = 4.75206 x 10^-6 cm^3/mol (CGS)
+MAGNETIZABILIDAD_AU_A_CGS = 4.75206
+
+SIMBOLOS = [
+    "X", "H", "He", "Li", "Be", "B", "C", "N", "O", "F", "Ne", "Na", "Mg", "Al", "Si", "P", "S", "Cl", "Ar",
+    "K", "Ca", "Sc", "Ti", "V", "Cr", "Mn", "Fe", "Co", "Ni", "Cu", "Zn", "Ga", "Ge", "As", "Se", "Br", "Kr",
+    "Rb", "Sr", "Y", "Zr", "Nb", "Mo", "Tc", "Ru", "Rh", "Pd", "Ag", "Cd", "In", "Sn", "Sb", "Te", "I", "Xe",
+    "Cs", "Ba", "La", "Ce", "Pr", "Nd", "Pm", "Sm", "Eu", "Gd", "Tb", "Dy", "Ho", "Er", "Tm", "Yb", "Lu",
+    "Hf", "Ta", "W", "Re", "Os", "Ir", "Pt", "Au", "Hg", "Tl", "Pb", "Bi", "Po", "At", "Rn",
+]
+
+NUMERO_ATOMICO = {simbolo.upper(): z for z, simbolo in enumerate(SIMBOLOS)}
+
+# Pesos atomicos estandar (los que usa ORCA en la termoquimica), indexados por numero atomico
+MASAS_ATOMICAS = [
+    0.0, 1.008, 4.0026, 6.94, 9.0122, 10.81, 12.011, 14.007, 15.999, 18.998, 20.180, 22.990, 24.305, 26.982,
+    28.085, 30.974, 32.06, 35.45, 39.948, 39.098, 40.078, 44.956, 47.867, 50.942, 51.996, 54.938, 55.845,
+    58.933, 58.693, 63.546, 65.38, 69.723, 72.630, 74.922, 78.971, 79.904, 83.798, 85.468, 87.62, 88.906,
+    91.224, 92.906, 95.95, 98.0, 101.07, 102.91, 106.42, 107.87, 112.41, 114.82, 118.71, 121.76, 127.60,
+    126.90, 131.29, 132.91, 137.33, 138.91, 140.12, 140.91, 144.24, 145.0, 150.36, 151.96, 157.25, 158.93,
+    162.50, 164.93, 167.26, 168.93, 173.05, 174.97, 178.49, 180.95, 183.84, 186.21, 190.23, 192.22, 195.08,
+    196.97, 200.59, 204.38, 207.2, 208.98, 209.0, 210.0, 222.0,
+]
+
+# Isotopos para sustituciones: etiqueta -> (elemento, masa exacta en amu)
+ISOTOPOS = {
+    "D": ("H", 2.014102), "T": ("H", 3.016049), "10B": ("B", 10.012937), "13C": ("C", 13.003355),
+    "14C": ("C", 14.003242), "15N": ("N", 15.000109), "17O": ("O", 16.999132), "18O": ("O", 17.999160),
+    "29Si": ("Si", 28.976495), "30Si": ("Si", 29.973770), "34S": ("S", 33.967867), "37Cl": ("Cl", 36.965903),
+    "81Br": ("Br", 80.916291),
+}
+
+
+def numero_atomico(simbolo):
+    return NUMERO_ATOMICO[simbolo.strip().upper()]
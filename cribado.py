@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from constantes import HARTREE_A_KCAL
+from ejecucion import escribir_y_ejecutar
+from simetria import TOLERANCIA_SIMETRIA, detectar_simetria
+from utils import Orca
+
+NIVELES_BAJOS = {
+    "HF-3c": ("HF-3c", ""),
+    "B97-3c": ("B97-3c", ""),
+    "r2SCAN-3c": ("r2SCAN-3c", ""),
+    "GFN2-xTB": ("XTB2", ""),
+}
+# Base de tamano comparable a la implicita en cada nivel bajo, para el modelo de coste; xTB no tiene base y su
+# coste es despreciable frente al nivel alto
+BASES_COSTE_BAJOS = {"HF-3c": "def2-SVP", "B97-3c": "def2-TZVP", "r2SCAN-3c": "def2-TZVP"}
+
+
+def rmsd_kabsch(coords_a, coords_b):
+    a = coords_a - coords_a.mean(axis=0)
+    b = coords_b - coords_b.mean(axis=0)
+    u, _, vt = np.linalg.svd(a.T @ b)
+    signo = np.sign(np.linalg.det(u @ vt))
+    u[:, -1] *= signo
+    rotada = a @ (u @ vt)
+    return float(np.sqrt(((rotada - b) ** 2).sum() / len(a)))
+
+
+def rmsd_simetrico(coords_a, coords_b, permutaciones):
+    # Minimo RMSD de Kabsch sobre las permutaciones de atomos equivalentes por simetria de b,
+    # todas alineadas a la vez
+    a = coords_a - coords_a.mean(axis=0)
+    b = (coords_b - coords_b.mean(axis=0))[permutaciones]
+    u, _, vt = np.linalg.svd(np.einsum("na,knb->kab", a, b))
+    signo = np.sign(np.linalg.det(u @ vt))
+    u[:, :, -1] *= signo[:, None]
+    rotadas = a @ (u @ vt)
+    return float(np.sqrt(((rotadas - b) ** 2).sum(axis=(1, 2)) / len(a)).min())
+
+
+def podar_conformeros(energias, geometrias, ventana_kcal, umbral_rmsd, top_k, permutaciones=None):
+    energias = np.asarray(energias, dtype=float)
+    validas = ~np.isnan(energias)
+    relativas = np.full(len(energias), np.nan)
+    if validas.any():
+        relativas[validas] = (energias[validas] - energias[validas].min()) * HARTREE_A_KCAL
+
+    estados = ["Fallido" if not v else "" for v in validas]
+    conservados = []
+    for indice in np.argsort(np.where(validas, relativas, np.inf)).tolist():
+        if not validas[indice]:
+            continue
+        if relativas[indice] > ventana_kcal:
+            estados[indice] = "Fuera de ventana"
+            continue
+
+        molecula = geometrias[indice]
+        duplicado = None
+        for previo in conservados:
+            molecula_previa = geometrias[previo]
+            if not np.array_equal(molecula.numeros_atomicos, molecula_previa.numeros_atomicos):
+                continue
+            # Con las permutaciones de simetria, dos copias de la misma estructura con los atomos equivalentes
+            # numerados de otra forma tambien cuentan como duplicadas
+            if permutaciones is None:
+                rmsd = rmsd_kabsch(molecula.coordenadas, molecula_previa.coordenadas)
+            else:
+                rmsd = rmsd_simetrico(molecula.coordenadas, molecula_previa.coordenadas, permutaciones[previo])
+            if rmsd < umbral_rmsd:
+                duplicado = previo
+                break
+
+        if duplicado is not None:
+            estados[indice] = f"Duplicado de {duplicado + 1}"
+        elif len(conservados) < top_k:
+            conservados.append(indice)
+            estados[indice] = "Promovido"
+        else:
+            conservados.append(indice)
+            estados[indice] = "Unico (no promovido)"
+
+    promovidos = [i for i in conservados if estados[i] == "Promovido"]
+    return relativas, estados, promovidos
+
+
+def _ejecutar_nivel(molecula, nombre, directorio, tipo_calculo, metodo, base, palabras_clave, calc_nmr=False,
+                    prioridad=0, usar_simetria=False):
+    entrada = Orca.generar_entrada(molecula, tipo_calculo, metodo, base, palabras_clave, calc_nmr=calc_nmr,
+                                   usar_simetria=usar_simetria)
+    try:
+        ruta_salida = escribir_y_ejecutar(entrada, directorio, nombre, prioridad=prioridad)
+    except Exception as e:
+        return {"error": str(e)}
+
+    analizador = Orca(ruta_salida)
+    return {
+        "ruta_salida": ruta_salida,
+        "energia": analizador.extraer_energia_final(),
+        "geometria": analizador.extraer_molecula(),
+        "convergido": analizador.verificar_convergencia()
+    }
+
+
+def ejecutar_cribado(conformeros, nombre_trabajo, directorio, nivel_bajo, nivel_alto, ventana_kcal=5.0,
+                     umbral_rmsd=0.25, top_k=3, trabajos_paralelos=4, palabras_bajo="", prioridad=0,
+                     usar_simetria=False, tolerancia_simetria=TOLERANCIA_SIMETRIA):
+    metodo_bajo, base_bajo = NIVELES_BAJOS.get(nivel_bajo, (nivel_bajo, ""))
+    tipo_calculo, metodo, base, palabras_clave, calc_nmr = nivel_alto
+
+    with ThreadPoolExecutor(max_workers=trabajos_paralelos) as pool:
+        resultados_bajos = list(pool.map(
+            lambda par: _ejecutar_nivel(par[1], f"{nombre_trabajo}_conf{par[0] + 1:03d}_bajo", directorio,
+                                        "Optimizacion de Geometria", metodo_bajo, base_bajo, palabras_bajo,
+                                        prioridad=prioridad),
+            enumerate(conformeros)
+        ))
+
+    energias = []
+    geometrias = []
+    for molecula, resultado in zip(conformeros, resultados_bajos):
+        energias.append(np.nan if resultado.get("energia") is None else resultado["energia"])
+        geometrias.append(resultado.get("geometria") or molecula)
+
+    simetrias = [detectar_simetria(molecula, tolerancia_simetria) for molecula in geometrias]
+    relativas, estados, promovidos = podar_conformeros(energias, geometrias, ventana_kcal, umbral_rmsd, top_k,
+                                                       [s["permutaciones"] for s in simetrias])
+
+    # Con UseSym el nivel alto parte de la geometria simetrizada, para que ORCA reconozca el grupo puntual
+    with ThreadPoolExecutor(max_workers=trabajos_paralelos) as pool:
+        resultados_altos = dict(zip(promovidos, pool.map(
+            lambda i: _ejecutar_nivel(simetrias[i]["molecula"] if usar_simetria else geometrias[i],
+                                      f"{nombre_trabajo}_conf{i + 1:03d}_alto", directorio,
+                                      tipo_calculo, metodo, base, palabras_clave, calc_nmr, prioridad,
+                                      usar_simetria),
+            promovidos
+        )))
+
+    energias_altas = {i: r.get("energia") for i, r in resultados_altos.items() if r.get("energia") is not None}
+    minimo_alto = min(energias_altas.values()) if energias_altas else None
+
+    filas = []
+    for i in range(len(conformeros)):
+        alto = resultados_altos.get(i, {})
+        energia_alta = alto.get("energia")
+        filas.append({
+            "Conformero": i + 1,
+            "Energia Bajo Nivel (Eh)": None if np.isnan(energias[i]) else energias[i],
+            "ΔE Bajo Nivel (kcal/mol)": None if np.isnan(relativas[i]) else float(relativas[i]),
+            "Grupo Puntual": simetrias[i]["grupo_puntual"],
+            "Estado": estados[i],
+            "Energia Alto Nivel (Eh)": energia_alta,
+            "ΔE Alto Nivel (kcal/mol)": None if energia_alta is None else (energia_alta - minimo_alto) * HARTREE_A_KCAL,
+            "Error": resultados_bajos[i].get("error") or alto.get("error")
+        })
+
+    tabla = pd.DataFrame(filas)
+    mejor = min(energias_altas, key=energias_altas.get) if energias_altas else None
+    return {
+        "tabla": tabla,
+        "mejor_conformero": None if mejor is None else mejor + 1,
+        "ruta_salida_mejor": None if mejor is None else resultados_altos[mejor]["ruta_salida"],
+        "fraccion_alto_nivel": len(promovidos) / len(conformeros) if conformeros else 0.0
+    }
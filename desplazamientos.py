@@ -0,0 +1,114 @@
+import threading
+from contextlib import nullcontext
+
+from ejecucion import EspacioTrabajo
+from molecula import Molecula
+from recuperacion import ejecutar_con_recuperacion
+from utils import Orca
+
+# Geometrias de partida; la referencia se optimiza al mismo nivel que el trabajo antes del NMR
+REFERENCIAS = {
+    "TMS": """17
+Tetrametilsilano
+Si   0.000000   0.000000   0.000000
+C    1.082532   1.082532   1.082532
+H    0.477188   1.723491   1.723491
+H    1.723491   0.477188   1.723491
+H    1.723491   1.723491   0.477188
+C    1.082532  -1.082532  -1.082532
+H    0.477188  -1.723491  -1.723491
+H    1.723491  -0.477188  -1.723491
+H    1.723491  -1.723491  -0.477188
+C   -1.082532   1.082532  -1.082532
+H   -0.477188   1.723491  -1.723491
+H   -1.723491   0.477188  -1.723491
+H   -1.723491   1.723491  -0.477188
+C   -1.082532  -1.082532   1.082532
+H   -0.477188  -1.723491   1.723491
+H   -1.723491  -0.477188   1.723491
+H   -1.723491  -1.723491   0.477188
+""",
+    "CFCl3": """5
+Triclorofluorometano
+C    0.000000   0.000000   0.000000
+F    0.000000   0.000000  -1.330000
+Cl  -1.659344   0.000000   0.586667
+Cl   0.829672  -1.437034   0.586667
+Cl   0.829672   1.437034   0.586667
+""",
+}
+
+REFERENCIA_POR_NUCLEO = {"H": "TMS", "C": "TMS", "Si": "TMS", "F": "CFCl3"}
+
+# Estas palabras clave cambian el tipo de trabajo, no el nivel de teoria del apantallamiento
+CLAVES_DE_TRABAJO = {"OPT", "LOOSEOPT", "TIGHTOPT", "VERYTIGHTOPT", "FREQ", "NUMFREQ", "NMR", "SP"}
+
+_cerrojo_calculos = threading.Lock()
+_calculos_en_curso = {}
+
+
+def clave_nivel(metodo, base, palabras_clave=""):
+    palabras = sorted({token.upper() for token in (palabras_clave or "").split()} - CLAVES_DE_TRABAJO)
+    return metodo.lower(), base.lower(), " ".join(palabras)
+
+
+def referencias_necesarias(elementos):
+    return sorted({REFERENCIA_POR_NUCLEO[e] for e in elementos if e in REFERENCIA_POR_NUCLEO})
+
+
+def referencias_faltantes(base_resultados, elementos, metodo, base, palabras_clave=""):
+    nivel = clave_nivel(metodo, base, palabras_clave)
+    return [r for r in referencias_necesarias(elementos) if not base_resultados.referencias_nmr(r, *nivel)]
+
+
+def calcular_referencia(referencia, metodo, base, palabras_clave, directorio_resultados, prioridad=0):
+    espacio = EspacioTrabajo(f"referencia_{referencia}", directorio_resultados)
+    ruta_salida = espacio.ruta(".out")
+    try:
+        ruta_salida, _ = ejecutar_con_recuperacion(espacio, Molecula.desde_xyz(REFERENCIAS[referencia]),
+                                                   "Optimización de Geometría", metodo, base, palabras_clave,
+                                                   calc_nmr=True, prioridad=prioridad)
+    finally:
+        espacio.promover()
+
+    ruta_salida = espacio.ruta_durable(ruta_salida)
+    datos_nmr = Orca(ruta_salida).extraer_datos_nmr()
+    if datos_nmr is None:
+        raise RuntimeError(f"El calculo de referencia {referencia} no produjo apantallamientos NMR")
+    return datos_nmr.groupby("Elemento")["Isotropico (ppm)"].mean().to_dict(), ruta_salida
+
+
+def obtener_referencias(base_resultados, elementos, metodo, base, palabras_clave, directorio_resultados,
+                        calcular=True, prioridad=0, reservar_plaza=None):
+    nivel = clave_nivel(metodo, base, palabras_clave)
+    apantallamientos = {}
+    for referencia in referencias_necesarias(elementos):
+        valores = base_resultados.referencias_nmr(referencia, *nivel)
+        if not valores and calcular:
+            # Si otra sesion ya esta calculando la misma referencia se espera a su resultado
+            with _cerrojo_calculos:
+                cerrojo = _calculos_en_curso.setdefault((referencia,) + nivel, threading.Lock())
+            with cerrojo:
+                valores = base_resultados.referencias_nmr(referencia, *nivel)
+                if not valores:
+                    # La plaza de ORCA se pide dentro del cerrojo: quien espera a otra sesion no ocupa ninguna
+                    with reservar_plaza() if reservar_plaza else nullcontext():
+                        valores, ruta_salida = calcular_referencia(referencia, metodo, base, palabras_clave,
+                                                                   directorio_resultados, prioridad)
+                    base_resultados.registrar(ruta_salida, metodo=metodo, base=base,
+                                              tipo_calculo="Optimización de Geometría")
+                    base_resultados.guardar_referencias_nmr(referencia, *nivel, valores, ruta_salida)
+
+        for elemento, apantallamiento in valores.items():
+            if REFERENCIA_POR_NUCLEO.get(elemento) == referencia:
+                apantallamientos[elemento] = (referencia, apantallamiento)
+    return apantallamientos
+
+
+def convertir_a_desplazamientos(datos_nmr, referencias):
+    elementos = datos_nmr["Elemento"]
+    resultado = datos_nmr.copy()
+    resultado["Referencia"] = elementos.map({e: r for e, (r, _) in referencias.items()})
+    resultado["Desplazamiento (ppm)"] = (elementos.map({e: s for e, (_, s) in referencias.items()})
+                                         - datos_nmr["Isotropico (ppm)"])
+    return resultado
@@ -0,0 +1,670 @@
+import argparse
+import itertools
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error, request
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlparse
+
+from ejecucion import DIR_SCRATCH, iniciar_orca_local
+
+INTERVALO_LATIDO = 5.0
+LATIDOS_PERDIDOS = 3
+MAX_INTENTOS = 3
+RETENCION_TRABAJOS_S = float(os.environ.get("ORCA_COORDINADOR_RETENCION_S", 24 * 3600))
+MAX_TRABAJOS_TERMINADOS = int(os.environ.get("ORCA_COORDINADOR_MAX_TERMINADOS", 500))
+ESTADOS_FINALES = ("terminado", "fallido", "cancelado")
+
+
+class ErrorCoordinador(Exception):
+    def __init__(self, codigo, mensaje):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+def ruta_relativa_segura(ruta):
+    ruta = os.path.normpath(ruta).replace(os.sep, "/")
+    if os.path.isabs(ruta) or ruta == ".." or ruta.startswith("../"):
+        raise ErrorCoordinador(400, f"Ruta no permitida: {ruta}")
+    return ruta
+
+
+def ruta_relativa_local(ruta):
+    relativa = os.path.relpath(ruta)
+    return os.path.basename(ruta) if relativa.startswith("..") else relativa
+
+
+class Coordinador:
+    def __init__(self, directorio, intervalo_latido=INTERVALO_LATIDO, max_intentos=MAX_INTENTOS,
+                 retencion_s=RETENCION_TRABAJOS_S, max_terminados=MAX_TRABAJOS_TERMINADOS):
+        self.directorio = directorio
+        self.intervalo_latido = intervalo_latido
+        self.max_intentos = max_intentos
+        self.retencion_s = retencion_s
+        self.max_terminados = max_terminados
+        self.trabajos = {}
+        self.trabajadores = {}
+        self.cerrojo = threading.Lock()
+        self.secuencia = itertools.count()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _carpeta(self, id_trabajo, *partes):
+        return os.path.join(self.directorio, id_trabajo, *partes)
+
+    def _trabajo(self, id_trabajo):
+        if id_trabajo not in self.trabajos:
+            raise ErrorCoordinador(404, f"Trabajo desconocido: {id_trabajo}")
+        return self.trabajos[id_trabajo]
+
+    def _asignado_a(self, id_trabajo, id_trabajador):
+        trabajo = self._trabajo(id_trabajo)
+        if trabajo["estado"] != "asignado" or trabajo["trabajador"] != id_trabajador:
+            raise ErrorCoordinador(409, f"El trabajo {id_trabajo} ya no esta asignado a {id_trabajador}")
+        return trabajo
+
+    def crear_trabajo(self, datos):
+        id_trabajo = uuid.uuid4().hex[:12]
+        trabajo = {
+            "id": id_trabajo,
+            "entrada": ruta_relativa_segura(datos["entrada"]),
+            "nucleos": int(datos.get("nucleos", 1)),
+            "memoria_mb": float(datos.get("memoria_mb", 0)),
+            "prioridad": int(datos.get("prioridad", 0)),
+            "estado": "preparando",
+            "intentos": 0,
+            "trabajador": None,
+            "codigo_retorno": None,
+            "error": None,
+            "archivos_entrada": [],
+            "artefactos": [],
+            "orden": next(self.secuencia),
+            "creado": time.time(),
+            "terminado": None
+        }
+        os.makedirs(self._carpeta(id_trabajo, "entrada"))
+        os.makedirs(self._carpeta(id_trabajo, "artefactos"))
+        with self.cerrojo:
+            self.trabajos[id_trabajo] = trabajo
+        return {"id": id_trabajo}
+
+    def guardar_entrada(self, id_trabajo, nombre, datos):
+        nombre = ruta_relativa_segura(nombre)
+        with self.cerrojo:
+            trabajo = self._trabajo(id_trabajo)
+            if trabajo["estado"] != "preparando":
+                raise ErrorCoordinador(409, "Los archivos de entrada solo se aceptan antes de encolar")
+            trabajo["archivos_entrada"].append(nombre)
+        self._escribir(self._carpeta(id_trabajo, "entrada", nombre), datos)
+
+    def guardar_artefacto(self, id_trabajo, id_trabajador, nombre, datos):
+        nombre = ruta_relativa_segura(nombre)
+        with self.cerrojo:
+            self._trabajador_activo(id_trabajador)
+            trabajo = self._asignado_a(id_trabajo, id_trabajador)
+            trabajo["artefactos"].append(nombre)
+        self._escribir(self._carpeta(id_trabajo, "artefactos", nombre), datos)
+
+    @staticmethod
+    def _escribir(ruta, datos):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, "wb") as f:
+            f.write(datos)
+
+    def leer_archivo(self, id_trabajo, tipo, nombre):
+        nombre = ruta_relativa_segura(nombre)
+        with self.cerrojo:
+            self._trabajo(id_trabajo)
+        ruta = self._carpeta(id_trabajo, tipo, nombre)
+        if not os.path.isfile(ruta):
+            raise ErrorCoordinador(404, f"Archivo no encontrado: {nombre}")
+        with open(ruta, "rb") as f:
+            return f.read()
+
+    def encolar(self, id_trabajo):
+        with self.cerrojo:
+            trabajo = self._trabajo(id_trabajo)
+            if trabajo["estado"] == "preparando":
+                trabajo["estado"] = "pendiente"
+            return self._publico(trabajo)
+
+    def cancelar(self, id_trabajo):
+        with self.cerrojo:
+            trabajo = self._trabajo(id_trabajo)
+            if trabajo["estado"] not in ESTADOS_FINALES:
+                trabajo["estado"] = "cancelado"
+                trabajo["codigo_retorno"] = -9
+                trabajo["terminado"] = time.time()
+            return self._publico(trabajo)
+
+    def registrar_trabajador(self, datos):
+        id_trabajador = uuid.uuid4().hex[:12]
+        with self.cerrojo:
+            self.trabajadores[id_trabajador] = {
+                "id": id_trabajador,
+                "nombre": datos.get("nombre", id_trabajador),
+                "nucleos": int(datos.get("nucleos", 1)),
+                "memoria_mb": float(datos.get("memoria_mb", 0)),
+                "estado": "activo",
+                "trabajos": [],
+                "ultimo_latido": time.time()
+            }
+        return {"id": id_trabajador, "intervalo_latido": self.intervalo_latido}
+
+    def _trabajador_activo(self, id_trabajador):
+        trabajador = self.trabajadores.get(id_trabajador)
+        if trabajador is None or trabajador["estado"] != "activo":
+            raise ErrorCoordinador(409, f"Trabajador no registrado o dado por perdido: {id_trabajador}")
+        trabajador["ultimo_latido"] = time.time()
+        return trabajador
+
+    def latido(self, id_trabajador):
+        with self.cerrojo:
+            trabajador = self._trabajador_activo(id_trabajador)
+            return {"cancelar": [id_trabajo for id_trabajo in trabajador["trabajos"]
+                                 if self.trabajos.get(id_trabajo, {"estado": "cancelado"})["estado"] == "cancelado"]}
+
+    def solicitar(self, id_trabajador):
+        with self.cerrojo:
+            trabajador = self._trabajador_activo(id_trabajador)
+            # Los trabajos en curso del nodo (incluidos los cancelados hasta que los mata) ocupan su capacidad
+            en_curso = [self.trabajos[i] for i in trabajador["trabajos"] if i in self.trabajos]
+            nucleos_libres = trabajador["nucleos"] - sum(t["nucleos"] for t in en_curso)
+            memoria_libre = trabajador["memoria_mb"] - sum(t["memoria_mb"] for t in en_curso)
+            candidatos = [t for t in self.trabajos.values()
+                          if t["estado"] == "pendiente" and t["nucleos"] <= nucleos_libres
+                          and (not trabajador["memoria_mb"] or t["memoria_mb"] <= memoria_libre)]
+            if not candidatos:
+                return {"trabajo": None}
+
+            trabajo = min(candidatos, key=lambda t: (t["prioridad"], t["orden"]))
+            trabajo["estado"] = "asignado"
+            trabajo["trabajador"] = id_trabajador
+            trabajo["intentos"] += 1
+            trabajo["artefactos"] = []
+            trabajador["trabajos"].append(trabajo["id"])
+
+        # Un reintento empieza con la salida y los artefactos vacios
+        open(self._carpeta(trabajo["id"], "salida.out"), "wb").close()
+        shutil.rmtree(self._carpeta(trabajo["id"], "artefactos"), ignore_errors=True)
+        os.makedirs(self._carpeta(trabajo["id"], "artefactos"))
+        return {"trabajo": {"id": trabajo["id"], "entrada": trabajo["entrada"],
+                            "archivos_entrada": trabajo["archivos_entrada"]}}
+
+    def agregar_salida(self, id_trabajo, id_trabajador, desde, datos):
+        with self.cerrojo:
+            self._trabajador_activo(id_trabajador)
+            self._asignado_a(id_trabajo, id_trabajador)
+            ruta = self._carpeta(id_trabajo, "salida.out")
+            if desde > os.path.getsize(ruta):
+                raise ErrorCoordinador(409, f"Fragmento de salida fuera de orden (desde={desde})")
+            with open(ruta, "r+b") as f:
+                f.seek(desde)
+                f.write(datos)
+        return {"bytes_salida": desde + len(datos)}
+
+    def leer_salida(self, id_trabajo, desde):
+        with self.cerrojo:
+            self._trabajo(id_trabajo)
+        ruta = self._carpeta(id_trabajo, "salida.out")
+        if not os.path.exists(ruta):
+            return b""
+        with open(ruta, "rb") as f:
+            f.seek(desde)
+            return f.read()
+
+    def finalizar(self, id_trabajo, id_trabajador, codigo_retorno):
+        with self.cerrojo:
+            trabajador = self._trabajador_activo(id_trabajador)
+            if id_trabajo in trabajador["trabajos"]:
+                trabajador["trabajos"].remove(id_trabajo)
+            trabajo = self._trabajo(id_trabajo)
+            if trabajo["estado"] == "cancelado" and trabajo["trabajador"] == id_trabajador:
+                return self._publico(trabajo)
+            trabajo = self._asignado_a(id_trabajo, id_trabajador)
+            trabajo["estado"] = "terminado"
+            trabajo["codigo_retorno"] = int(codigo_retorno)
+            trabajo["terminado"] = time.time()
+            return self._publico(trabajo)
+
+    def revisar_trabajadores(self):
+        limite = time.time() - self.intervalo_latido * LATIDOS_PERDIDOS
+        with self.cerrojo:
+            for trabajador in self.trabajadores.values():
+                if trabajador["estado"] != "activo" or trabajador["ultimo_latido"] >= limite:
+                    continue
+                trabajador["estado"] = "perdido"
+                for id_trabajo in trabajador["trabajos"]:
+                    trabajo = self.trabajos.get(id_trabajo)
+                    if trabajo is None or trabajo["estado"] != "asignado":
+                        continue
+                    if trabajo["intentos"] < self.max_intentos:
+                        trabajo["estado"] = "pendiente"
+                        trabajo["trabajador"] = None
+                    else:
+                        trabajo["estado"] = "fallido"
+                        trabajo["terminado"] = time.time()
+                        trabajo["error"] = (f"Trabajador {trabajador['nombre']} perdido; "
+                                            f"se agotaron los {self.max_intentos} intentos")
+                trabajador["trabajos"] = []
+
+    def olvidar_terminados(self):
+        limite = time.time() - self.retencion_s
+        with self.cerrojo:
+            terminados = sorted((t["terminado"], id_trabajo) for id_trabajo, t in self.trabajos.items()
+                                if t["estado"] in ESTADOS_FINALES)
+            sobrantes = len(terminados) - self.max_terminados
+            olvidados = [id_trabajo for n, (terminado, id_trabajo) in enumerate(terminados)
+                         if n < sobrantes or terminado < limite]
+            for id_trabajo in olvidados:
+                del self.trabajos[id_trabajo]
+        for id_trabajo in olvidados:
+            shutil.rmtree(self._carpeta(id_trabajo), ignore_errors=True)
+
+    @staticmethod
+    def _publico(trabajo):
+        return {clave: valor for clave, valor in trabajo.items() if clave != "orden"}
+
+    def estado_trabajo(self, id_trabajo):
+        with self.cerrojo:
+            return self._publico(self._trabajo(id_trabajo))
+
+    def estado_general(self):
+        with self.cerrojo:
+            return {
+                "trabajadores": list(self.trabajadores.values()),
+                "trabajos": [self._publico(t) for t in sorted(self.trabajos.values(), key=lambda t: t["orden"])]
+            }
+
+
+class ManejadorCoordinador(BaseHTTPRequestHandler):
+    RUTAS = [
+        ("GET", r"/estado", "estado_general"),
+        ("POST", r"/trabajadores", "registrar_trabajador"),
+        ("POST", r"/trabajadores/(\w+)/latido", "latido"),
+        ("POST", r"/trabajadores/(\w+)/solicitar", "solicitar"),
+        ("POST", r"/trabajos", "crear_trabajo"),
+        ("GET", r"/trabajos/(\w+)", "estado_trabajo"),
+        ("POST", r"/trabajos/(\w+)/encolar", "encolar"),
+        ("POST", r"/trabajos/(\w+)/cancelar", "cancelar"),
+        ("POST", r"/trabajos/(\w+)/finalizar", "finalizar"),
+        ("GET", r"/trabajos/(\w+)/salida", "leer_salida"),
+        ("PUT", r"/trabajos/(\w+)/salida", "agregar_salida"),
+        ("GET", r"/trabajos/(\w+)/(entrada|artefactos)/(.+)", "leer_archivo"),
+        ("PUT", r"/trabajos/(\w+)/entrada/(.+)", "guardar_entrada"),
+        ("PUT", r"/trabajos/(\w+)/artefactos/(.+)", "guardar_artefacto"),
+    ]
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo):
+        datos = cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/octet-stream" if isinstance(cuerpo, bytes)
+                         else "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _despachar(self, metodo):
+        url = urlparse(self.path)
+        ruta = unquote(url.path)
+        consulta = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+        longitud = int(self.headers.get("Content-Length") or 0)
+        cuerpo = self.rfile.read(longitud) if longitud else b""
+        coordinador = self.server.coordinador
+
+        try:
+            for metodo_ruta, patron, accion in self.RUTAS:
+                coincidencia = re.fullmatch(patron, ruta)
+                if metodo_ruta != metodo or not coincidencia:
+                    continue
+                argumentos = coincidencia.groups()
+                if accion in ("registrar_trabajador", "crear_trabajo"):
+                    resultado = getattr(coordinador, accion)(json.loads(cuerpo or b"{}"))
+                elif accion == "finalizar":
+                    datos = json.loads(cuerpo)
+                    resultado = coordinador.finalizar(argumentos[0], datos["trabajador"], datos["codigo_retorno"])
+                elif accion == "leer_salida":
+                    resultado = coordinador.leer_salida(argumentos[0], int(consulta.get("desde", 0)))
+                elif accion == "agregar_salida":
+                    resultado = coordinador.agregar_salida(argumentos[0], consulta["trabajador"],
+                                                           int(consulta.get("desde", 0)), cuerpo)
+                elif accion == "guardar_entrada":
+                    resultado = coordinador.guardar_entrada(argumentos[0], argumentos[1], cuerpo) or {}
+                elif accion == "guardar_artefacto":
+                    resultado = coordinador.guardar_artefacto(argumentos[0], consulta["trabajador"],
+                                                              argumentos[1], cuerpo) or {}
+                else:
+                    resultado = getattr(coordinador, accion)(*argumentos)
+                self._responder(200, resultado)
+                return
+            self._responder(404, {"error": f"Ruta desconocida: {metodo} {ruta}"})
+        except ErrorCoordinador as e:
+            self._responder(e.codigo, {"error": str(e)})
+        except (KeyError, ValueError) as e:
+            self._responder(400, {"error": f"Peticion invalida: {e}"})
+
+    def do_GET(self):
+        self._despachar("GET")
+
+    def do_POST(self):
+        self._despachar("POST")
+
+    def do_PUT(self):
+        self._despachar("PUT")
+
+
+def servir_coordinador(directorio, host="127.0.0.1", puerto=8765, intervalo_latido=INTERVALO_LATIDO,
+                       max_intentos=MAX_INTENTOS):
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorCoordinador)
+    servidor.daemon_threads = True
+    servidor.coordinador = Coordinador(directorio, intervalo_latido, max_intentos)
+
+    def vigilar():
+        while True:
+            time.sleep(intervalo_latido)
+            servidor.coordinador.revisar_trabajadores()
+            servidor.coordinador.olvidar_terminados()
+
+    threading.Thread(target=vigilar, daemon=True).start()
+    return servidor
+
+
+class ClienteCoordinador:
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _peticion(self, metodo, ruta, cuerpo=None, consulta=None):
+        url = self.url + quote(ruta) + (f"?{urlencode(consulta)}" if consulta else "")
+        datos = cuerpo if isinstance(cuerpo, bytes) or cuerpo is None else json.dumps(cuerpo).encode("utf-8")
+        peticion = request.Request(url, data=datos, method=metodo)
+        try:
+            with request.urlopen(peticion, timeout=self.timeout) as respuesta:
+                contenido = respuesta.read()
+                if respuesta.headers.get("Content-Type") == "application/json":
+                    return json.loads(contenido)
+                return contenido
+        except error.HTTPError as e:
+            try:
+                mensaje = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                mensaje = str(e)
+            raise ErrorCoordinador(e.code, mensaje)
+
+    def enviar_trabajo(self, entrada, archivos, nucleos=1, memoria_mb=0, prioridad=0):
+        id_trabajo = self._peticion("POST", "/trabajos", {
+            "entrada": entrada, "nucleos": nucleos, "memoria_mb": memoria_mb, "prioridad": prioridad
+        })["id"]
+        for nombre, datos in archivos.items():
+            self._peticion("PUT", f"/trabajos/{id_trabajo}/entrada/{nombre}", datos)
+        self._peticion("POST", f"/trabajos/{id_trabajo}/encolar")
+        return id_trabajo
+
+    def estado(self, id_trabajo):
+        return self._peticion("GET", f"/trabajos/{id_trabajo}")
+
+    def leer_salida(self, id_trabajo, desde=0):
+        return self._peticion("GET", f"/trabajos/{id_trabajo}/salida", consulta={"desde": desde})
+
+    def descargar(self, id_trabajo, tipo, nombre):
+        return self._peticion("GET", f"/trabajos/{id_trabajo}/{tipo}/{nombre}")
+
+    def cancelar(self, id_trabajo):
+        return self._peticion("POST", f"/trabajos/{id_trabajo}/cancelar")
+
+
+def recursos_entrada(contenido_entrada):
+    nucleos = re.search(r'%pal\s+nprocs\s+(\d+)', contenido_entrada, re.IGNORECASE)
+    nucleos = re.search(r'^\s*!.*\bPAL(\d+)\b', contenido_entrada, re.IGNORECASE | re.MULTILINE) or nucleos
+    maxcore = re.search(r'%maxcore\s+(\d+)', contenido_entrada, re.IGNORECASE)
+    nucleos = int(nucleos.group(1)) if nucleos else 1
+    return nucleos, nucleos * int(maxcore.group(1)) if maxcore else 0
+
+
+class ProcesoRemoto:
+    # Misma interfaz que subprocess.Popen (poll, wait, kill, returncode) para que la UI no distinga el backend
+    def __init__(self, url, ruta_entrada, ruta_salida, prioridad=0):
+        self.args = [url, ruta_entrada]
+        self.returncode = None
+        self.ruta_salida = ruta_salida
+        self.cliente = ClienteCoordinador(url)
+        self.bytes_salida = 0
+        self.intentos = 0
+
+        with open(ruta_entrada, "rb") as f:
+            contenido = f.read()
+        entrada = ruta_relativa_local(ruta_entrada)
+        archivos = {entrada: contenido}
+        # Con los orbitales previos ORCA arranca desde ellos (autostart), igual que en ejecucion local
+        ruta_gbw = os.path.splitext(ruta_entrada)[0] + ".gbw"
+        if os.path.exists(ruta_gbw):
+            with open(ruta_gbw, "rb") as f:
+                archivos[os.path.splitext(entrada)[0] + ".gbw"] = f.read()
+
+        nucleos, memoria_mb = recursos_entrada(contenido.decode("utf-8", errors="ignore"))
+        self.id_trabajo = self.cliente.enviar_trabajo(entrada, archivos, nucleos, memoria_mb, prioridad)
+        open(ruta_salida, "wb").close()
+
+    def poll(self):
+        if self.returncode is not None:
+            return self.returncode
+
+        estado = self.cliente.estado(self.id_trabajo)
+        if estado["intentos"] != self.intentos:
+            self.intentos = estado["intentos"]
+            self.bytes_salida = 0
+            open(self.ruta_salida, "wb").close()
+
+        fragmento = self.cliente.leer_salida(self.id_trabajo, self.bytes_salida)
+        if fragmento:
+            with open(self.ruta_salida, "ab") as f:
+                f.write(fragmento)
+            self.bytes_salida += len(fragmento)
+
+        if estado["estado"] not in ESTADOS_FINALES:
+            return None
+
+        if estado["estado"] == "terminado":
+            directorio = os.path.dirname(os.path.abspath(self.ruta_salida))
+            salida_remota = ruta_relativa_segura(os.path.splitext(ruta_relativa_local(self.args[1]))[0] + ".out")
+            for nombre in estado["artefactos"]:
+                if nombre == salida_remota:
+                    continue
+                ruta = os.path.join(directorio, os.path.basename(nombre))
+                with open(ruta, "wb") as f:
+                    f.write(self.cliente.descargar(self.id_trabajo, "artefactos", nombre))
+        elif estado["error"]:
+            with open(self.ruta_salida, "a") as f:
+                f.write(f"\n[coordinador] {estado['error']}\n")
+
+        self.returncode = estado["codigo_retorno"] if estado["codigo_retorno"] is not None else 1
+        return self.returncode
+
+    def wait(self, timeout=None):
+        limite = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if limite is not None and time.monotonic() > limite:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(1.0)
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            self.cliente.cancelar(self.id_trabajo)
+
+
+class Trabajador:
+    def __init__(self, url, nombre=None, nucleos=None, memoria_mb=0, directorio_scratch=None):
+        self.cliente = ClienteCoordinador(url)
+        self.nombre = nombre or f"{socket.gethostname()}-{os.getpid()}"
+        self.nucleos = nucleos or os.cpu_count() or 1
+        self.memoria_mb = memoria_mb
+        self.directorio_scratch = directorio_scratch or DIR_SCRATCH
+        self.id = None
+        self.intervalo_latido = INTERVALO_LATIDO
+        self.cancelados = set()
+        self.hueco_libre = threading.Event()
+
+    def registrar(self):
+        respuesta = self.cliente._peticion("POST", "/trabajadores", {
+            "nombre": self.nombre, "nucleos": self.nucleos, "memoria_mb": self.memoria_mb
+        })
+        self.id = respuesta["id"]
+        self.intervalo_latido = respuesta["intervalo_latido"]
+
+    def ejecutar(self, max_trabajos=None):
+        # Un hilo por trabajo: el coordinador solo asigna los que caben en los nucleos y la memoria libres
+        self.registrar()
+        hilos, iniciados = [], 0
+        while max_trabajos is None or iniciados < max_trabajos or any(h.is_alive() for h in hilos):
+            hilos = [h for h in hilos if h.is_alive()]
+            try:
+                respuesta = self.cliente._peticion("POST", f"/trabajadores/{self.id}/latido")
+                self.cancelados.update(respuesta["cancelar"])
+                trabajo = None
+                if max_trabajos is None or iniciados < max_trabajos:
+                    trabajo = self.cliente._peticion("POST", f"/trabajadores/{self.id}/solicitar")["trabajo"]
+            except ErrorCoordinador as e:
+                if e.codigo != 409:
+                    raise
+                # El coordinador nos dio por perdidos (p. ej. tras un corte de red): volver a registrarse
+                self.registrar()
+                continue
+            except (error.URLError, OSError):
+                time.sleep(self.intervalo_latido)
+                continue
+
+            if trabajo is None:
+                self.hueco_libre.wait(self.intervalo_latido)
+                self.hueco_libre.clear()
+                continue
+            hilo = threading.Thread(target=self._procesar_en_hilo, args=(trabajo,), daemon=True)
+            hilo.start()
+            hilos.append(hilo)
+            iniciados += 1
+
+    def _procesar_en_hilo(self, trabajo):
+        try:
+            self.procesar(trabajo)
+        except (ErrorCoordinador, error.URLError, OSError) as e:
+            print(f"Trabajo {trabajo['id']} abandonado: {e}", file=sys.stderr)
+        finally:
+            self.cancelados.discard(trabajo["id"])
+            self.hueco_libre.set()
+
+    def _enviar_salida(self, id_trabajo, ruta_salida, desde):
+        with open(ruta_salida, "rb") as f:
+            f.seek(desde)
+            fragmento = f.read()
+        if fragmento:
+            self.cliente._peticion("PUT", f"/trabajos/{id_trabajo}/salida", fragmento,
+                                   {"trabajador": self.id, "desde": desde})
+        return desde + len(fragmento)
+
+    def procesar(self, trabajo):
+        id_trabajo = trabajo["id"]
+        directorio = tempfile.mkdtemp(prefix=f"orca_{id_trabajo}_", dir=self.directorio_scratch)
+        # Si no se llega a subir todo, el trabajo se da por fallido; si se cancelo o reasigno, solo libera capacidad
+        codigo_retorno = 1
+        try:
+            for nombre in trabajo["archivos_entrada"]:
+                ruta = os.path.join(directorio, ruta_relativa_segura(nombre))
+                os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                with open(ruta, "wb") as f:
+                    f.write(self.cliente.descargar(id_trabajo, "entrada", nombre))
+
+            entrada = ruta_relativa_segura(trabajo["entrada"])
+            salida = os.path.splitext(entrada)[0] + ".out"
+            proceso = iniciar_orca_local(entrada, os.path.join(directorio, salida), directorio_trabajo=directorio)
+
+            enviados = 0
+            while proceso.poll() is None:
+                time.sleep(self.intervalo_latido)
+                if id_trabajo in self.cancelados:
+                    proceso.kill()
+                    proceso.wait()
+                    return
+                try:
+                    enviados = self._enviar_salida(id_trabajo, os.path.join(directorio, salida), enviados)
+                except ErrorCoordinador as e:
+                    if e.codigo == 409:
+                        # El trabajo se reasigno a otro trabajador: abandonar esta copia
+                        proceso.kill()
+                        proceso.wait()
+                        return
+                except (error.URLError, OSError):
+                    pass
+
+            self._enviar_salida(id_trabajo, os.path.join(directorio, salida), enviados)
+            for raiz, _, archivos in os.walk(directorio):
+                for archivo in archivos:
+                    relativa = os.path.relpath(os.path.join(raiz, archivo), directorio).replace(os.sep, "/")
+                    if relativa == entrada or archivo.endswith(".tmp"):
+                        continue
+                    with open(os.path.join(raiz, archivo), "rb") as f:
+                        self.cliente._peticion("PUT", f"/trabajos/{id_trabajo}/artefactos/{relativa}",
+                                               f.read(), {"trabajador": self.id})
+            codigo_retorno = proceso.returncode
+        except ErrorCoordinador as e:
+            if e.codigo != 409:
+                raise
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+            try:
+                self.cliente._peticion("POST", f"/trabajos/{id_trabajo}/finalizar",
+                                       {"trabajador": self.id, "codigo_retorno": codigo_retorno})
+            except ErrorCoordinador:
+                pass
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Coordinador y trabajadores para repartir calculos de ORCA")
+    subparsers = parser.add_subparsers(dest="modo", required=True)
+
+    parser_coordinador = subparsers.add_parser("coordinador", help="Cola central de trabajos")
+    parser_coordinador.add_argument("--host", default="127.0.0.1")
+    parser_coordinador.add_argument("--puerto", type=int, default=8765)
+    parser_coordinador.add_argument("--directorio", default="cola_coordinador",
+                                    help="Donde se guardan entradas, salidas y artefactos")
+    parser_coordinador.add_argument("--latido", type=float, default=INTERVALO_LATIDO,
+                                    help="Intervalo de latido esperado (s)")
+    parser_coordinador.add_argument("--intentos", type=int, default=MAX_INTENTOS,
+                                    help="Intentos por trabajo antes de darlo por fallido")
+
+    parser_trabajador = subparsers.add_parser("trabajador", help="Ejecuta trabajos de ORCA en este nodo")
+    parser_trabajador.add_argument("--coordinador", default="http://127.0.0.1:8765")
+    parser_trabajador.add_argument("--nombre", default=None)
+    parser_trabajador.add_argument("--nucleos", type=int, default=None, help="Por defecto, todos los nucleos")
+    parser_trabajador.add_argument("--memoria-mb", type=float, default=0, help="0 = sin limite declarado")
+    parser_trabajador.add_argument("--scratch", default=None, help="Directorio temporal de trabajo (por defecto ORCA_SCRATCH)")
+    args = parser.parse_args(argumentos)
+
+    if args.modo == "coordinador":
+        servidor = servir_coordinador(args.directorio, args.host, args.puerto, args.latido, args.intentos)
+        print(f"Coordinador escuchando en http://{args.host}:{args.puerto}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            servidor.shutdown()
+    else:
+        trabajador = Trabajador(args.coordinador, args.nombre, args.nucleos, args.memoria_mb, args.scratch)
+        try:
+            trabajador.ejecutar()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
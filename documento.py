@@ -331,7 +331,7 @@ class GeneradorReportePDF:
             tabla_datos = [["Atomo", "Carga"]]
             for _, row in df_display.iterrows():
                 tabla_datos.append([
-                    row['Atomo'],
+                    f"{row['Indice']} {row['Elemento']}",
                     f"{row['Carga']:.4f}"
                 ])
 
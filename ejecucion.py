@@ -0,0 +1,150 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+
+from almacen import COMPRIMIBLES, ZSTD_DISPONIBLE, abrir_artefacto, comprimir_archivo, ruta_logica
+
+COMANDO_ORCA = os.environ.get("ORCA_COMANDO", "orca")
+# URL del coordinador (distribucion.py); si esta definida los trabajos se despachan a los trabajadores remotos
+COORDINADOR_ORCA = os.environ.get("ORCA_COORDINADOR")
+TIEMPO_MAXIMO = 54000
+PRIORIDAD_BAJA = 19
+
+# Directorio rapido (tmpfs, NVMe local) donde ORCA escribe integrales y temporales mientras corre
+DIR_SCRATCH = os.environ.get("ORCA_SCRATCH") or tempfile.gettempdir()
+# Solo estos archivos pasan del scratch al almacenamiento durable al terminar
+ARTEFACTOS_CONSERVADOS = (".inp", ".out", ".xyz", ".hess", ".gbw", ".engrad", ".property.txt", ".rendimiento.json")
+ARTEFACTOS_PESADOS = (".gbw", ".hess", "_trj.xyz")
+# Los artefactos promovidos se guardan comprimidos (zstd por cuadros) si el paquete esta instalado
+COMPRIMIR_ARTEFACTOS = ZSTD_DISPONIBLE and os.environ.get("ORCA_COMPRIMIR", "1") != "0"
+RETENCION_DIAS_PESADOS = float(os.environ.get("ORCA_RETENCION_PESADOS_DIAS", 30))
+RETENCION_DIAS = float(os.environ.get("ORCA_RETENCION_DIAS", 0))
+PATRON_ID_TRABAJO = re.compile(r'^\d{8}-\d{6}_[0-9a-f]{8}_')
+
+
+def iniciar_orca_local(ruta_entrada, ruta_salida, prioridad=0, directorio_trabajo=None):
+    # Los trabajos de baja prioridad se lanzan con nice para no bloquear el nodo al resto de usuarios
+    reducir_prioridad = (lambda: os.nice(prioridad)) if prioridad and os.name == "posix" else None
+    with open(ruta_salida, "w") as f_out:
+        return subprocess.Popen([COMANDO_ORCA, ruta_entrada], stdout=f_out, stderr=subprocess.STDOUT, text=True,
+                                preexec_fn=reducir_prioridad, cwd=directorio_trabajo)
+
+
+def iniciar_orca(ruta_entrada, ruta_salida, prioridad=0):
+    if COORDINADOR_ORCA:
+        from distribucion import ProcesoRemoto
+        return ProcesoRemoto(COORDINADOR_ORCA, ruta_entrada, ruta_salida, prioridad)
+    # ORCA corre dentro del directorio del trabajo: sus temporales y las rutas relativas de la entrada quedan ahi
+    directorio, nombre = os.path.split(os.path.abspath(ruta_entrada))
+    return iniciar_orca_local(nombre, os.path.abspath(ruta_salida), prioridad, directorio)
+
+
+def leer_final(ruta_salida, num_bytes=4000):
+    with abrir_artefacto(ruta_salida, binario=True) as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - num_bytes))
+        return f.read().decode("utf-8", errors="ignore")
+
+
+def verificar_proceso(proceso, ruta_salida):
+    if proceso.returncode != 0:
+        raise subprocess.CalledProcessError(proceso.returncode, proceso.args, None, leer_final(ruta_salida))
+    return ruta_salida
+
+
+def ejecutar_orca(ruta_entrada, ruta_salida, timeout=TIEMPO_MAXIMO, prioridad=0):
+    proceso = iniciar_orca(ruta_entrada, ruta_salida, prioridad)
+    try:
+        proceso.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+        proceso.wait()
+        raise
+    return verificar_proceso(proceso, ruta_salida)
+
+
+def escribir_y_ejecutar(contenido_entrada, directorio, nombre_trabajo, timeout=TIEMPO_MAXIMO, prioridad=0):
+    ruta_entrada = os.path.join(directorio, f"{nombre_trabajo}.inp")
+    ruta_salida = os.path.join(directorio, f"{nombre_trabajo}.out")
+    with open(ruta_entrada, "w") as f:
+        f.write(contenido_entrada)
+    return ejecutar_orca(ruta_entrada, ruta_salida, timeout, prioridad)
+
+
+class EspacioTrabajo:
+    def __init__(self, nombre, directorio_resultados, directorio_scratch=DIR_SCRATCH):
+        self.nombre = nombre
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}_{nombre}"
+        self.directorio = os.path.join(directorio_scratch, "orca_trabajos", self.id)
+        self.destino = os.path.join(directorio_resultados, self.id)
+        os.makedirs(self.directorio)
+
+    def ruta(self, extension):
+        return os.path.join(self.directorio, f"{self.nombre}{extension}")
+
+    def ruta_durable(self, ruta):
+        return os.path.join(self.destino, os.path.relpath(ruta, self.directorio))
+
+    def promover(self, conservar=ARTEFACTOS_CONSERVADOS, comprimir=COMPRIMIR_ARTEFACTOS):
+        os.makedirs(self.destino, exist_ok=True)
+        for raiz, _, archivos in os.walk(self.directorio):
+            for archivo in archivos:
+                if archivo.endswith(conservar):
+                    origen = os.path.join(raiz, archivo)
+                    destino = self.ruta_durable(origen)
+                    os.makedirs(os.path.dirname(destino), exist_ok=True)
+                    shutil.move(origen, destino)
+                    if comprimir and archivo.endswith(COMPRIMIBLES):
+                        comprimir_archivo(destino)
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        return self.destino
+
+
+def _ultima_modificacion(directorio):
+    fechas = [os.path.getmtime(directorio)]
+    for raiz, _, archivos in os.walk(directorio):
+        fechas.extend(os.path.getmtime(os.path.join(raiz, archivo)) for archivo in archivos)
+    return max(fechas)
+
+
+def limpiar_scratch(directorio_scratch=DIR_SCRATCH, horas=48):
+    # Trabajos abandonados (sesion cerrada o servidor reiniciado a mitad de calculo)
+    raiz = os.path.join(directorio_scratch, "orca_trabajos")
+    if not os.path.isdir(raiz):
+        return 0
+    limite = time.time() - horas * 3600
+    eliminados = 0
+    for nombre in os.listdir(raiz):
+        ruta = os.path.join(raiz, nombre)
+        if os.path.isdir(ruta) and _ultima_modificacion(ruta) < limite:
+            shutil.rmtree(ruta, ignore_errors=True)
+            eliminados += 1
+    return eliminados
+
+
+def aplicar_retencion(directorio_resultados, dias_pesados=RETENCION_DIAS_PESADOS, dias_total=RETENCION_DIAS):
+    ahora = time.time()
+    liberados = 0
+    trabajos_eliminados = 0
+    for nombre in os.listdir(directorio_resultados):
+        ruta = os.path.join(directorio_resultados, nombre)
+        if not os.path.isdir(ruta) or not PATRON_ID_TRABAJO.match(nombre):
+            continue
+
+        # La fecha va en el propio id: borrar artefactos cambia el mtime del directorio
+        antiguedad_dias = (ahora - time.mktime(time.strptime(nombre[:15], "%Y%m%d-%H%M%S"))) / 86400
+        if dias_total and antiguedad_dias > dias_total:
+            liberados += sum(os.path.getsize(os.path.join(r, a)) for r, _, archivos in os.walk(ruta) for a in archivos)
+            shutil.rmtree(ruta, ignore_errors=True)
+            trabajos_eliminados += 1
+        elif dias_pesados and antiguedad_dias > dias_pesados:
+            for archivo in os.listdir(ruta):
+                if ruta_logica(archivo).endswith(ARTEFACTOS_PESADOS):
+                    liberados += os.path.getsize(os.path.join(ruta, archivo))
+                    os.remove(os.path.join(ruta, archivo))
+
+    return {"trabajos_eliminados": trabajos_eliminados, "bytes_liberados": liberados}
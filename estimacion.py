@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+
+from utils import TIPOS_CALCULO
+
+# Funciones de base esfericas por elemento (H-Kr), en el orden de numero atomico
+FUNCIONES_BASE = {
+    "def2-svp": [5, 5, 9, 9, 14, 14, 14, 14, 14, 14, 15, 18, 18, 18, 18, 18, 18, 18,
+                 24, 24, 31, 31, 31, 31, 31, 31, 31, 31, 31, 31, 32, 32, 32, 32, 32, 32],
+    "def2-tzvp": [6, 6, 14, 19, 31, 31, 31, 31, 31, 31, 32, 32, 37, 37, 37, 37, 37, 37,
+                  33, 36, 45, 45, 45, 45, 45, 45, 45, 45, 45, 48, 48, 48, 48, 48, 48, 48],
+    "6-31+g(d,p)": [5, 5, 18, 18, 18, 18, 18, 18, 18, 18, 22, 22, 22, 22, 22, 22, 22, 22, 26, 26],
+    "6-311++g(d,p)": [7, 6, 22, 22, 22, 22, 22, 22, 22, 22, 30, 30, 30, 30, 30, 30, 30, 30, 43, 43,
+                      None, None, None, None, None, None, None, None, None, None, 44, 44, 44, 44, 44, 44],
+    "cc-pvdz": [5, 5, 14, 14, 14, 14, 14, 14, 14, 14, 18, 18, 18, 18, 18, 18, 18, 18,
+                None, 27, 43, 43, 43, 43, 43, 43, 43, 43, 43, 43, 27, 27, 27, 27, 27, 27],
+}
+
+ALIAS_BASES = {
+    "def2-tzvp-zora": "def2-tzvp",
+    "6-31+g**": "6-31+g(d,p)",
+    "6-311++g**": "6-311++g(d,p)",
+}
+
+PRESUPUESTO_HORAS = float(os.environ.get("ORCA_PRESUPUESTO_HORAS", 24))
+PRESUPUESTO_MEMORIA_MB = float(os.environ.get("ORCA_PRESUPUESTO_MEMORIA_MB", 16000))
+
+# ln(t) = b0 + b1 ln(Nbf) + b2 OPT + b3 FREQ + b4 FREQ ln(Natomos) + b5 NMR
+COEFICIENTES_PREVIOS = np.array([-10.25, 2.5, np.log(10.0), np.log(2.0), 1.0, np.log(3.0)])
+PESO_PREVIO = 1.0
+
+
+def contar_funciones_base(molecula, base):
+    clave = base.lower()
+    tabla = FUNCIONES_BASE.get(ALIAS_BASES.get(clave, clave))
+    if tabla is None:
+        return None
+
+    # Elementos sin datos (o mas alla del Kr, con ECP) cuentan como el mayor valor de la tabla
+    maximo = max(n for n in tabla if n is not None)
+    conteo = np.array([maximo if n is None else n for n in tabla] + [maximo])
+    indices = np.minimum(molecula.numeros_atomicos.astype(np.int64), len(tabla) + 1) - 1
+    return int(conteo[indices].sum())
+
+
+def _caracteristicas(num_funciones_base, num_atomos, palabras_clave):
+    claves = {token.upper() for token in palabras_clave.split()}
+    freq = float(bool(claves & {"FREQ", "NUMFREQ"}))
+    return np.array([
+        1.0, np.log(num_funciones_base), float("OPT" in claves), freq,
+        freq * np.log(max(num_atomos, 1)), float("NMR" in claves)
+    ])
+
+
+class ModeloCoste:
+    def __init__(self, coeficientes=None, num_trabajos=0):
+        self.coeficientes = COEFICIENTES_PREVIOS if coeficientes is None else np.asarray(coeficientes)
+        self.num_trabajos = num_trabajos
+
+    @classmethod
+    def ajustar(cls, historial, peso_previo=PESO_PREVIO):
+        if historial is None or historial.empty:
+            return cls()
+
+        x = np.array([_caracteristicas(fila.num_funciones_base, fila.num_atomos, fila.palabras_clave or "")
+                      for fila in historial.itertuples()])
+        y = np.log(historial["tiempo_total_s"].to_numpy(dtype=float))
+
+        # Minimos cuadrados regularizados hacia el modelo previo: con pocos trabajos
+        # en la base de datos los coeficientes no identificables se quedan en su valor previo
+        identidad = peso_previo * np.eye(len(COEFICIENTES_PREVIOS))
+        coeficientes = np.linalg.solve(x.T @ x + identidad, x.T @ y + identidad @ COEFICIENTES_PREVIOS)
+        return cls(coeficientes, len(historial))
+
+    def estimar_tiempo(self, num_funciones_base, num_atomos, palabras_clave):
+        return float(np.exp(_caracteristicas(num_funciones_base, num_atomos, palabras_clave) @ self.coeficientes))
+
+
+def estimar_memoria_mb(num_funciones_base, num_atomos, palabras_clave):
+    claves = {token.upper() for token in palabras_clave.split()}
+    matriz_mb = 8 * num_funciones_base ** 2 / 1e6
+
+    # Matrices de Fock, densidad y DIIS, mas las densidades perturbadas de la Hessiana (3N) y del NMR (3)
+    memoria = 300.0 + 20 * matriz_mb
+    if claves & {"FREQ", "NUMFREQ"}:
+        memoria += 2 * 3 * num_atomos * matriz_mb
+    if "NMR" in claves:
+        memoria += 2 * 3 * matriz_mb
+    return memoria
+
+
+def paso_estimacion(tipo_calculo, base, palabras_clave="", calc_nmr=False):
+    palabras = f"{TIPOS_CALCULO.get(tipo_calculo, '')} {palabras_clave}" + (" NMR" if calc_nmr else "")
+    return {"base": base, "palabras_clave": palabras}
+
+
+def estimar_coste(molecula, pasos, modelo=None):
+    modelo = modelo or ModeloCoste()
+    filas = []
+    for paso in pasos:
+        num_funciones = contar_funciones_base(molecula, paso["base"])
+        if num_funciones is None:
+            filas.append({"base": paso["base"], "num_funciones_base": None, "tiempo_s": None, "memoria_mb": None})
+            continue
+        filas.append({
+            "base": paso["base"],
+            "num_funciones_base": num_funciones,
+            "tiempo_s": modelo.estimar_tiempo(num_funciones, molecula.num_atomos, paso["palabras_clave"]),
+            "memoria_mb": estimar_memoria_mb(num_funciones, molecula.num_atomos, paso["palabras_clave"])
+        })
+
+    conocidos = [f for f in filas if f["tiempo_s"] is not None]
+    return {
+        "pasos": filas,
+        "num_funciones_base": max((f["num_funciones_base"] for f in conocidos), default=None),
+        "tiempo_s": sum(f["tiempo_s"] for f in conocidos) if conocidos else None,
+        "memoria_mb": max((f["memoria_mb"] for f in conocidos), default=None),
+        "trabajos_ajuste": modelo.num_trabajos
+    }
+
+
+def formatear_duracion(segundos):
+    if segundos < 120:
+        return f"{segundos:.0f} s"
+    if segundos < 7200:
+        return f"{segundos / 60:.0f} min"
+    if segundos < 172800:
+        return f"{segundos / 3600:.1f} h"
+    return f"{segundos / 86400:.1f} días"
+
+
+def decidir_admision(estimacion, max_horas=PRESUPUESTO_HORAS, max_memoria_mb=PRESUPUESTO_MEMORIA_MB,
+                     politica="rechazar"):
+    motivos = []
+    if estimacion["tiempo_s"] is not None and estimacion["tiempo_s"] > max_horas * 3600:
+        motivos.append(f"tiempo estimado {estimacion['tiempo_s'] / 3600:.1f} h > {max_horas:g} h")
+    if estimacion["memoria_mb"] is not None and estimacion["memoria_mb"] > max_memoria_mb:
+        motivos.append(f"memoria estimada {estimacion['memoria_mb']:.0f} MB > {max_memoria_mb:g} MB")
+
+    if not motivos:
+        return {"decision": "aceptar", "motivos": []}
+    return {"decision": "baja_prioridad" if politica == "baja_prioridad" else "rechazar", "motivos": motivos}
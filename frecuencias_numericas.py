@@ -0,0 +1,219 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from almacen import abrir_artefacto, leer_artefacto
+from constantes import AMU_KG, BOHR_A_ANGSTROM, C_LUZ_CM, H_PLANCK, HARTREE_A_KCAL, HARTREE_J, ME_KG
+from ejecucion import COORDINADOR_ORCA, escribir_y_ejecutar
+from simetria import detectar_simetria
+from termoquimica import calcular_termoquimica, constantes_rotacionales
+from utils import Orca
+from vibraciones import analisis_vibracional
+
+# Desplazamiento cartesiano (bohr); el mismo que usa ORCA por defecto en NumFreq
+PASO_NUMFREQ = float(os.environ.get("ORCA_PASO_NUMFREQ", 0.005))
+TRABAJOS_NUMFREQ = int(os.environ.get("ORCA_TRABAJOS_NUMFREQ", os.cpu_count() or 1))
+
+HARTREE_CM = HARTREE_J / (H_PLANCK * C_LUZ_CM)
+# T^2 = |dmu/dQ|^2 * hbar / (2 omega), en unidades atomicas (Q con la masa en masas electronicas)
+FACTOR_TRANSICION = HARTREE_CM / (2 * AMU_KG / ME_KG)
+# Cociente Int/eps de la tabla IR SPECTRUM de ORCA (linea delta)
+INTENSIDAD_POR_EPSILON = 5053.6
+
+
+def geometrias_desplazadas(molecula, paso=PASO_NUMFREQ):
+    # Diferencias centrales: +h y -h en cada una de las 3N coordenadas cartesianas
+    desplazadas = []
+    for coordenada in range(3 * molecula.num_atomos):
+        for signo in (1, -1):
+            coordenadas = molecula.coordenadas.copy()
+            coordenadas[coordenada // 3, coordenada % 3] += signo * paso * BOHR_A_ANGSTROM
+            desplazadas.append((coordenada, signo, molecula.con_coordenadas(coordenadas)))
+    return desplazadas
+
+
+def leer_engrad(ruta_engrad):
+    # Bloques separados por comentarios: numero de atomos, energia, gradiente (Eh/bohr) y geometria
+    valores = [linea.strip() for linea in leer_artefacto(ruta_engrad).split('\n')]
+    bloques, actual = [], []
+    for linea in valores:
+        if linea.startswith('#'):
+            if actual:
+                bloques.append(actual)
+            actual = []
+        elif linea:
+            actual.append(linea)
+    if actual:
+        bloques.append(actual)
+    return float(bloques[1][0]), np.array(bloques[2], dtype=float)
+
+
+def _gradiente(molecula, nombre, directorio, metodo, base, palabras_clave, orbitales, prioridad):
+    entrada = Orca.generar_entrada(molecula, "Gradiente", metodo, base, palabras_clave)
+    # Con <nombre>.gbw junto a la entrada ORCA arranca de esos orbitales, tambien en un trabajador remoto
+    if orbitales:
+        # abrir_artefacto tambien acepta un .gbw.zst de versiones que comprimian los orbitales
+        copia = os.path.join(directorio, f"{nombre}.gbw")
+        with abrir_artefacto(orbitales, binario=True) as origen, open(copia, "wb") as destino:
+            shutil.copyfileobj(origen, destino)
+    try:
+        ruta_salida = escribir_y_ejecutar(entrada, directorio, nombre, prioridad=prioridad)
+        _, gradiente = leer_engrad(os.path.join(directorio, f"{nombre}.engrad"))
+    except Exception as e:
+        return {"error": str(e)}
+    return {"gradiente": gradiente, "dipolo": Orca(ruta_salida).extraer_momento_dipolar()}
+
+
+def calcular_frecuencias_numericas(molecula, nombre_trabajo, directorio, metodo, base, palabras_clave,
+                                   paso=PASO_NUMFREQ, trabajos_paralelos=TRABAJOS_NUMFREQ, orbitales=None,
+                                   prioridad=0):
+    desplazadas = geometrias_desplazadas(molecula, paso)
+    directorio_gradientes = os.path.join(directorio, f"{nombre_trabajo}_numfreq")
+    os.makedirs(directorio_gradientes, exist_ok=True)
+    # Con el coordinador los 6N gradientes se encolan a la vez y los reparten los trabajadores
+    paralelos = len(desplazadas) if COORDINADOR_ORCA else trabajos_paralelos
+
+    with ThreadPoolExecutor(max_workers=paralelos) as pool:
+        resultados = list(pool.map(
+            lambda par: _gradiente(par[1][2], f"{nombre_trabajo}_desp{par[0] + 1:04d}", directorio_gradientes,
+                                   metodo, base, palabras_clave, orbitales, prioridad),
+            enumerate(desplazadas)
+        ))
+
+    fallidos = [i + 1 for i, r in enumerate(resultados) if "error" in r]
+    if fallidos:
+        return {"error": f"{len(fallidos)} de {len(resultados)} gradientes fallaron (desplazamientos "
+                         f"{', '.join(map(str, fallidos[:10]))}{'...' if len(fallidos) > 10 else ''}); "
+                         f"las salidas quedan en {directorio_gradientes}"}
+
+    gradientes = np.array([r["gradiente"] for r in resultados]).reshape(-1, 2, 3 * molecula.num_atomos)
+    hessiana = (gradientes[:, 0] - gradientes[:, 1]) / (2 * paso)
+    hessiana = 0.5 * (hessiana + hessiana.T)
+
+    derivadas_dipolo = None
+    if all(r["dipolo"] is not None for r in resultados):
+        dipolos = np.array([r["dipolo"] for r in resultados]).reshape(-1, 2, 3)
+        derivadas_dipolo = (dipolos[:, 0] - dipolos[:, 1]) / (2 * paso)
+
+    shutil.rmtree(directorio_gradientes, ignore_errors=True)
+    masas = molecula.masas
+    analisis = analisis_vibracional(hessiana, masas, molecula.coordenadas / BOHR_A_ANGSTROM,
+                                    derivadas_dipolo=derivadas_dipolo)
+    return dict(analisis, hessiana=hessiana, derivadas_dipolo=derivadas_dipolo, num_gradientes=len(resultados))
+
+
+def _bloques(matriz, columnas, ancho_indice, formato_valor, ancho_cabecera):
+    lineas = []
+    for inicio in range(0, matriz.shape[1], columnas):
+        fin = min(inicio + columnas, matriz.shape[1])
+        lineas.append(" " * ancho_indice + "".join(f"{j:>{ancho_cabecera}d}" for j in range(inicio, fin)))
+        for i, fila in enumerate(matriz[:, inicio:fin]):
+            lineas.append(f"{i:>{ancho_indice}d}" + "".join(formato_valor.format(v) for v in fila))
+    return "\n".join(lineas)
+
+
+def escribir_hess(ruta_hess, molecula, resultado):
+    # Mismo formato que el .hess de ORCA: lo leen termoquimica.leer_hess y vibraciones.leer_hessiana
+    n = 3 * molecula.num_atomos
+    coordenadas = molecula.coordenadas / BOHR_A_ANGSTROM
+    partes = [
+        "\n$orca_hessian_file\n",
+        f"$hessian\n{n}\n{_bloques(resultado['hessiana'], 5, 5, '{:19.10E}', 19)}\n",
+        f"$vibrational_frequencies\n{n}\n"
+        + "".join(f"{i:5d} {f:25.16f}\n" for i, f in enumerate(resultado["frecuencias"])),
+        f"$normal_modes\n{n} {n}\n{_bloques(resultado['modos'], 5, 5, '{:19.10E}', 19)}\n",
+        f"#\n# The atoms: label  mass x y z (in bohrs)\n#\n$atoms\n{molecula.num_atomos}\n"
+        + "".join(f" {e:<2s} {m:12.5f} {x:18.12f} {y:18.12f} {z:18.12f}\n"
+                  for e, m, (x, y, z) in zip(molecula.elementos, molecula.masas, coordenadas)),
+    ]
+    if resultado.get("derivadas_dipolo") is not None:
+        partes.append(f"$dipole_derivatives\n{n}\n"
+                      + "".join("".join(f"{v:19.10E}" for v in fila) + "\n" for fila in resultado["derivadas_dipolo"]))
+    partes.append("$end\n")
+    with open(ruta_hess, "w") as f:
+        f.write("\n".join(partes))
+    return ruta_hess
+
+
+def seccion_vibracional(resultado, num_gradientes):
+    # Las mismas secciones que imprime ORCA tras un FREQ, para que la salida se analice igual
+    frecuencias, modos = resultado["frecuencias"], resultado["modos"]
+    lineas = [
+        "", "-" * 28, "VIBRATIONAL FREQUENCIES", "-" * 23, "",
+        f"Numerical Hessian from {num_gradientes} independent gradient jobs (central differences)", "",
+    ]
+    lineas += [f"{i:6d}: {f:10.2f} cm**-1" for i, f in enumerate(frecuencias)]
+    lineas += ["", "", "", "-" * 12, "NORMAL MODES", "-" * 12, "",
+               "These modes are the Cartesian displacements weighted by the diagonal matrix",
+               "M(i,i)=1/sqrt(m[i]) where m[i] is the mass of the displaced atom", "",
+               _bloques(modos, 6, 7, "{:11.6f}", 11), "", ""]
+
+    intensidades = resultado.get("intensidades")
+    if intensidades is not None:
+        vibracionales = np.flatnonzero(np.abs(frecuencias) > 0)
+        lineas += ["-" * 11, "IR SPECTRUM", "-" * 11, "",
+                   " Mode   freq       eps      Int      T**2         TX        TY        TZ",
+                   "       cm**-1   L/(mol*cm) km/mol    a.u.",
+                   "-" * 76]
+        for i in vibracionales:
+            t = resultado["transiciones"][i] * np.sqrt(FACTOR_TRANSICION / abs(frecuencias[i]))
+            lineas.append(f"{i:3d}: {frecuencias[i]:9.2f} {intensidades[i] / INTENSIDAD_POR_EPSILON:10.6f} "
+                          f"{intensidades[i]:7.2f} {(t ** 2).sum():9.6f}  ({t[0]:9.6f} {t[1]:9.6f} {t[2]:9.6f})")
+        lineas += ["", "* The epsilon (eps) is given for a Dirac delta lineshape.", ""]
+    return "\n".join(lineas) + "\n"
+
+
+def seccion_termoquimica(molecula, resultado, energia_electronica, multiplicidad, temperatura=298.15):
+    # ORCA solo imprime la termoquimica (y el numero de simetria) tras un FREQ: se reproduce con el grupo puntual
+    # de la geometria optimizada para que el sigma de la entropia rotacional no caiga a 1
+    simetria = detectar_simetria(molecula)
+    constantes = constantes_rotacionales(molecula.masas, molecula.coordenadas)
+    t = {clave: float(np.ravel(valor)[0]) for clave, valor in calcular_termoquimica(
+        resultado["frecuencias"], constantes, float(molecula.masas.sum()), energia_electronica,
+        temperaturas=temperatura, numero_simetria=simetria["numero_simetria"], multiplicidad=multiplicidad).items()}
+    correccion_termica = t["e_vib"] + t["e_rot"] + t["e_trans"]
+    entropia = t["H"] - t["G"]
+    ts_electronica = entropia - t["ts_vib"] - t["ts_rot"] - t["ts_trans"]
+
+    def linea(etiqueta, valor, kcal=True):
+        return f"{etiqueta:<33s}... {valor:15.8f} Eh" + (f" {valor * HARTREE_A_KCAL:9.2f} kcal/mol" if kcal else "")
+
+    lineas = [
+        "", "-" * 26, f"THERMOCHEMISTRY AT {temperatura:.2f}K", "-" * 26, "",
+        f"Temperature         ... {temperatura:8.2f} K",
+        "Pressure            ...     1.00 atm",
+        f"Total Mass          ... {molecula.masas.sum():8.2f} AMU", "",
+        linea("Electronic energy", energia_electronica, kcal=False),
+        linea("Zero point energy", t["zpe"]),
+        linea("Thermal vibrational correction", t["e_vib"]),
+        linea("Thermal rotational correction", t["e_rot"]),
+        linea("Thermal translational correction", t["e_trans"]),
+        "-" * 71,
+        f"Total thermal energy                 {t['U']:15.8f} Eh", "",
+        f"Total thermal correction             {correccion_termica:15.8f} Eh", "",
+        linea("Total Enthalpy", t["H"], kcal=False), "",
+        f"Point Group:  {simetria['grupo_puntual']}, Symmetry Number: {simetria['numero_simetria']:3d}",
+        "Rotational constants in cm-1: " + " ".join(f"{b:12.6f}" for b in constantes), "",
+        linea("Electronic entropy", ts_electronica),
+        linea("Vibrational entropy", t["ts_vib"]),
+        linea("Rotational entropy", t["ts_rot"]),
+        linea("Translational entropy", t["ts_trans"]),
+        "-" * 71,
+        linea("Final entropy term", entropia), "",
+        linea("Final Gibbs free energy", t["G"], kcal=False),
+        linea("G-E(el)", t["G"] - energia_electronica), "",
+    ]
+    return "\n".join(lineas) + "\n"
+
+
+def anexar_a_salida(ruta_salida, resultado, molecula):
+    analizador = Orca(ruta_salida)
+    energia = analizador.extraer_energia_final()
+    if energia is None:
+        raise ValueError(f"No hay energía final en {ruta_salida}: la termoquímica no puede anexarse")
+    texto = seccion_vibracional(resultado, resultado["num_gradientes"])
+    texto += seccion_termoquimica(molecula, resultado, energia, analizador.extraer_multiplicidad())
+    with open(ruta_salida, "a") as f:
+        f.write(texto)
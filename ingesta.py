@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from multiprocessing import Pool
+
+from almacen import EXTENSION_COMPRIMIDA, resolver_artefacto, ruta_logica
+from basedatos import BaseResultados, extraer_registro
+
+
+def buscar_salidas(directorio, extension=".out"):
+    for raiz, _, archivos in os.walk(directorio):
+        for archivo in archivos:
+            # Las salidas comprimidas (.out.zst) se registran con su ruta logica (.out)
+            if archivo.endswith(extension) or archivo.endswith(extension + EXTENSION_COMPRIMIDA):
+                yield ruta_logica(os.path.abspath(os.path.join(raiz, archivo)))
+
+
+def filtrar_pendientes(rutas, huellas, forzar=False):
+    for ruta in rutas:
+        try:
+            estado = os.stat(resolver_artefacto(ruta) or ruta)
+        except OSError:
+            continue
+        if forzar or huellas.get(ruta) != (estado.st_mtime, estado.st_size):
+            yield ruta
+
+
+def _procesar_salida(ruta):
+    try:
+        return True, extraer_registro(ruta)
+    except Exception as e:
+        try:
+            estado = os.stat(resolver_artefacto(ruta) or ruta)
+            mtime, tamano = estado.st_mtime, estado.st_size
+        except OSError:
+            mtime, tamano = None, None
+        return False, {"ruta": ruta, "mtime": mtime, "tamano": tamano,
+                       "error": f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}", "fecha": time.time()}
+
+
+def ingerir_directorio(directorio, ruta_bd, procesos=None, tamano_lote=500, forzar=False, reintentar_fallos=False,
+                       informar=print):
+    base = BaseResultados(ruta_bd)
+    huellas = base.huellas_archivos(incluir_fallos=not reintentar_fallos)
+    pendientes = list(filtrar_pendientes(buscar_salidas(directorio), huellas, forzar))
+
+    estadisticas = {"pendientes": len(pendientes), "procesados": 0, "fallidos": 0, "segundos": 0.0}
+    informar(f"{len(pendientes)} salidas por procesar ({len(huellas)} ya registradas en {ruta_bd})")
+    if not pendientes:
+        return estadisticas
+
+    inicio = time.perf_counter()
+    lote, fallos = [], []
+
+    def volcar():
+        base.guardar(lote)
+        base.registrar_fallos(fallos)
+        lote.clear()
+        fallos.clear()
+        transcurrido = time.perf_counter() - inicio
+        hechos = estadisticas["procesados"] + estadisticas["fallidos"]
+        informar(f"{hechos}/{len(pendientes)} archivos | {hechos / transcurrido:.1f} archivos/s | "
+                 f"{estadisticas['fallidos']} fallidos")
+
+    with Pool(processes=procesos) as pool:
+        for exito, resultado in pool.imap_unordered(_procesar_salida, pendientes, chunksize=16):
+            if exito:
+                lote.append(resultado)
+                estadisticas["procesados"] += 1
+            else:
+                fallos.append(resultado)
+                estadisticas["fallidos"] += 1
+
+            if len(lote) + len(fallos) >= tamano_lote:
+                volcar()
+
+    if lote or fallos:
+        volcar()
+    estadisticas["segundos"] = time.perf_counter() - inicio
+    return estadisticas
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Re-ingesta masiva de salidas de ORCA en la base de resultados")
+    parser.add_argument("directorio", help="Directorio raiz con archivos .out")
+    parser.add_argument("--bd", default=os.path.join("calculations", "resultados.db"), help="Ruta de la base SQLite")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, todos los nucleos)")
+    parser.add_argument("--lote", type=int, default=500, help="Registros por transaccion")
+    parser.add_argument("--forzar", action="store_true", help="Re-procesar aunque el archivo no haya cambiado")
+    parser.add_argument("--reintentar-fallos", action="store_true", help="Volver a intentar archivos que fallaron")
+    args = parser.parse_args(argumentos)
+
+    estadisticas = ingerir_directorio(args.directorio, args.bd, args.procesos, args.lote, args.forzar,
+                                      args.reintentar_fallos)
+    if estadisticas["segundos"] > 0:
+        print(f"Completado: {estadisticas['procesados']} registrados, {estadisticas['fallidos']} fallidos en "
+              f"{estadisticas['segundos']:.1f} s "
+              f"({estadisticas['pendientes'] / estadisticas['segundos']:.1f} archivos/s)")
+    return 1 if estadisticas["fallidos"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
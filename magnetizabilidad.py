@@ -0,0 +1,167 @@
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.linalg
+from pyscf import df, dft, gto, lib
+from pyscf.dft import numint
+
+with warnings.catch_warnings():
+    # Los modulos de propiedades de PySCF avisan al importarse de que estan "en pruebas"
+    warnings.simplefilter("ignore")
+    from pyscf.prop.magnetizability import rks as magnetizabilidad_rks
+    from pyscf.prop.nmr import rhf as nmr_rhf
+    from pyscf.prop.nmr import rks as nmr_rks
+
+from constantes import MAGNETIZABILIDAD_AU_A_CGS
+
+HILOS = int(os.environ.get("ORCA_PYSCF_HILOS", os.cpu_count() or 1))
+# Memoria por bloque de funciones auxiliares al contraer las integrales (g ij|P)
+MEMORIA_BLOQUE_MB = int(os.environ.get("ORCA_PYSCF_BLOQUE_MB", 1000))
+
+BASES_PYSCF = {
+    'def2-svp': 'def2svp',
+    'def2-tzvp': 'def2tzvp',
+    '6-31+g(d,p)': '6-31+g*',
+    '6-311++g(d,p)': '6-311++g**',
+    'cc-pvdz': 'ccpvdz'
+}
+
+
+def preparar_scf(molecula, metodo, base):
+    mol = gto.M(atom=molecula.atomos_pyscf(), basis=BASES_PYSCF.get(base.lower(), base.lower()), unit='Angstrom')
+    mf = dft.RKS(mol).density_fit()
+    mf.xc = metodo.lower()
+    # Las rutinas GIAO de pyscf-properties recorren la malla en bloques de BLKSIZE puntos
+    mf.grids.alignment = numint.BLKSIZE
+    mf.kernel()
+    return mf
+
+
+def _bloques_auxiliares(mol, auxmol):
+    por_funcion = 3 * mol.nao ** 2 * 8
+    maximo = max(1, int(MEMORIA_BLOQUE_MB * 1e6 // por_funcion))
+    ao_loc = auxmol.ao_loc_nr()
+    inicio = 0
+    while inicio < auxmol.nbas:
+        fin = inicio + 1
+        while fin < auxmol.nbas and ao_loc[fin + 1] - ao_loc[inicio] <= maximo:
+            fin += 1
+        yield inicio, fin, ao_loc[inicio], ao_loc[fin]
+        inicio = fin
+
+
+def jk_giao_df(mf, dm0, con_intercambio=True):
+    # (g_x ij|kl) ~ sum_PQ (g_x ij|P) [J^-1]_PQ (Q|kl): la derivada GIAO solo afecta al par ij
+    mol, auxmol = mf.mol, mf.with_df.auxmol
+    nao, naux = mol.nao, auxmol.nao
+    ocupados = mf.mo_coeff[:, mf.mo_occ > 0]
+    metrica = scipy.linalg.cho_factor(auxmol.intor("int2c2e", hermi=1))
+
+    rho = np.empty(naux)
+    transformadas = np.empty((naux, ocupados.shape[1], nao)) if con_intercambio else None
+    for s0, s1, p0, p1 in _bloques_auxiliares(mol, auxmol):
+        bloque = df.incore.aux_e2(mol, auxmol, "int3c2e", shls_slice=(0, mol.nbas, 0, mol.nbas, s0, s1))
+        bloque = bloque.reshape(nao, nao, p1 - p0)
+        rho[p0:p1] = np.einsum("klP,lk->P", bloque, dm0)
+        if con_intercambio:
+            transformadas[p0:p1] = lib.einsum("klP,ko->Pol", bloque, ocupados)
+    coeficientes = scipy.linalg.cho_solve(metrica, rho)
+    if con_intercambio:
+        transformadas = scipy.linalg.cho_solve(metrica, transformadas.reshape(naux, -1)).reshape(transformadas.shape)
+
+    vj = np.zeros((3, nao, nao))
+    vk = np.zeros((3, nao, nao)) if con_intercambio else None
+    for s0, s1, p0, p1 in _bloques_auxiliares(mol, auxmol):
+        bloque = df.incore.aux_e2(mol, auxmol, "int3c2e_ig1", comp=3, shls_slice=(0, mol.nbas, 0, mol.nbas, s0, s1))
+        bloque = bloque.reshape(3, nao, nao, p1 - p0)
+        vj -= lib.einsum("xijP,P->xij", bloque, coeficientes[p0:p1])
+        if con_intercambio:
+            # dm0 = 2 C_occ C_occ^T
+            vk += 2 * lib.einsum("xijP,jo,Pol->xil", bloque, ocupados, transformadas[p0:p1])
+    if con_intercambio:
+        vk = -(vk - vk.transpose(0, 2, 1))
+    return vj, vk
+
+
+def fock_giao_df(mag, dm0=None, gauge_orig=None):
+    # Mismo F10 que pyscf.prop.nmr.rks.get_fock, con J/K de densidad ajustada
+    mf, mol = mag._scf, mag.mol
+    if dm0 is None:
+        dm0 = mf.make_rdm1()
+    h1 = -.5 * mol.intor('int1e_giao_irjxp', 3)
+    h1 -= mol.intor_asymmetric('int1e_ignuc', 3)
+    if mol.has_ecp():
+        h1 -= mol.intor_asymmetric('ECPscalar_ignuc', 3)
+    h1 -= mol.intor('int1e_igkin', 3)
+
+    ni = mf._numint
+    omega, alfa, hibrido = ni.rsh_and_hybrid_coeff(mf.xc, mol.spin)
+    dm0 = lib.tag_array(dm0, mo_coeff=mf.mo_coeff, mo_occ=mf.mo_occ)
+    h1 -= nmr_rks.get_vxc_giao(ni, mol, mf.grids, mf.xc, dm0, max_memory=mf.max_memory, verbose=mag.verbose)
+
+    vj, vk = jk_giao_df(mf, dm0, con_intercambio=abs(hibrido) > 1e-10)
+    h1 += vj
+    if vk is not None:
+        h1 -= .5 * hibrido * vk
+        if abs(omega) > 1e-10:
+            with mol.with_range_coulomb(omega):
+                h1 -= .5 * (alfa - hibrido) * nmr_rhf.get_jk(mol, dm0)[1]
+    return h1
+
+
+def potencial_inducido(mf):
+    # Respuesta CPKS de los tres componentes del campo en una sola llamada, con la densidad ajustada del SCF
+    orbitales = mf.mo_coeff
+    ocupados = orbitales[:, mf.mo_occ > 0]
+    nmo, nocc = orbitales.shape[1], ocupados.shape[1]
+    respuesta = mf.gen_response(singlet=True, hermi=2)
+
+    def vind(mo1):
+        mo1 = np.asarray(mo1).reshape(-1, nmo, nocc)
+        dm1 = lib.einsum('pi,xij,qj->xpq', orbitales, mo1 * 2, ocupados.conj())
+        dm1 = dm1 - dm1.conj().transpose(0, 2, 1)
+        return lib.einsum('xpq,pi,qj->xij', respuesta(dm1), orbitales.conj(), ocupados).ravel()
+    return vind
+
+
+def calcular_magnetizabilidad(mf):
+    mag = magnetizabilidad_rks.Magnetizability(mf)
+    mag.cphf = potencial_inducido(mf)
+    mag.get_fock = lambda dm0=None, gauge_orig=None: fock_giao_df(mag, dm0, gauge_orig)
+
+    # La parte diamagnetica (integrales exactas de segundo orden) y la paramagnetica (CPKS) son independientes
+    with ThreadPoolExecutor(max_workers=2) as ejecutor:
+        diamagnetica = ejecutor.submit(mag.dia)
+        paramagnetica = ejecutor.submit(mag.para)
+        diamagnetica, paramagnetica = diamagnetica.result(), paramagnetica.result()
+    return diamagnetica, paramagnetica
+
+
+def susceptibilidad(molecula, metodo='b3lyp', base='def2svp'):
+    if molecula.numeros_atomicos.astype(int).sum() % 2:
+        return {"error": "La magnetizabilidad GIAO solo esta disponible para capas cerradas (numero par de electrones)"}
+
+    with lib.with_omp_threads(HILOS):
+        mf = preparar_scf(molecula, metodo, base)
+        if not mf.converged:
+            return {"error": "SCF no convergio en PySCF"}
+        diamagnetica, paramagnetica = calcular_magnetizabilidad(mf)
+
+    tensor = diamagnetica + paramagnetica
+    isotropico = np.trace(tensor) / 3.0
+    isotropico_cgs = isotropico * MAGNETIZABILIDAD_AU_A_CGS
+    return {
+        "tensor": tensor.tolist(),
+        "tensor_diamagnetico": diamagnetica.tolist(),
+        "tensor_paramagnetico": paramagnetica.tolist(),
+        "isotropico_au": float(isotropico),
+        "isotropico_cgs": float(isotropico_cgs),
+        "tipo": "Diamagnético" if isotropico_cgs < 0 else "Paramagnético",
+        "energia_scf": float(mf.e_tot),
+        "converged": True,
+        "metodo_calculo": "GIAO-DFT (PySCF, densidad ajustada)",
+        "nota": "Magnetizabilidad GIAO de capa cerrada (partes diamagnetica y paramagnetica); "
+                "χ molar en 10⁻⁶ cm³/mol (CGS).",
+    }
@@ -0,0 +1,90 @@
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+# Dependencias que la app solo debe cargar al usar la funcion correspondiente
+PESADAS = ("pyscf", "reportlab", "matplotlib")
+PRESUPUESTO_S = float(os.environ.get("ORCA_PRESUPUESTO_ARRANQUE_S", 3.0))
+
+PROGRAMA = """
+import importlib, json, sys, time
+modulos, faltantes = sys.argv[1:], []
+inicio = time.perf_counter()
+for modulo in modulos:
+    try:
+        importlib.import_module(modulo)
+    except ImportError as e:
+        faltantes.append(f"{modulo}: {e}")
+print(json.dumps({"segundos": time.perf_counter() - inicio, "faltantes": faltantes,
+                  "cargados": sorted({m.split('.')[0] for m in sys.modules})}))
+"""
+
+
+def modulos_de_arranque(ruta_app=os.path.join(DIRECTORIO, "app.py")):
+    with open(ruta_app, "r", encoding="utf-8") as f:
+        arbol = ast.parse(f.read())
+
+    # Solo los import de nivel superior: los que estan dentro de bloques se cargan bajo demanda
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos.extend(alias.name for alias in nodo.names)
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            modulos.append(nodo.module)
+    return list(dict.fromkeys(modulos))
+
+
+def medir(modulos, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        # Un interprete nuevo por medicion: asi se mide un arranque en frio de cada proceso
+        salida = subprocess.run([sys.executable, "-c", PROGRAMA, *modulos], cwd=DIRECTORIO,
+                                capture_output=True, text=True, check=True)
+        resultado = json.loads(salida.stdout)
+        tiempos.append(resultado["segundos"])
+    return {
+        "mediana_s": statistics.median(tiempos),
+        "minimo_s": min(tiempos),
+        "faltantes": resultado["faltantes"],
+        "pesadas_cargadas": [m for m in PESADAS if m in resultado["cargados"]],
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importacion en el arranque de app.py")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_S,
+                        help="Segundos maximos (mediana) para importar los modulos del arranque")
+    parser.add_argument("--detalle", action="store_true", help="Mide tambien cada modulo por separado")
+    args = parser.parse_args(argumentos)
+
+    modulos = modulos_de_arranque()
+    resultado = medir(modulos, args.repeticiones)
+
+    if args.detalle:
+        for modulo in modulos:
+            parcial = medir([modulo], args.repeticiones)
+            print(f"  {modulo:<14} {parcial['mediana_s'] * 1000:8.1f} ms")
+
+    print(f"Arranque ({len(modulos)} modulos): mediana {resultado['mediana_s']:.3f} s, "
+          f"minimo {resultado['minimo_s']:.3f} s (presupuesto {args.presupuesto:g} s)")
+    for faltante in resultado["faltantes"]:
+        print(f"  No instalado: {faltante}")
+
+    fallos = []
+    if resultado["pesadas_cargadas"]:
+        fallos.append("se cargan en el arranque: " + ", ".join(resultado["pesadas_cargadas"]))
+    if resultado["mediana_s"] > args.presupuesto:
+        fallos.append(f"el arranque supera el presupuesto de {args.presupuesto:g} s")
+    for fallo in fallos:
+        print(f"ERROR: {fallo}")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+from collections import Counter
+
+import numpy as np
+
+from almacen import leer_artefacto, leer_seccion
+from constantes import MASAS_ATOMICAS, SIMBOLOS, numero_atomico
+
+
+def _es_linea_atomo(partes):
+    if len(partes) < 4:
+        return False
+    try:
+        float(partes[1]), float(partes[2]), float(partes[3])
+    except ValueError:
+        return False
+    return partes[0][0].isalpha() or partes[0].isdigit()
+
+
+def _es_entero(linea):
+    partes = linea.split()
+    return len(partes) == 1 and partes[0].isdigit()
+
+
+def _numero_desde_token(token):
+    if token.isdigit():
+        return int(token)
+    try:
+        return numero_atomico(token.rstrip("0123456789"))
+    except KeyError:
+        raise ValueError(f"Elemento desconocido: '{token}'")
+
+
+class Molecula:
+    def __init__(self, numeros_atomicos, coordenadas, comentario=""):
+        self.numeros_atomicos = np.asarray(numeros_atomicos, dtype=np.uint8)
+        self.coordenadas = np.asarray(coordenadas, dtype=np.float64).reshape(-1, 3)
+        self.comentario = comentario
+        if len(self.numeros_atomicos) != len(self.coordenadas):
+            raise ValueError("El numero de elementos no coincide con el de coordenadas")
+
+    @classmethod
+    def desde_lineas(cls, lineas_atomos, comentario=""):
+        partes = [linea.split() for linea in lineas_atomos]
+        try:
+            coords = np.array([p[1:4] for p in partes], dtype=np.float64).reshape(-1, 3)
+            simbolos = [p[0] for p in partes]
+            tabla = {token: _numero_desde_token(token) for token in set(simbolos)}
+        except (ValueError, IndexError):
+            for linea, p in zip(lineas_atomos, partes):
+                if not _es_linea_atomo(p):
+                    raise ValueError(f"Linea de coordenadas invalida: '{linea.strip()}'")
+            raise
+
+        numeros = np.fromiter((tabla[s] for s in simbolos), dtype=np.uint8, count=len(simbolos))
+        return cls(numeros, coords, comentario)
+
+    @classmethod
+    def leer_xyz_multiple(cls, contenido_xyz):
+        lineas = [l for l in contenido_xyz.splitlines() if not l.lstrip().startswith("#")]
+        moleculas = []
+        i = 0
+        while i < len(lineas):
+            if not lineas[i].strip():
+                i += 1
+                continue
+
+            if not _es_entero(lineas[i]):
+                # Lista de coordenadas sin encabezado: todas las lineas restantes forman una estructura
+                restantes = [l for l in lineas[i:] if l.strip()]
+                moleculas.append(cls.desde_lineas(restantes))
+                break
+
+            num_atomos = int(lineas[i])
+            siguiente = lineas[i + 1] if i + 1 < len(lineas) else ""
+            fin_sin_comentario = i + 1 + num_atomos
+            sin_comentario = _es_linea_atomo(siguiente.split()) and (
+                fin_sin_comentario >= len(lineas) or not lineas[fin_sin_comentario].strip()
+                or _es_entero(lineas[fin_sin_comentario]))
+
+            if sin_comentario:
+                comentario, inicio = "", i + 1
+            else:
+                comentario, inicio = siguiente.strip(), i + 2
+
+            bloque = lineas[inicio:inicio + num_atomos]
+            if len(bloque) < num_atomos:
+                raise ValueError(f"Estructura {len(moleculas) + 1}: se esperaban {num_atomos} atomos "
+                                 f"y hay {len(bloque)} lineas de coordenadas")
+            moleculas.append(cls.desde_lineas(bloque, comentario))
+            i = inicio + num_atomos
+
+        if not moleculas:
+            raise ValueError("El archivo XYZ no contiene estructuras")
+        return moleculas
+
+    @classmethod
+    def desde_xyz(cls, contenido_xyz):
+        return cls.leer_xyz_multiple(contenido_xyz)[0]
+
+    @classmethod
+    def leer_archivo(cls, ruta):
+        return cls.leer_xyz_multiple(leer_artefacto(ruta))
+
+    @classmethod
+    def leer_cuadro(cls, ruta, cuadro=-1):
+        # Un solo cuadro de una trayectoria por su desplazamiento en el indice, sin leer el resto del archivo
+        texto = leer_seccion(ruta, None, ocurrencia=cuadro)
+        return cls.leer_xyz_multiple(texto)[0] if texto else cls.leer_archivo(ruta)[cuadro]
+
+    @property
+    def num_atomos(self):
+        return len(self.numeros_atomicos)
+
+    @property
+    def elementos(self):
+        return [SIMBOLOS[z] for z in self.numeros_atomicos]
+
+    @property
+    def masas(self):
+        return np.asarray(MASAS_ATOMICAS)[self.numeros_atomicos]
+
+    @property
+    def formula(self):
+        conteo = Counter(self.elementos)
+        orden = sorted(conteo)
+        if "C" in conteo:
+            orden = ["C"] + (["H"] if "H" in conteo else []) + [e for e in orden if e not in ("C", "H")]
+        return "".join(f"{e}{conteo[e] if conteo[e] > 1 else ''}" for e in orden)
+
+    def con_coordenadas(self, coordenadas, comentario=None):
+        return Molecula(self.numeros_atomicos, coordenadas, self.comentario if comentario is None else comentario)
+
+    def lineas_coordenadas(self, decimales=6):
+        ancho = decimales + 6
+        return "\n".join(f"{simbolo:<2} {x:>{ancho}.{decimales}f} {y:>{ancho}.{decimales}f} {z:>{ancho}.{decimales}f}"
+                         for simbolo, (x, y, z) in zip(self.elementos, self.coordenadas.tolist()))
+
+    def a_xyz(self, comentario=None):
+        comentario = self.comentario if comentario is None else comentario
+        return f"{self.num_atomos}\n{comentario}\n{self.lineas_coordenadas()}\n"
+
+    def atomos_pyscf(self):
+        return list(zip(self.elementos, self.coordenadas.tolist()))
+
+
+def escribir_xyz_multiple(moleculas):
+    return "".join(molecula.a_xyz() for molecula in moleculas)
@@ -0,0 +1,58 @@
+import os
+
+from ejecucion import escribir_y_ejecutar
+from utils import Orca
+
+# (metodo, base, palabras clave, orbitales reutilizables por el trabajo principal)
+NIVELES_PREOPTIMIZACION = {
+    "B97-3c": ("B97-3c", "", "", True),
+    "r2SCAN-3c": ("r2SCAN-3c", "", "", True),
+    "HF-3c": ("HF-3c", "", "", True),
+    "PBE/def2-SVP (RI-J)": ("PBE", "def2-SVP", "RI def2/J LOOSEOPT", True),
+    # xTB no escribe un .gbw que ORCA pueda proyectar: solo se aprovecha la geometria
+    "GFN2-xTB": ("XTB2", "", "", False),
+}
+CLAVES_OPTIMIZACION = {"OPT", "LOOSEOPT", "TIGHTOPT", "VERYTIGHTOPT"}
+
+
+def preoptimizar(molecula, nombre_trabajo, directorio, nivel, prioridad=0):
+    metodo, base, palabras_clave, con_orbitales = NIVELES_PREOPTIMIZACION[nivel]
+    nombre = f"{nombre_trabajo}_preopt"
+    # Si el nivel ya fija su criterio de optimizacion (LOOSEOPT) no se anade otro OPT del tipo de trabajo
+    tipo = "Punto Simple" if CLAVES_OPTIMIZACION & set(palabras_clave.upper().split()) else "Optimización de Geometría"
+    entrada = Orca.generar_entrada(molecula, tipo, metodo, base, palabras_clave)
+    try:
+        ruta_salida = escribir_y_ejecutar(entrada, directorio, nombre, prioridad=prioridad)
+    except Exception as e:
+        return {"error": str(e)}
+
+    analizador = Orca(ruta_salida)
+    geometria = analizador.extraer_molecula()
+    if geometria is None:
+        return {"error": f"La preoptimizacion con {nivel} no produjo una geometria"}
+
+    orbitales = f"{nombre}.gbw"
+    return {
+        "nivel": nivel,
+        "molecula": geometria,
+        # Ruta relativa: ORCA corre dentro del directorio del trabajo
+        "orbitales": orbitales if con_orbitales and os.path.exists(os.path.join(directorio, orbitales)) else None,
+        "ciclos": analizador.extraer_pasos_optimizacion(),
+        "convergido": analizador.verificar_convergencia(),
+        "energia": analizador.extraer_energia_final(),
+        "ruta_salida": ruta_salida,
+    }
+
+
+def resumen_ahorro(preoptimizacion, ciclos_alto_nivel, ciclos_referencia=None):
+    # La referencia son los ciclos que suele necesitar el nivel alto partiendo de cero (historial de la base de
+    # resultados); sin historial solo se informa de lo ejecutado
+    ahorrados = None if ciclos_referencia is None else max(0.0, ciclos_referencia - ciclos_alto_nivel)
+    return {
+        "Nivel barato": preoptimizacion["nivel"],
+        "Ciclos nivel barato": preoptimizacion["ciclos"],
+        "Ciclos nivel alto": ciclos_alto_nivel,
+        "Ciclos de referencia (historial)": ciclos_referencia,
+        "Ciclos de alto nivel ahorrados (estimado)": ahorrados,
+        "Ahorro estimado (%)": None if ahorrados is None else round(100 * ahorrados / max(1.0, ciclos_referencia), 1),
+    }
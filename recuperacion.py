@@ -0,0 +1,169 @@
+import os
+import re
+import subprocess
+import time
+
+from ejecucion import TIEMPO_MAXIMO, ejecutar_orca, iniciar_orca, leer_final, verificar_proceso
+from molecula import Molecula
+from utils import Orca
+
+MAX_REINTENTOS = int(os.environ.get("ORCA_MAX_REINTENTOS", 2))
+INTERVALO_SONDEO = 2
+
+# Modos de fallo recuperables, en orden de comprobacion sobre el final de la salida
+FALLOS = (
+    ("scf", re.compile(r"SCF NOT CONVERGED|wavefunction IS NOT CONVERGED|error termination in SCF", re.IGNORECASE)),
+    ("optimizacion", re.compile(r"optimization did not converge|maximum number of optimization cycles",
+                                re.IGNORECASE)),
+)
+DESCRIPCION_FALLOS = {"scf": "SCF sin convergir", "optimizacion": "optimización sin convergir"}
+
+# Ajustes por nivel de escalado; el nivel 0 es la entrada original
+ESCALADO_SCF = (
+    ("", None),
+    ("SlowConv", 300),
+    ("VerySlowConv DefGrid3", 500),
+)
+ESCALADO_GEOMETRIA = (None, 150, 300)
+ESCALADO_INICIAL = {"scf": 0, "optimizacion": 0}
+
+
+def _familia(palabra):
+    palabra = palabra.upper()
+    if palabra.endswith("SLOWCONV"):
+        return "convergencia"
+    if palabra.startswith("DEFGRID"):
+        return "malla"
+    return palabra
+
+
+def diagnosticar(ruta_salida, num_bytes=20000):
+    try:
+        final = leer_final(ruta_salida, num_bytes)
+    except FileNotFoundError:
+        return None
+    for modo, patron in FALLOS:
+        if patron.search(final):
+            return modo
+    return None
+
+
+def escalar(escalado, modo):
+    niveles = ESCALADO_SCF if modo == "scf" else ESCALADO_GEOMETRIA
+    if escalado[modo] + 1 >= len(niveles):
+        return None
+    return dict(escalado, **{modo: escalado[modo] + 1})
+
+
+def describir(escalado):
+    palabras_scf, iteraciones_scf = ESCALADO_SCF[escalado["scf"]]
+    ajustes = palabras_scf.split()
+    if iteraciones_scf:
+        ajustes.append(f"SCF MaxIter {iteraciones_scf}")
+    if ESCALADO_GEOMETRIA[escalado["optimizacion"]]:
+        ajustes.append(f"Geom MaxIter {ESCALADO_GEOMETRIA[escalado['optimizacion']]}")
+    return ", ".join(ajustes)
+
+
+def aplicar_escalado(palabras_clave, escalado):
+    palabras_scf, iteraciones_scf = ESCALADO_SCF[escalado["scf"]]
+    nuevas = palabras_scf.split()
+    # Las palabras del usuario de la misma familia (SlowConv, DefGridN) se sustituyen por las del escalado
+    sustituidas = {_familia(p) for p in nuevas}
+    palabras = [p for p in (palabras_clave or "").split() if _familia(p) not in sustituidas] + nuevas
+
+    bloques = ""
+    if iteraciones_scf:
+        bloques += f"%scf\n  MaxIter {iteraciones_scf}\nend\n"
+    if ESCALADO_GEOMETRIA[escalado["optimizacion"]]:
+        bloques += f"%geom\n  MaxIter {ESCALADO_GEOMETRIA[escalado['optimizacion']]}\nend\n"
+    return " ".join(palabras), bloques
+
+
+def ultima_geometria(directorio, nombre, respaldo):
+    # Ultimo cuadro de la trayectoria; si ORCA no llego a escribirla, la ultima geometria guardada
+    for sufijo in ("_trj.xyz", ".xyz"):
+        ruta = os.path.join(directorio, f"{nombre}{sufijo}")
+        if os.path.exists(ruta):
+            try:
+                return Molecula.leer_cuadro(ruta)
+            except ValueError:
+                continue
+    return respaldo
+
+
+def preparar_reintento(espacio, nombre_anterior, intento, escalado, molecula, tipo_calculo, metodo, base,
+                       palabras_clave, calc_nmr=False, pasos_adicionales=None, usar_simetria=False):
+    nombre = f"{espacio.nombre}_rescate{intento}"
+    geometria = ultima_geometria(espacio.directorio, nombre_anterior, molecula)
+
+    # En trabajos encadenados los ajustes de %moinp pasarian a los $new_job siguientes: solo se reusa la geometria
+    orbitales = f"{nombre_anterior}.gbw"
+    if pasos_adicionales or not os.path.exists(os.path.join(espacio.directorio, orbitales)):
+        orbitales = None
+
+    palabras, bloques = aplicar_escalado(palabras_clave, escalado)
+    pasos = [dict(paso, palabras_clave=aplicar_escalado(paso.get("palabras_clave", ""), escalado)[0])
+             for paso in pasos_adicionales or []]
+
+    ruta_entrada = os.path.join(espacio.directorio, f"{nombre}.inp")
+    ruta_salida = os.path.join(espacio.directorio, f"{nombre}.out")
+    with open(ruta_entrada, "w") as f:
+        f.write(Orca.generar_entrada(geometria, tipo_calculo, metodo, base, palabras, calc_nmr,
+                                     pasos_adicionales=pasos, nombre_base=nombre, bloques=bloques,
+                                     orbitales=orbitales, usar_simetria=usar_simetria))
+    return ruta_entrada, ruta_salida, nombre
+
+
+def ejecutar_sondeando(ruta_entrada, ruta_salida, al_sondear, timeout=TIEMPO_MAXIMO, prioridad=0):
+    # al_sondear(proceso, ruta_salida, transcurrido) se llama al arrancar, en cada sondeo y una vez al terminar
+    proceso = iniciar_orca(ruta_entrada, ruta_salida, prioridad)
+    inicio = time.monotonic()
+    while True:
+        terminado = proceso.poll() is not None
+        al_sondear(proceso, ruta_salida, time.monotonic() - inicio)
+        if terminado:
+            return verificar_proceso(proceso, ruta_salida)
+        if time.monotonic() - inicio > timeout:
+            proceso.kill()
+            proceso.wait()
+            raise subprocess.TimeoutExpired(proceso.args, timeout)
+        time.sleep(INTERVALO_SONDEO)
+
+
+def ejecutar_con_recuperacion(espacio, molecula, tipo_calculo, metodo, base, palabras_clave, calc_nmr=False,
+                              pasos_adicionales=None, timeout=TIEMPO_MAXIMO, prioridad=0,
+                              max_reintentos=MAX_REINTENTOS, orbitales=None, al_iniciar=None, usar_simetria=False,
+                              al_sondear=None):
+    ruta_entrada, ruta_salida, nombre = espacio.ruta(".inp"), espacio.ruta(".out"), espacio.nombre
+    with open(ruta_entrada, "w") as f:
+        f.write(Orca.generar_entrada(molecula, tipo_calculo, metodo, base, palabras_clave, calc_nmr,
+                                     pasos_adicionales=pasos_adicionales, nombre_base=nombre, orbitales=orbitales,
+                                     usar_simetria=usar_simetria))
+
+    escalado, intentos = dict(ESCALADO_INICIAL), []
+    for intento in range(max_reintentos + 1):
+        if al_iniciar is not None:
+            al_iniciar(ruta_salida)
+        error = None
+        try:
+            if al_sondear is None:
+                ejecutar_orca(ruta_entrada, ruta_salida, timeout, prioridad)
+            else:
+                ejecutar_sondeando(ruta_entrada, ruta_salida, al_sondear, timeout, prioridad)
+        except subprocess.CalledProcessError as e:
+            error = e
+
+        modo = diagnosticar(ruta_salida)
+        siguiente = escalar(escalado, modo) if modo and intento < max_reintentos else None
+        if siguiente is None:
+            if error is not None:
+                raise error
+            break
+
+        escalado = siguiente
+        intentos.append({"Intento": intento + 1, "Fallo": DESCRIPCION_FALLOS[modo], "Ajustes": describir(escalado)})
+        ruta_entrada, ruta_salida, nombre = preparar_reintento(espacio, nombre, intento + 1, escalado, molecula,
+                                                               tipo_calculo, metodo, base, palabras_clave,
+                                                               calc_nmr, pasos_adicionales, usar_simetria)
+    return ruta_salida, intentos
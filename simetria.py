@@ -0,0 +1,208 @@
+import os
+from fractions import Fraction
+
+import numpy as np
+
+# Desplazamiento maximo (Angstrom) para considerar que una operacion deja la molecula invariante
+TOLERANCIA_SIMETRIA = float(os.environ.get("ORCA_SIMETRIA_TOLERANCIA", 0.05))
+ORDEN_MAXIMO_EJE = 6
+# Ih tiene 120 operaciones: un cierre mayor indica una tolerancia demasiado holgada
+MAX_OPERACIONES = 120
+ITERACIONES_SIMETRIZACION = 10
+
+
+def _unitarios(vectores, minimo=1e-6):
+    vectores = np.asarray(vectores, dtype=float).reshape(-1, 3)
+    normas = np.linalg.norm(vectores, axis=1)
+    vectores = vectores[normas > minimo] / normas[normas > minimo, None]
+    # Un eje y su opuesto son la misma direccion; la clave redondeada solo sirve para descartar repetidos
+    signo = np.sign(vectores[np.arange(len(vectores)), np.argmax(np.abs(vectores) > 1e-8, axis=1)])
+    vectores = vectores * signo[:, None]
+    _, unicos = np.unique(np.round(vectores, 4), axis=0, return_index=True)
+    return vectores[np.sort(unicos)]
+
+
+def _rotaciones(ejes, angulo, impropia=False):
+    ejes = ejes / np.linalg.norm(ejes, axis=1, keepdims=True)
+    k = np.zeros((len(ejes), 3, 3))
+    k[:, 0, 1], k[:, 0, 2], k[:, 1, 2] = -ejes[:, 2], ejes[:, 1], -ejes[:, 0]
+    k -= k.transpose(0, 2, 1)
+    matrices = np.eye(3) + np.sin(angulo) * k + (1 - np.cos(angulo)) * k @ k
+    if impropia:
+        matrices = (np.eye(3) - 2 * ejes[:, :, None] * ejes[:, None, :]) @ matrices
+    return matrices
+
+
+def _operaciones_candidatas(centradas, numeros, tolerancia):
+    distancias = np.linalg.norm(centradas, axis=1)
+    _, ejes_inercia = np.linalg.eigh(centradas.T @ centradas)
+    i, j = np.triu_indices(len(centradas), 1)
+    # Solo pueden intercambiarse atomos del mismo elemento a la misma distancia del centro
+    equivalentes = (numeros[i] == numeros[j]) & (np.abs(distancias[i] - distancias[j]) < tolerancia)
+    i, j = i[equivalentes], j[equivalentes]
+
+    ejes = _unitarios(np.vstack([ejes_inercia.T, centradas[distancias > tolerancia]]))
+    operaciones = [-np.eye(3)[None]]
+    for n in range(2, ORDEN_MAXIMO_EJE + 1):
+        operaciones.append(_rotaciones(ejes, 2 * np.pi / n))
+    medios = _unitarios((centradas[i] + centradas[j]) / 2, tolerancia)
+    operaciones.append(_rotaciones(medios, np.pi))
+    normales = _unitarios(np.vstack([ejes, centradas[i] - centradas[j]]))
+    operaciones.append(_rotaciones(normales, 0.0, impropia=True))
+    # En trompos simetricos o esfericos los ejes de inercia son arbitrarios dentro del subespacio degenerado:
+    # los S2n se prueban tambien sobre los ejes de los atomos y los puntos medios de pares equivalentes
+    ejes_impropios = _unitarios(np.vstack([ejes, medios]))
+    for n in range(2, ORDEN_MAXIMO_EJE + 1):
+        operaciones.append(_rotaciones(ejes_impropios, np.pi / n, impropia=True))
+    return np.concatenate(operaciones)
+
+
+def _permutaciones(operaciones, centradas, numeros, tolerancia):
+    # Para cada operacion, el atomo del mismo elemento mas cercano a cada imagen; es valida si todos caen
+    # dentro de la tolerancia y la correspondencia es biyectiva
+    n = len(centradas)
+    distintos = numeros[:, None] != numeros[None, :]
+    normas = (centradas ** 2).sum(axis=1)
+
+    def errores(operaciones, atomos):
+        imagenes = np.einsum("kab,nb->kna", operaciones, centradas[atomos])
+        distancias = normas[None, atomos, None] + normas[None, None, :] - 2 * imagenes @ centradas.T
+        distancias[:, distintos[atomos]] = np.inf
+        cercanos = distancias.argmin(axis=2)
+        return np.take_along_axis(distancias, cercanos[:, :, None], axis=2)[:, :, 0].max(axis=1), cercanos
+
+    # Criba barata con unos pocos atomos antes de comprobar la molecula entera
+    muestra = np.unique(np.linspace(0, n - 1, min(n, 8)).astype(int))
+    candidatas = np.flatnonzero(errores(operaciones, muestra)[0] < tolerancia ** 2)
+
+    validas = np.zeros(len(operaciones), dtype=bool)
+    permutaciones = np.zeros((len(operaciones), n), dtype=np.intp)
+    bloque = max(1, 2_000_000 // (n * n))
+    for inicio in range(0, len(candidatas), bloque):
+        indices = candidatas[inicio:inicio + bloque]
+        error, cercanos = errores(operaciones[indices], np.arange(n))
+        biyectivas = (np.sort(cercanos, axis=1) == np.arange(n)).all(axis=1)
+        validas[indices] = (error < tolerancia ** 2) & biyectivas
+        permutaciones[indices] = cercanos
+    return validas, permutaciones
+
+
+def _cerrar(permutaciones, determinantes):
+    # El grupo se cierra sobre las permutaciones (enteros exactos) y no sobre matrices con ruido;
+    # el determinante distingue E de sigma_h en moleculas planas
+    elementos = np.unique(np.column_stack([permutaciones, determinantes]), axis=0)
+    while True:
+        perms, dets = elementos[:, :-1], elementos[:, -1]
+        productos = np.column_stack([perms[:, perms].reshape(-1, perms.shape[1]), np.outer(dets, dets).ravel()])
+        nuevos = np.unique(np.vstack([elementos, productos]), axis=0)
+        if len(nuevos) == len(elementos) or len(nuevos) > MAX_OPERACIONES:
+            return elementos[:, :-1], elementos[:, -1]
+        elementos = nuevos
+
+
+def _procrustes(centradas, permutaciones, determinantes):
+    # Matriz ortogonal (con el determinante dado) que mejor lleva cada atomo a su imagen
+    h = np.einsum("na,knb->kab", centradas, centradas[permutaciones])
+    u, _, vt = np.linalg.svd(h)
+    rotaciones = vt.transpose(0, 2, 1) @ u.transpose(0, 2, 1)
+    correccion = determinantes * np.sign(np.linalg.det(rotaciones))
+    vt[:, -1] *= correccion[:, None]
+    return vt.transpose(0, 2, 1) @ u.transpose(0, 2, 1)
+
+
+def _orden(matriz):
+    angulo = np.arccos(np.clip((np.trace(matriz) - 1) / 2, -1, 1))
+    return Fraction(angulo / (2 * np.pi)).limit_denominator(12).denominator
+
+
+def _clasificar(operaciones):
+    determinantes = np.round(np.linalg.det(operaciones))
+    trazas = np.trace(operaciones, axis1=1, axis2=2)
+    propias = operaciones[determinantes > 0]
+    ordenes = np.array([_orden(m) for m in propias])
+    espejos = int(((determinantes < 0) & (np.abs(trazas - 1) < 1e-3)).sum())
+    inversion = bool(((determinantes < 0) & (np.abs(trazas + 3) < 1e-3)).any())
+    n = int(ordenes.max())
+
+    if (ordenes == 3).sum() >= 4:
+        if (ordenes == 5).any():
+            return "Ih" if inversion else "I"
+        if (ordenes == 4).any():
+            return "Oh" if inversion else "O"
+        return "Th" if inversion else ("Td" if espejos else "T")
+    if n == 1:
+        return "Cs" if espejos else ("Ci" if inversion else "C1")
+    if (ordenes == 2).sum() >= n + (n % 2 == 0):
+        return f"D{n}h" if espejos == n + 1 else (f"D{n}d" if espejos == n else f"D{n}")
+    if espejos == n:
+        return f"C{n}v"
+    if espejos == 1:
+        return f"C{n}h"
+    if len(operaciones) > len(propias):
+        return f"S{len(operaciones)}"
+    return f"C{n}"
+
+
+def _simetria_lineal(centradas, numeros, tolerancia):
+    eje = np.linalg.eigh(centradas.T @ centradas)[1][:, -1]
+    proyectadas = np.outer(centradas @ eje, eje)
+    validas, permutaciones = _permutaciones(-np.eye(3)[None], proyectadas, numeros, tolerancia)
+    operaciones = np.stack([np.eye(3), -np.eye(3)]) if validas[0] else np.eye(3)[None]
+    permutaciones = np.vstack([np.arange(len(numeros)), permutaciones]) if validas[0] else \
+        np.arange(len(numeros))[None]
+    simetrizadas = np.einsum("kba,knb->kna", operaciones, proyectadas[permutaciones]).mean(axis=0)
+    return ("D∞h" if validas[0] else "C∞v"), simetrizadas, permutaciones, len(operaciones)
+
+
+def detectar_simetria(molecula, tolerancia=TOLERANCIA_SIMETRIA):
+    numeros = molecula.numeros_atomicos.astype(int)
+    masas = molecula.masas
+    centro = (masas[:, None] * molecula.coordenadas).sum(axis=0) / masas.sum()
+    centradas = molecula.coordenadas - centro
+
+    if molecula.num_atomos == 1:
+        return {"grupo_puntual": "Kh", "orden": 1, "numero_simetria": 1, "molecula": molecula,
+                "desviacion_maxima": 0.0, "permutaciones": np.zeros((1, 1), dtype=np.intp)}
+
+    # Lineal: todos los atomos a menos de la tolerancia del eje principal
+    eje = np.linalg.eigh(centradas.T @ centradas)[1][:, -1]
+    if np.linalg.norm(centradas - np.outer(centradas @ eje, eje), axis=1).max() < tolerancia:
+        grupo, simetrizadas, permutaciones, orden = _simetria_lineal(centradas, numeros, tolerancia)
+        numero_simetria = 2 if grupo == "D∞h" else 1
+    else:
+        candidatas = _operaciones_candidatas(centradas, numeros, tolerancia)
+        validas, permutaciones = _permutaciones(candidatas, centradas, numeros, tolerancia)
+        determinantes = np.round(np.linalg.det(candidatas[validas])).astype(np.intp)
+        identidad = np.arange(len(numeros))[None]
+        permutaciones, determinantes = _cerrar(np.vstack([identidad, permutaciones[validas]]),
+                                               np.concatenate([[1], determinantes]))
+
+        # Promedio sobre el grupo: x_i = <R_g^T x_p(i)>; las matrices se reajustan a la geometria promediada
+        simetrizadas = centradas
+        for _ in range(ITERACIONES_SIMETRIZACION):
+            operaciones = _procrustes(simetrizadas, permutaciones, determinantes)
+            nuevas = np.einsum("kba,knb->kna", operaciones, simetrizadas[permutaciones]).mean(axis=0)
+            cambio = np.abs(nuevas - simetrizadas).max()
+            simetrizadas = nuevas
+            if cambio < 1e-12:
+                break
+
+        operaciones = _procrustes(simetrizadas, permutaciones, determinantes)
+        errores = np.linalg.norm(np.einsum("kab,nb->kna", operaciones, simetrizadas)
+                                 - simetrizadas[permutaciones], axis=2).max(axis=1)
+        if (errores > tolerancia).any():
+            # Operaciones incompatibles entre si: la geometria no tiene el grupo que sugiere la tolerancia
+            return detectar_simetria(molecula, tolerancia / 2)
+        grupo, orden = _clasificar(operaciones), len(operaciones)
+        numero_simetria = int((determinantes > 0).sum())
+
+    desviacion = float(np.linalg.norm(simetrizadas - centradas, axis=1).max())
+    return {
+        "grupo_puntual": grupo,
+        "orden": orden,
+        "numero_simetria": numero_simetria,
+        "molecula": molecula.con_coordenadas(simetrizadas + centro),
+        "desviacion_maxima": desviacion,
+        "permutaciones": permutaciones,
+    }
+
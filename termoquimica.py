@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+from almacen import leer_seccion
+from constantes import (AMU_KG, ATM_PA, BOHR_A_ANGSTROM, C_LUZ_CM, H_PLANCK, HARTREE_J, K_BOLTZMANN,
+                        numero_atomico)
+from molecula import Molecula
+
+# Momento de inercia promedio del modelo de rotor libre de Grimme (kg m^2)
+B_PROMEDIO = 1e-44
+K_HARTREE = K_BOLTZMANN / HARTREE_J
+
+
+def leer_hess(ruta_hess):
+    # Solo se leen las dos secciones necesarias. En un .hess.zst la Hessiana (3N x 3N) no se descomprime;
+    # uno sin comprimir se recorre una vez para indexarlo y el indice queda en cache mientras no cambie
+    datos = {}
+    seccion = leer_seccion(ruta_hess, "vibrational_frequencies", exacto=True)
+    if seccion:
+        lineas = seccion.split('\n')
+        n = int(lineas[1])
+        datos["frecuencias"] = np.array([float(l.split()[1]) for l in lineas[2:2 + n]])
+
+    seccion = leer_seccion(ruta_hess, "atoms", exacto=True)
+    if seccion:
+        lineas = seccion.split('\n')
+        n = int(lineas[1])
+        partes = [l.split() for l in lineas[2:2 + n]]
+        datos["masas"] = np.array([float(p[1]) for p in partes])
+        datos["molecula"] = Molecula([numero_atomico(p[0]) for p in partes],
+                                     np.array([p[2:5] for p in partes], dtype=float) * BOHR_A_ANGSTROM)
+    return datos
+
+
+def constantes_rotacionales(masas_amu, coordenadas_angstrom):
+    masas = np.asarray(masas_amu, dtype=float)
+    coords = np.asarray(coordenadas_angstrom, dtype=float)
+    coords = coords - (masas[:, None] * coords).sum(axis=0) / masas.sum()
+
+    r2 = (coords ** 2).sum(axis=1)
+    inercia = (masas[:, None, None] * (r2[:, None, None] * np.eye(3) - coords[:, :, None] * coords[:, None, :])).sum(axis=0)
+    momentos = np.linalg.eigvalsh(inercia) * AMU_KG * 1e-20
+
+    with np.errstate(divide='ignore'):
+        constantes = np.where(momentos > 1e-50, H_PLANCK / (8 * np.pi ** 2 * C_LUZ_CM * momentos), 0.0)
+    return np.sort(constantes)[::-1]
+
+
+def calcular_termoquimica(frecuencias_cm, constantes_rot_cm, masa_amu, energia_electronica=0.0,
+                          temperaturas=298.15, presiones_atm=1.0, numero_simetria=1, multiplicidad=1,
+                          qrrho=True, frecuencia_referencia=100.0, frecuencia_corte=1.0):
+    t = np.atleast_1d(np.asarray(temperaturas, dtype=float))[:, None, None]
+    p = np.atleast_1d(np.asarray(presiones_atm, dtype=float))[None, :, None]
+
+    nu = np.asarray(frecuencias_cm, dtype=float)
+    nu = nu[nu > frecuencia_corte]
+
+    # Vibracion: oscilador armonico, con interpolacion quasi-RRHO de Grimme para la entropia
+    theta_v = H_PLANCK * C_LUZ_CM * nu / K_BOLTZMANN
+    x = theta_v / t
+    zpe = 0.5 * K_HARTREE * theta_v.sum()
+    e_vib = K_HARTREE * (theta_v / np.expm1(x)).sum(axis=-1)
+    s_ho = x / np.expm1(x) - np.log1p(-np.exp(-x))
+
+    if qrrho and len(nu):
+        mu = H_PLANCK / (8 * np.pi ** 2 * C_LUZ_CM * nu)
+        mu_efectiva = mu * B_PROMEDIO / (mu + B_PROMEDIO)
+        s_rotor = 0.5 + np.log(np.sqrt(8 * np.pi ** 3 * mu_efectiva * K_BOLTZMANN * t / H_PLANCK ** 2))
+        peso = 1.0 / (1.0 + (frecuencia_referencia / nu) ** 4)
+        s_vib = K_HARTREE * (peso * s_ho + (1.0 - peso) * s_rotor).sum(axis=-1)
+    else:
+        s_vib = K_HARTREE * s_ho.sum(axis=-1)
+
+    # Rotacion: rotor rigido (lineal si una constante rotacional es nula)
+    b = np.asarray(constantes_rot_cm, dtype=float)
+    b = b[b > 1e-8]
+    theta_r = H_PLANCK * C_LUZ_CM * b / K_BOLTZMANN
+    t2 = t[..., 0]
+    if len(b) == 3:
+        e_rot = 1.5 * K_HARTREE * t2
+        s_rot = K_HARTREE * (np.log(np.sqrt(np.pi) / numero_simetria * t2 ** 1.5 / np.sqrt(theta_r.prod())) + 1.5)
+    elif len(b):
+        e_rot = K_HARTREE * t2
+        s_rot = K_HARTREE * (np.log(t2 / (numero_simetria * theta_r[0])) + 1.0)
+    else:
+        e_rot = np.zeros_like(t2)
+        s_rot = np.zeros_like(t2)
+
+    # Traslacion: gas ideal
+    masa = masa_amu * AMU_KG
+    p2 = p[..., 0] * ATM_PA
+    e_trans = 1.5 * K_HARTREE * t2
+    s_trans = K_HARTREE * (np.log((2 * np.pi * masa * K_BOLTZMANN * t2 / H_PLANCK ** 2) ** 1.5
+                                  * K_BOLTZMANN * t2 / p2) + 2.5)
+
+    s_el = K_HARTREE * np.log(multiplicidad)
+
+    forma = np.broadcast_shapes(t2.shape, p2.shape)
+    u = energia_electronica + zpe + e_vib + e_rot + e_trans
+    h = u + K_HARTREE * t2
+    s = s_el + s_vib + s_rot + s_trans
+    g = h - t2 * s
+
+    return {
+        "temperaturas": t[:, 0, 0],
+        "presiones_atm": p[0, :, 0],
+        "zpe": zpe,
+        "e_vib": np.broadcast_to(e_vib, forma),
+        "e_rot": np.broadcast_to(e_rot, forma),
+        "e_trans": np.broadcast_to(e_trans, forma),
+        "ts_vib": np.broadcast_to(t2 * s_vib, forma),
+        "ts_rot": np.broadcast_to(t2 * s_rot, forma),
+        "ts_trans": np.broadcast_to(t2 * s_trans, forma),
+        "U": np.broadcast_to(u, forma),
+        "H": np.broadcast_to(h, forma),
+        "S": np.broadcast_to(s, forma),
+        "G": np.broadcast_to(g, forma),
+    }
+
+
+def parametros_desde_orca(analizador):
+    frecuencias = analizador.extraer_frecuencias_vibracionales()
+    molecula = analizador.extraer_molecula()
+    if frecuencias is None or molecula is None:
+        return None
+
+    masas = molecula.masas
+
+    constantes = analizador.extraer_constantes_rotacionales()
+    if constantes is None:
+        constantes = constantes_rotacionales(masas, molecula.coordenadas)
+
+    return {
+        "frecuencias_cm": frecuencias,
+        "constantes_rot_cm": constantes,
+        "masa_amu": float(masas.sum()),
+        "energia_electronica": analizador.extraer_energia_final() or 0.0,
+        "numero_simetria": analizador.extraer_numero_simetria(),
+        "multiplicidad": analizador.extraer_multiplicidad()
+    }
+
+
+def termoquimica_desde_orca(analizador, temperaturas=298.15, presiones_atm=1.0, qrrho=True):
+    parametros = parametros_desde_orca(analizador)
+    if parametros is None:
+        return None
+    return calcular_termoquimica(**parametros, temperaturas=temperaturas, presiones_atm=presiones_atm, qrrho=qrrho)
+
+
+def termoquimica_desde_hess(ruta_hess, energia_electronica=0.0, temperaturas=298.15, presiones_atm=1.0,
+                            numero_simetria=1, multiplicidad=1, qrrho=True):
+    datos = leer_hess(ruta_hess)
+    constantes = constantes_rotacionales(datos["masas"], datos["molecula"].coordenadas)
+    return calcular_termoquimica(
+        datos["frecuencias"], constantes, datos["masas"].sum(), energia_electronica=energia_electronica,
+        temperaturas=temperaturas, presiones_atm=presiones_atm, numero_simetria=numero_simetria,
+        multiplicidad=multiplicidad, qrrho=qrrho
+    )
+
+
+def tabla_termoquimica(resultado):
+    t, p = np.meshgrid(resultado["temperaturas"], resultado["presiones_atm"], indexing='ij')
+    return pd.DataFrame({
+        "Temperatura (K)": t.ravel(),
+        "Presion (atm)": p.ravel(),
+        "ZPE (Eh)": resultado["zpe"],
+        "U (Eh)": resultado["U"].ravel(),
+        "H (Eh)": resultado["H"].ravel(),
+        "T*S (Eh)": (t * resultado["S"]).ravel(),
+        "G (Eh)": resultado["G"].ravel(),
+    })
@@ -1,86 +1,210 @@
+import importlib.util
 import pandas as pd
 import re
 import numpy as np
-from pyscf import gto, dft, scf
-
-PYSCF_AVAILABLE = True
 
+from almacen import VERSION_INDICE, indice_artefacto, leer_artefacto, leer_seccion
+from molecula import Molecula
+
+
+def modulo_disponible(nombre):
+    return importlib.util.find_spec(nombre) is not None
+
+
+# PySCF (y reportlab/matplotlib en app.py) solo se importan cuando se usa la funcion que los necesita
+PYSCF_AVAILABLE = modulo_disponible("pyscf")
+
+CATEGORIAS_MODULOS = {
+    "Startup calculation": "Integrales",
+    "Property integrals": "Integrales",
+    "SCF iterations": "SCF",
+    "SCF Gradient evaluation": "Gradiente",
+    "Analytical frequency calculation": "Hessiano",
+    "Numerical frequency calculation": "Hessiano",
+    "SCF Hessian": "Hessiano",
+    "SCF Response": "NMR",
+    "Property calculations": "NMR",
+    "Geometry relaxation": "Optimizacion",
+}
+
+TIPOS_CALCULO = {
+    "Optimizacion de Geometria": "OPT",
+    "Optimización de Geometría": "OPT",
+    "Frecuencias Vibracionales (IR)": "OPT FREQ",
+    "Frecuencias (sin optimizar)": "FREQ",
+    "Punto Simple": "",
+    "Gradiente": "ENGRAD",
+}
+
+CAPAS_ORBITALES = ['s', 'p', 'd', 'f', 'g']
+
+PATRON_CARGA_ATOMICA = re.compile(r'^\s*(\d+)\s+([A-Za-z]+)\s*:\s*([-\d.]+)\s*$', re.MULTILINE)
+PATRON_ENERGIA_ORBITAL = re.compile(r'^\s*(\d+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s*$', re.MULTILINE)
+PATRON_ITERACION_SCF = re.compile(r'^\s*(\d+)\s+(-\d+\.\d+)\s+[-\d.eE+]+\s')
+PATRON_CICLO_OPTIMIZACION = re.compile(r'GEOMETRY OPTIMIZATION CYCLE\s+(\d+)')
+PATRON_FIN_SCF = re.compile(r'SCF (NOT )?CONVERGED AFTER\s+(\d+) CYCLES')
+PATRON_ENERGIA_FINAL = re.compile(r'FINAL SINGLE POINT ENERGY\s+([-\d.]+)')
+PATRON_PASOS_SCF = re.compile(
+    f'{PATRON_CICLO_OPTIMIZACION.pattern}|{PATRON_FIN_SCF.pattern}'
+    r'|Total Energy\s+:\s*([-\d.]+) Eh|Last Energy change\s+\.\.\.\s+([-\d.eE+]+)'
+    r'|(THE OPTIMIZATION HAS CONVERGED|FINAL ENERGY EVALUATION AT THE STATIONARY POINT)')
+PATRON_FILA_MODOS = re.compile(r'^[ \t]+(\d+)((?:[ \t]+-?\d+\.\d+)+)[ \t]*$', re.MULTILINE)
+PATRON_CARGA_ORBITAL = re.compile(
+    r'^[ \t]*(\d+)[ \t]+([A-Za-z]+)[ \t]|:[ \t]*[-\d.]+[ \t]+([spdfg])[ \t]*:[ \t]*([-\d.]+)', re.MULTILINE)
 
 
 class Orca:
     def __init__(self, ruta_salida):
         self.ruta = ruta_salida
+        self._contenido = None
         try:
-            with open(ruta_salida, 'r', encoding='utf-8', errors='ignore') as f:
-                self.contenido = f.read()
+            indice = indice_artefacto(ruta_salida)
         except FileNotFoundError:
             raise FileNotFoundError(f"No se encontro el archivo de salida en: {ruta_salida}")
+        # Los indices de versiones anteriores (o de archivos que no son .out) no guardan las marcas
+        marcas = indice.get("marcas") if indice.get("version") == VERSION_INDICE else None
+        self._texto_marcas = None if marcas is None else "\n".join(marcas)
+
+    @classmethod
+    def desde_texto(cls, contenido, ruta="<memoria>"):
+        analizador = cls.__new__(cls)
+        analizador.ruta = ruta
+        analizador._contenido = contenido
+        analizador._texto_marcas = None
+        return analizador
+
+    @property
+    def contenido(self):
+        if self._contenido is None:
+            self._contenido = leer_artefacto(self.ruta)
+        return self._contenido
+
+    def _seccion(self, titulo):
+        # Con el indice de secciones solo se lee (y descomprime) el ultimo bloque con ese titulo
+        if self._texto_marcas is None:
+            return self.contenido
+        return leer_seccion(self.ruta, titulo, exacto=True) or ""
+
+    def _marcas(self):
+        return self.contenido if self._texto_marcas is None else self._texto_marcas
 
-    #proxima mejora, ignorar lineas en blanco y comentarios al parsear xyz
     @staticmethod
-    def generar_entrada(contenido_xyz, tipo_calculo, metodo, base, palabras_clave, calc_nmr=False):
+    def _linea_palabras_clave(tipo_calculo, metodo, base, palabras_clave, calc_nmr=False):
         palabras_base = f"! {metodo} {base} {palabras_clave}"
 
         if "zora" in base.lower():
             palabras_base += " ZORA"
 
-        if tipo_calculo == "Optimizacion de Geometria":
-            palabras_calculo = "OPT"
-        elif tipo_calculo == "Frecuencias Vibracionales (IR)":
-            palabras_calculo = "OPT FREQ"
-        else:
-            palabras_calculo = ""
+        palabras_calculo = TIPOS_CALCULO.get(tipo_calculo, "")
 
         if calc_nmr:
             palabras_calculo += " NMR"
 
-        encabezado = f"{palabras_base} {palabras_calculo}\n"
-        lineas = contenido_xyz.strip().split('\n')
+        return f"{palabras_base} {palabras_calculo}\n"
 
-        try:
-            num_atomos = int(lineas[0].strip())
-            if len(lineas[1].strip().split()) > 1 and lineas[1].strip().split()[0].isalpha():
-                lineas_coords = lineas[1:1 + num_atomos]
-            else:
-                lineas_coords = lineas[2:2 + num_atomos]
-        except (ValueError, IndexError):
-            lineas_coords = lineas[2:]
-
-        coords_str = "\n".join(lineas_coords)
+    @staticmethod
+    def generar_entrada(contenido_xyz, tipo_calculo, metodo, base, palabras_clave, calc_nmr=False,
+                        pasos_adicionales=None, nombre_base=None, bloques="", orbitales=None, usar_simetria=False):
+        # ORCA detecta el grupo puntual y conserva la simetria durante la optimizacion; conviene simetrizar antes
+        if usar_simetria:
+            palabras_clave = f"{palabras_clave} UseSym"
+            pasos_adicionales = [dict(paso, palabras_clave=f"{paso.get('palabras_clave', '')} UseSym")
+                                 for paso in pasos_adicionales or []]
+        # Orbitales de partida de otro calculo (preoptimizacion, reintento); ORCA los proyecta si la base cambia
+        if orbitales:
+            palabras_clave = f"{palabras_clave} MORead"
+            bloques += f'%moinp "{orbitales}"\n'
+        encabezado = Orca._linea_palabras_clave(tipo_calculo, metodo, base, palabras_clave, calc_nmr) + bloques
+        molecula = contenido_xyz if isinstance(contenido_xyz, Molecula) else Molecula.desde_xyz(contenido_xyz)
+        coords_str = molecula.lineas_coordenadas(decimales=10)
         bloque_xyz = f"* xyz 0 1\n{coords_str}\n*\n"
-        return encabezado + bloque_xyz
+        entrada = encabezado + bloque_xyz
+
+        # Cada $new_job arranca con los orbitales del paso anterior (ORCA lee <base>.gbw por defecto)
+        # y con la ultima geometria que ORCA escribe en <base>.xyz.
+        for paso in pasos_adicionales or []:
+            if nombre_base is None:
+                raise ValueError("nombre_base es obligatorio para encadenar pasos con $new_job")
+            entrada += "\n$new_job\n" + Orca._linea_palabras_clave(
+                paso["tipo_calculo"], paso["metodo"], paso["base"], paso.get("palabras_clave", ""),
+                paso.get("calc_nmr", False)
+            )
+            entrada += f"* xyzfile 0 1 {nombre_base}.xyz\n"
+
+        return entrada
+
+    def dividir_pasos(self):
+        if "JOB NUMBER" not in self._marcas():
+            return [self]
+        partes = re.split(r'\${5,}\s*JOB NUMBER\s+\d+\s*\${5,}', self.contenido)
+        if len(partes) == 1:
+            return [self]
+        return [Orca.desde_texto(parte, f"{self.ruta}#paso{i + 1}") for i, parte in enumerate(partes)]
+
+    def extraer_palabras_clave_por_paso(self):
+        pasos = [[]]
+        for linea in re.findall(r'^\|\s*\d+>(.*)$', self._marcas(), re.MULTILINE):
+            if linea.strip().lower().startswith("$new_job"):
+                pasos.append([])
+            elif linea.strip().startswith("!"):
+                pasos[-1].append(" ".join(linea.strip()[1:].split()))
+        return [" ".join(paso) for paso in pasos]
+
+    def resumen_pasos(self):
+        palabras_por_paso = self.extraer_palabras_clave_por_paso()
+        filas = []
+        for i, paso in enumerate(self.dividir_pasos()):
+            datos_nmr = paso.extraer_datos_nmr()
+            datos_ir = paso.extraer_espectro_ir()
+            filas.append({
+                "Paso": i + 1,
+                "Palabras Clave": palabras_por_paso[i] if i < len(palabras_por_paso) else "",
+                "Energia Final (Eh)": paso.extraer_energia_final(),
+                "Ciclos Optimizacion": paso.extraer_pasos_optimizacion(),
+                "Convergido": paso.verificar_convergencia(),
+                "Frecuencias IR": len(datos_ir),
+                "Nucleos NMR": 0 if datos_nmr is None else len(datos_nmr)
+            })
+        return pd.DataFrame(filas)
+
+    def extraer_palabras_clave(self):
+        lineas = re.findall(r'^\|\s*\d+>\s*!(.*)$', self._marcas(), re.MULTILINE)
+        return " ".join(" ".join(linea.split()) for linea in lineas)
 
     def verificar_convergencia(self):
-        return "THE OPTIMIZATION HAS CONVERGED" in self.contenido
+        return "THE OPTIMIZATION HAS CONVERGED" in self._marcas()
+
+    def calculo_convergido(self):
+        marcas = self._marcas()
+        if "GEOMETRY OPTIMIZATION CYCLE" in marcas:
+            return self.verificar_convergencia()
+        return ("ORCA TERMINATED NORMALLY" in marcas and "SCF CONVERGED AFTER" in marcas
+                and "SCF NOT CONVERGED" not in marcas)
 
     def extraer_energia_final(self):
-        coincidencias = re.findall(r'FINAL SINGLE POINT ENERGY\s+([-\d.]+)', self.contenido)
+        coincidencias = PATRON_ENERGIA_FINAL.findall(self._marcas())
         if coincidencias:
             return float(coincidencias[-1])
         return None
 
-    def extraer_geometria_optimizada(self):
+    def extraer_molecula(self):
         patron = r'CARTESIAN COORDINATES \(ANGSTROEM\)\s*\n\s*-+\s*\n((?:\s*\S+\s+[-\d.]+\s+[-\d.]+\s+[-\d.]+\s*\n)+)'
-        coincidencias = list(re.finditer(patron, self.contenido))
+        coincidencias = list(re.finditer(patron, self._seccion("CARTESIAN COORDINATES (ANGSTROEM)")))
         if not coincidencias:
             return None
 
-        bloque_coords = coincidencias[-1].group(1).strip()
-        lineas_coords = [linea.strip() for linea in bloque_coords.split('\n') if linea.strip()]
+        lineas_coords = [linea for linea in coincidencias[-1].group(1).split('\n') if linea.strip()]
         if not lineas_coords:
             return None
+        return Molecula.desde_lineas(lineas_coords, f"Geometria Optimizada extraida de {self.ruta}")
 
-        num_atomos = len(lineas_coords)
-        bloque_xyz = f"{num_atomos}\nGeometria Optimizada extraida de {self.ruta}\n"
-        for linea in lineas_coords:
-            partes = linea.split()
-            if len(partes) >= 4:
-                bloque_xyz += f"{partes[0]:<2} " + " ".join(f"{float(coord):>12.6f}" for coord in partes[1:4]) + "\n"
-        return bloque_xyz
+    def extraer_geometria_optimizada(self):
+        molecula = self.extraer_molecula()
+        return None if molecula is None else molecula.a_xyz()
 
     def extraer_espectro_ir(self, factor_escalamiento=1.0):
         patron = r'IR SPECTRUM\s*\n-+\n(?:.|\n)*?-+\n((?:.|\n)*?)(?=\n\s*\*|\n\s*-{2,}\n[A-Z]|\Z)'
-        coincidencia = re.search(patron, self.contenido)
+        coincidencia = re.search(patron, self._seccion("IR SPECTRUM"))
 
         if not coincidencia:
             return pd.DataFrame()
@@ -110,97 +234,105 @@ class Orca:
         }
         energias = {}
         for nombre, patron in patrones.items():
-            coincidencias = re.findall(patron, self.contenido)
+            coincidencias = re.findall(patron, self._marcas())
             if coincidencias:
                 energias[nombre] = [float(coincidencias[-1])]
 
         return pd.DataFrame.from_dict(energias, orient='index', columns=['Energia (Hartree)']) if energias else None
 
-    def extraer_cargas_atomicas(self):
+    def _ultimo_bloque(self, seccion, encabezado, terminador):
+        texto = self._seccion(seccion)
+        inicio = None
+        for coincidencia in re.finditer(encabezado, texto):
+            inicio = coincidencia.end()
+        if inicio is None:
+            return None
+
+        while inicio < len(texto) and texto[inicio] == '\n':
+            inicio += 1
+        final = re.compile(terminador).search(texto, inicio)
+        return texto[inicio:final.start() if final else len(texto)]
+
+    def extraer_cargas_atomicas(self, dtype=np.float64):
         datos_cargas = {}
         for tipo in ['MULLIKEN', 'LOEWDIN']:
-            patron = re.compile(rf'{tipo} ATOMIC CHARGES\s*\n-+\n((?:.|\n)*?)(?=\n\n|\Z)')
+            bloque = self._ultimo_bloque(f"{tipo} ATOMIC CHARGES", rf'{tipo} ATOMIC CHARGES[ \t]*\n-+\n', r'\n\n')
+            if not bloque:
+                continue
 
-            coincidencias = list(re.finditer(patron, self.contenido))
-            if coincidencias:
-                coincidencia_final = coincidencias[-1]
-                cargas = []
-                for linea in coincidencia_final.group(1).strip().split('\n'):
-                    partes = linea.split()
-                    if len(partes) == 4 and partes[2] == ':':
-                        cargas.append({"Atomo": f"{partes[0]} {partes[1]}", "Carga": float(partes[3])})
-                if cargas:
-                    datos_cargas[tipo.capitalize()] = pd.DataFrame(cargas)
+            filas = PATRON_CARGA_ATOMICA.findall(bloque)
+            if not filas:
+                continue
 
-        return datos_cargas if datos_cargas else None
+            columnas = np.array(filas)
+            datos_cargas[tipo.capitalize()] = pd.DataFrame({
+                "Indice": columnas[:, 0].astype(np.int32),
+                "Elemento": pd.Categorical(columnas[:, 1]),
+                "Carga": columnas[:, 2].astype(dtype)
+            })
 
-    def extraer_energias_orbitales(self):
-        patron = re.compile(r'ORBITAL ENERGIES\s*\n-+\n((?:.|\n)*?)(?=\n\n|\Z|\*Only the first)')
+        return datos_cargas if datos_cargas else None
 
-        coincidencias = list(re.finditer(patron, self.contenido))
-        if not coincidencias:
+    def extraer_energias_orbitales(self, dtype=np.float64):
+        bloque = self._ultimo_bloque("ORBITAL ENERGIES", r'ORBITAL ENERGIES[ \t]*\n-+\n', r'\n\n|\*Only the first')
+        if not bloque:
             return None
 
-        coincidencia_final = coincidencias[-1]
-
-        orbitales = []
-        for linea in coincidencia_final.group(1).strip().split('\n')[2:]:
-            partes = linea.split()
-            if len(partes) == 4:
-                orbitales.append({
-                    "Numero": int(partes[0]),
-                    "Ocupacion": float(partes[1]),
-                    "Energia (Eh)": float(partes[2]),
-                    "Energia (eV)": float(partes[3])
-                })
+        filas = PATRON_ENERGIA_ORBITAL.findall(bloque)
+        if not filas:
+            return None
 
-        return pd.DataFrame(orbitales) if orbitales else None
+        columnas = np.array(filas)
+        return pd.DataFrame({
+            "Numero": columnas[:, 0].astype(np.int32),
+            "Ocupacion": columnas[:, 1].astype(dtype),
+            "Energia (Eh)": columnas[:, 2].astype(dtype),
+            "Energia (eV)": columnas[:, 3].astype(dtype)
+        })
 
-    def extraer_cargas_orbitales_reducidas(self):
+    def extraer_cargas_orbitales_reducidas(self, dtype=np.float64):
         datos_cargas = {}
         for tipo in ['MULLIKEN', 'LOEWDIN']:
-            patron = re.compile(
-                rf'{tipo} REDUCED ORBITAL CHARGES\s*\n-+\n((?:.|\n)*?)(?=\n\n|\Z|\s*\*+\n|\s*-{{2,}}\n[A-Z])')
-
-            coincidencias = list(re.finditer(patron, self.contenido))
-            if coincidencias:
-                coincidencia_final = coincidencias[-1]
-                cargas_orbitales = []
-                atomo_actual = ""
-
-                bloque_texto = coincidencia_final.group(1).strip()
-                for linea in bloque_texto.split('\n'):
-                    linea_limpia = linea.strip()
-                    if not linea_limpia:
-                        continue
-
-                    partes_iniciales = linea.split()
-                    if partes_iniciales and partes_iniciales[0].isdigit():
-                        if len(partes_iniciales) > 1:
-                            atomo_actual = f"{partes_iniciales[0]} {partes_iniciales[1]}"
-
-                    pares_orbital_carga = re.findall(r'([a-zA-Z0-9]+)\s*:\s*([\d.-]+)', linea)
-
-                    for orbital, carga in pares_orbital_carga:
-                        if orbital in ['s', 'p', 'd', 'f'] and atomo_actual:
-                            try:
-                                cargas_orbitales.append({
-                                    "Atomo": atomo_actual,
-                                    "Orbital": orbital,
-                                    "Carga": float(carga)
-                                })
-                            except ValueError:
-                                continue
-
-                if cargas_orbitales:
-                    datos_cargas[tipo.capitalize()] = pd.DataFrame(cargas_orbitales)
+            bloque = self._ultimo_bloque(f"{tipo} REDUCED ORBITAL CHARGES",
+                                         rf'{tipo} REDUCED ORBITAL CHARGES[ \t]*\n-+\n',
+                                         r'\n[ \t]*\n[ \t]*\n|\n\s*\*+\n|\n\s*-{2,}\n[A-Z]')
+            if not bloque:
+                continue
+
+            capacidad = bloque.count(':') // 2 + 1
+            indices = np.empty(capacidad, dtype=np.int32)
+            elementos = []
+            orbitales = np.empty(capacidad, dtype=np.int8)
+            cargas = np.empty(capacidad, dtype=dtype)
+
+            n = 0
+            indice_actual = None
+            elemento_actual = None
+            for coincidencia in PATRON_CARGA_ORBITAL.finditer(bloque):
+                indice, elemento, orbital, carga = coincidencia.groups()
+                if indice is not None:
+                    indice_actual, elemento_actual = int(indice), elemento
+                elif indice_actual is not None:
+                    indices[n] = indice_actual
+                    elementos.append(elemento_actual)
+                    orbitales[n] = CAPAS_ORBITALES.index(orbital)
+                    cargas[n] = float(carga)
+                    n += 1
+
+            if n:
+                datos_cargas[tipo.capitalize()] = pd.DataFrame({
+                    "Indice": indices[:n],
+                    "Elemento": pd.Categorical(elementos),
+                    "Orbital": pd.Categorical.from_codes(orbitales[:n], categories=CAPAS_ORBITALES),
+                    "Carga": cargas[:n]
+                })
 
         return datos_cargas if datos_cargas else None
 
     def extraer_datos_nmr(self):
         patron_bloque = re.compile(
             r'CHEMICAL SHIELDING SUMMARY \(ppm\)\s*\n-+\n\n((?:.|\n)*?)(?=\n\n\s*NMR shielding tensor|\Z|\n\s*-{2,}\n)')
-        coincidencia = re.search(patron_bloque, self.contenido)
+        coincidencia = re.search(patron_bloque, self._seccion("CHEMICAL SHIELDING SUMMARY (ppm)"))
 
         if not coincidencia:
             return None
@@ -230,100 +362,267 @@ class Orca:
 
         return None
 
+    def extraer_frecuencias_vibracionales(self):
+        bloque = self._ultimo_bloque("VIBRATIONAL FREQUENCIES", r'VIBRATIONAL FREQUENCIES[ \t]*\n-+\n',
+                                     r'\n\n\n|\n-+\n[A-Z]')
+        if not bloque:
+            return None
+        valores = re.findall(r'^\s*\d+:\s+([-\d.]+) cm\*\*-1', bloque, re.MULTILINE)
+        return np.array(valores, dtype=np.float64) if valores else None
 
-class PySCFCalculator:
-
-    @staticmethod
-    def calcular_susceptibilidad(xyz_content, metodo='b3lyp', base='def2svp'):
-        try:
-            lineas = [l.strip() for l in xyz_content.strip().split('\n') if l.strip()]
+    def extraer_modos_normales(self):
+        bloque = self._ultimo_bloque("NORMAL MODES", r'NORMAL MODES[ \t]*\n-+\n', r'\n-+\nIR SPECTRUM|\n\n\n')
+        if not bloque:
+            return None
 
-            try:
-                num_atomos = int(lineas[0])
-            except (ValueError, IndexError):
-                return {"error": "Formato XYZ invalido: primera linea debe ser numero de atomos"}
+        filas = PATRON_FILA_MODOS.findall(bloque)
+        if not filas:
+            return None
 
-            if len(lineas) < num_atomos + 2:
-                return {"error": "Formato XYZ invalido: faltan lineas de coordenadas"}
+        num_coordenadas = max(int(indice) for indice, _ in filas) + 1
+        bloques = [
+            np.array(" ".join(valores for _, valores in filas[i:i + num_coordenadas]).split(), dtype=np.float64)
+            .reshape(num_coordenadas, -1)
+            for i in range(0, len(filas), num_coordenadas)
+        ]
+        return np.hstack(bloques)
 
-            lineas_coords = lineas[2:2 + num_atomos]
+    def extraer_constantes_rotacionales(self):
+        coincidencias = re.findall(r'Rotational constants in cm-1:\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)', self._marcas())
+        return np.array(coincidencias[-1], dtype=np.float64) if coincidencias else None
 
-            atom_str = ""
-            for idx, linea in enumerate(lineas_coords):
-                partes = linea.split()
-                if len(partes) < 4:
-                    return {"error": f"Linea {idx + 3} invalida: {linea}"}
-                try:
-                    x, y, z = float(partes[1]), float(partes[2]), float(partes[3])
-                    atom_str += f"{partes[0]} {x} {y} {z}; "
-                except ValueError:
-                    return {"error": f"Coordenadas invalidas en linea {idx + 3}: {linea}"}
-
-            base_map = {
-                'def2-svp': 'def2svp',
-                'def2-tzvp': 'def2tzvp',
-                '6-31+g(d,p)': '6-31+g*',
-                '6-311++g(d,p)': '6-311++g**',
-                'cc-pvdz': 'ccpvdz'
-            }
-            base_pyscf = base_map.get(base.lower(), base.lower())
+    def extraer_momento_dipolar(self):
+        coincidencias = re.findall(r'Total Dipole Moment\s*:\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)', self._marcas())
+        return np.array(coincidencias[-1], dtype=np.float64) if coincidencias else None
 
-            mol = gto.M(
-                atom=atom_str,
-                basis=base_pyscf,
-                unit='Angstrom'
-            )
+    def extraer_numero_simetria(self):
+        coincidencias = re.findall(r'Symmetry Number:\s*(\d+)', self._marcas())
+        return int(coincidencias[-1]) if coincidencias else 1
 
-            mf = dft.RKS(mol)
-            mf.xc = metodo.lower()
+    def extraer_multiplicidad(self):
+        coincidencias = re.findall(r'Multiplicity\s+Mult\s+\.+\s+(\d+)', self._marcas())
+        return int(coincidencias[-1]) if coincidencias else 1
 
-            energia = mf.kernel()
+    def extraer_termoquimica(self):
+        patrones = {
+            "Temperatura (K)": r'THERMOCHEMISTRY AT\s+([\d.]+)K',
+            "Energia Punto Cero": r'Zero point energy\s+\.\.\.\s+([-\d.]+) Eh',
+            "Energia Interna": r'Total thermal energy\s+([-\d.]+) Eh',
+            "Correccion Termica": r'Total thermal correction\s+([-\d.]+) Eh',
+            "Entalpia": r'Total Enthalpy\s+\.\.\.\s+([-\d.]+) Eh',
+            "Termino Entropico (T*S)": r'Final entropy term\s+\.\.\.\s+([-\d.]+) Eh',
+            "Energia Libre de Gibbs": r'Final Gibbs free energy\s+\.\.\.\s+([-\d.]+) Eh',
+            "G - E(el)": r'G-E\(el\)\s+\.\.\.\s+([-\d.]+) Eh',
+        }
+        valores = {}
+        for nombre, patron in patrones.items():
+            coincidencias = re.findall(patron, self._marcas())
+            if coincidencias:
+                valores[nombre] = [float(coincidencias[-1])]
 
-            if not mf.converged:
-                return {"error": "SCF no convergio en PySCF"}
+        return pd.DataFrame.from_dict(valores, orient='index', columns=['Valor']) if valores else None
 
+    def extraer_tiempos_modulos(self):
+        bloque = re.search(r'Timings for individual modules:\s*\n((?:.|\n)*?)(?=\n\s*\*{4}|\Z)', self._marcas())
+        if not bloque:
+            return None
 
-            coords = mol.atom_coords()
-            charges = mol.atom_charges()
+        modulos = []
+        for linea in bloque.group(1).split('\n'):
+            coincidencia = re.match(r'\s*(\S.*?)\s+\.\.\.\s+([\d.]+) sec \(=\s*[\d.]+ min\)\s+([\d.]+) %', linea)
+            if coincidencia:
+                nombre = coincidencia.group(1)
+                modulos.append({
+                    "Modulo": nombre,
+                    "Categoria": CATEGORIAS_MODULOS.get(nombre, "Otros"),
+                    "Tiempo (s)": float(coincidencia.group(2)),
+                    "Porcentaje": float(coincidencia.group(3))
+                })
 
-            chi_dia = 0.0
+        return pd.DataFrame(modulos) if modulos else None
 
-            total_mass = sum(charges)
-            com = np.sum(coords * charges[:, np.newaxis], axis=0) / total_mass if total_mass > 0 else np.zeros(3)
-            chi_tensor = np.zeros((3, 3))
+    def extraer_tiempo_total(self):
+        coincidencia = re.search(
+            r'TOTAL RUN TIME:\s*(\d+) days (\d+) hours (\d+) minutes (\d+) seconds (\d+) msec', self._marcas())
+        if not coincidencia:
+            return None
 
-            for i, (coord, Z) in enumerate(zip(coords, charges)):
-                r = coord - com
-                r2 = np.dot(r, r)
+        dias, horas, minutos, segundos, msec = (int(valor) for valor in coincidencia.groups())
+        return dias * 86400 + horas * 3600 + minutos * 60 + segundos + msec / 1000.0
+
+    def extraer_num_funciones_base(self):
+        coincidencia = re.search(r'Number of basis functions\s+\.\.\.\s+(\d+)', self._marcas())
+        return int(coincidencia.group(1)) if coincidencia else None
+
+    def extraer_iteraciones_scf(self):
+        pasos = []
+        ciclo_actual = None
+        etapa = "Calculo"
+        for coincidencia in PATRON_PASOS_SCF.finditer(self._marcas()):
+            ciclo, no_convergido, iteraciones, energia, cambio, fin_optimizacion = coincidencia.groups()
+            if ciclo is not None:
+                ciclo_actual = int(ciclo)
+                etapa = "Optimizacion"
+            elif fin_optimizacion is not None:
+                ciclo_actual = None
+                etapa = "Calculo final"
+            elif iteraciones is not None:
+                pasos.append({
+                    "Paso": len(pasos) + 1,
+                    "Etapa": etapa,
+                    "Ciclo Optimizacion": ciclo_actual,
+                    "Iteraciones SCF": int(iteraciones),
+                    "SCF Convergido": no_convergido is None,
+                    "Energia SCF (Eh)": None,
+                    "Ultimo Cambio Energia": None
+                })
+            elif pasos and energia is not None and pasos[-1]["Energia SCF (Eh)"] is None:
+                pasos[-1]["Energia SCF (Eh)"] = float(energia)
+            elif pasos and cambio is not None and pasos[-1]["Ultimo Cambio Energia"] is None:
+                pasos[-1]["Ultimo Cambio Energia"] = float(cambio)
+
+        return pd.DataFrame(pasos) if pasos else None
+
+    def extraer_pasos_optimizacion(self):
+        ciclos = PATRON_CICLO_OPTIMIZACION.findall(self._marcas())
+        return max(int(ciclo) for ciclo in ciclos) if ciclos else 0
+
+    def resumen_rendimiento(self):
+        tiempos = self.extraer_tiempos_modulos()
+        iteraciones = self.extraer_iteraciones_scf()
+
+        return {
+            "tiempo_total_s": self.extraer_tiempo_total(),
+            "num_funciones_base": self.extraer_num_funciones_base(),
+            "pasos_optimizacion": self.extraer_pasos_optimizacion(),
+            "calculos_scf": 0 if iteraciones is None else len(iteraciones),
+            "iteraciones_scf_total": 0 if iteraciones is None else int(iteraciones["Iteraciones SCF"].sum()),
+            "iteraciones_scf_por_paso": [] if iteraciones is None else iteraciones["Iteraciones SCF"].tolist(),
+            "tiempo_por_categoria_s": {} if tiempos is None else
+            {categoria: float(valor) for categoria, valor in tiempos.groupby("Categoria")["Tiempo (s)"].sum().items()}
+        }
 
-                for j in range(3):
-                    for k in range(3):
-                        if j == k:
-                            chi_tensor[j, k] -= Z * (r2 - r[j] ** 2) / 6.0
-                        else:
-                            chi_tensor[j, k] -= Z * r[j] * r[k] / 6.0
 
-            chi_iso = np.trace(chi_tensor) / 3.0
+class PySCFCalculator:
 
-            chi_cgs = chi_iso * 0.78910
+    @staticmethod
+    def calcular_susceptibilidad(xyz_content, metodo='b3lyp', base='def2svp'):
+        try:
+            from magnetizabilidad import susceptibilidad
 
-            tipo_magnetismo = "Diamagnetico" if chi_cgs < 0 else "Paramagnetico"
+            try:
+                molecula = Molecula.desde_xyz(xyz_content)
+            except ValueError as e:
+                return {"error": f"Formato XYZ invalido: {e}"}
 
-            return {
-                "tensor": chi_tensor.tolist(),
-                "isotropico_au": float(chi_iso),
-                "isotropico_cgs": float(chi_cgs),
-                "tipo": tipo_magnetismo,
-                "energia_scf": float(energia),
-                "converged": True,
-                "metodo_calculo": "Aproximacion de Pascal (diamagnetica)",
-                "nota": "Calculo aproximado basado en geometria molecular. Para resultados precisos usar ORCA con palabras clave NMR."
-            }
+            return susceptibilidad(molecula, metodo, base)
 
         except ImportError as e:
             return {
-                "error": f"PySCF no esta correctamente instalado: {str(e)}\nIntenta: pip install --upgrade pyscf"
+                "error": f"PySCF no esta correctamente instalado: {str(e)}\n"
+                         "Intenta: pip install --upgrade pyscf pyscf-properties"
             }
         except Exception as e:
             import traceback
-            return {"error": f"Error en calculo: {str(e)}\n\nDetalle:\n{traceback.format_exc()}"}
\ No newline at end of file
+            return {"error": f"Error en calculo: {str(e)}\n\nDetalle:\n{traceback.format_exc()}"}
+
+
+class SeguimientoOrca:
+    def __init__(self, ruta_salida):
+        self.ruta = ruta_salida
+        self.posicion = 0
+        self.resto = b""
+        self.en_scf = False
+        self.scf_nuevo = True
+        self.leyendo_geometria = None
+        self.paso_optimizacion = 0
+        self.energias_scf = []
+        self.energias_finales = []
+        self.normas_gradiente = []
+        self.geometria = None
+        self.convergida = False
+        self.terminado = False
+
+    def actualizar(self):
+        try:
+            with open(self.ruta, "rb") as f:
+                f.seek(self.posicion)
+                nuevos = f.read()
+        except FileNotFoundError:
+            return 0
+
+        if not nuevos:
+            return 0
+
+        self.posicion += len(nuevos)
+        datos = self.resto + nuevos
+        corte = datos.rfind(b"\n") + 1
+        self.resto = datos[corte:]
+
+        for linea in datos[:corte].decode("utf-8", errors="ignore").splitlines():
+            self._procesar_linea(linea)
+        return len(nuevos)
+
+    def _procesar_linea(self, linea):
+        if self.leyendo_geometria is not None:
+            partes = linea.split()
+            try:
+                if len(partes) != 4:
+                    raise ValueError
+                self.leyendo_geometria.append(f"{partes[0]:<2} " + " ".join(f"{float(c):>12.6f}" for c in partes[1:]))
+            except ValueError:
+                if not self.leyendo_geometria and not linea.strip("- \t"):
+                    return
+                if self.leyendo_geometria:
+                    self.geometria = (f"{len(self.leyendo_geometria)}\nPaso {self.paso_optimizacion}\n"
+                                      + "\n".join(self.leyendo_geometria) + "\n")
+                self.leyendo_geometria = None
+            return
+
+        if self.en_scf:
+            coincidencia = PATRON_ITERACION_SCF.match(linea)
+            if coincidencia:
+                self.energias_scf.append(float(coincidencia.group(2)))
+                return
+
+        ciclo = PATRON_CICLO_OPTIMIZACION.search(linea)
+        energia_final = PATRON_ENERGIA_FINAL.match(linea)
+        if ciclo:
+            self.paso_optimizacion = int(ciclo.group(1))
+        elif linea.startswith("Iteration") and "Energy (Eh)" in linea:
+            # Al pasar a SOSCF ORCA repite la cabecera dentro del mismo SCF: solo se reinicia en un SCF nuevo
+            if self.scf_nuevo:
+                self.energias_scf = []
+                self.scf_nuevo = False
+            self.en_scf = True
+        elif PATRON_FIN_SCF.search(linea):
+            self.en_scf = False
+            self.scf_nuevo = True
+        elif linea.startswith("TOTAL SCF ENERGY"):
+            self.en_scf = False
+        elif energia_final:
+            self.energias_finales.append(float(energia_final.group(1)))
+            self.scf_nuevo = True
+        elif linea.startswith("Norm of the Cartesian gradient"):
+            self.normas_gradiente.append(float(linea.split()[-1]))
+        elif linea.startswith("CARTESIAN COORDINATES (ANGSTROEM)"):
+            self.leyendo_geometria = []
+        elif "THE OPTIMIZATION HAS CONVERGED" in linea:
+            self.convergida = True
+        elif "ORCA TERMINATED NORMALLY" in linea:
+            self.terminado = True
+
+    def estado(self):
+        return {
+            "paso_optimizacion": self.paso_optimizacion,
+            "iteracion_scf": len(self.energias_scf),
+            "energia_scf": self.energias_scf[-1] if self.energias_scf else None,
+            "energia_final": self.energias_finales[-1] if self.energias_finales else None,
+            "cambio_energia": (self.energias_finales[-1] - self.energias_finales[-2])
+            if len(self.energias_finales) > 1 else None,
+            "norma_gradiente": self.normas_gradiente[-1] if self.normas_gradiente else None,
+            "geometria": self.geometria,
+            "convergida": self.convergida,
+            "terminado": self.terminado,
+            "bytes_leidos": self.posicion
+        }
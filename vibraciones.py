@@ -0,0 +1,202 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from almacen import leer_seccion
+from constantes import AMU_KG, BOHR_A_ANGSTROM, C_LUZ_CM, HARTREE_J, ISOTOPOS
+from termoquimica import constantes_rotacionales, leer_hess
+
+# nu (cm^-1) = FACTOR_FRECUENCIA * sqrt(lambda), con lambda en Eh / (bohr^2 amu)
+FACTOR_FRECUENCIA = np.sqrt(HARTREE_J / AMU_KG) / (BOHR_A_ANGSTROM * 1e-10) / (2 * np.pi * C_LUZ_CM)
+# Intensidad IR (km/mol) por (e^2 / amu), con las derivadas del dipolo en unidades atomicas
+FACTOR_INTENSIDAD_IR = 974.8801
+
+PROYECCIONES = {
+    "traslacion_rotacion": "Traslación y rotación (Eckart)",
+    "traslacion": "Solo traslación",
+    "ninguna": "Sin proyección",
+}
+
+
+def _matriz_en_bloques(seccion):
+    # Formato de ORCA: dimensiones y bloques de 5 columnas, cada uno con una cabecera de indices
+    # y filas "indice v1 ... v5". Todo el texto se convierte de una vez y los bloques se recortan por posicion
+    _, dimensiones, cuerpo = seccion.split('\n', 2)
+    dimensiones = [int(d) for d in dimensiones.split()]
+    filas, columnas = dimensiones[0], dimensiones[-1]
+    valores = np.fromstring(cuerpo.split('\n#', 1)[0], sep=' ')
+
+    matriz = np.empty((filas, columnas))
+    posicion = 0
+    for inicio in range(0, columnas, 5):
+        k = min(5, columnas - inicio)
+        posicion += k
+        bloque = valores[posicion:posicion + filas * (k + 1)]
+        if len(bloque) != filas * (k + 1):
+            raise ValueError(f"Bloque {inicio // 5} incompleto en la seccion {seccion.split(chr(10), 1)[0]}")
+        matriz[:, inicio:inicio + k] = bloque.reshape(filas, k + 1)[:, 1:]
+        posicion += filas * (k + 1)
+    return matriz
+
+
+def leer_hessiana(ruta_hess):
+    datos = leer_hess(ruta_hess)
+    seccion = leer_seccion(ruta_hess, "hessian", exacto=True)
+    if not seccion or "masas" not in datos:
+        raise ValueError(f"{ruta_hess} no contiene las secciones $hessian y $atoms")
+    datos["hessiana"] = _matriz_en_bloques(seccion)
+
+    seccion = leer_seccion(ruta_hess, "dipole_derivatives", exacto=True)
+    if seccion:
+        _, n, cuerpo = seccion.split('\n', 2)
+        datos["derivadas_dipolo"] = np.fromstring(cuerpo.split('\n#', 1)[0], sep=' ')[:3 * int(n)].reshape(-1, 3)
+    return datos
+
+
+def interpretar_sustituciones(texto):
+    # "1:D, 2:D, 0:18O" -> {1: "D", 2: "D", 0: "18O"}; indices de atomo desde 0, como en ORCA.
+    # Tambien se admite una masa explicita en amu ("3:2.0141")
+    sustituciones = {}
+    for parte in texto.replace(';', ',').split(','):
+        if not parte.strip():
+            continue
+        indice, _, isotopo = parte.partition(':')
+        isotopo = isotopo.strip()
+        try:
+            isotopo = float(isotopo)
+        except ValueError:
+            pass
+        sustituciones[int(indice)] = isotopo
+    return sustituciones
+
+
+def masas_isotopologo(molecula, masas, sustituciones):
+    masas = np.array(masas, dtype=float)
+    for indice, isotopo in sustituciones.items():
+        if not 0 <= indice < len(masas):
+            raise ValueError(f"El atomo {indice} no existe (la molecula tiene {len(masas)} atomos)")
+        if isinstance(isotopo, (int, float)):
+            masas[indice] = float(isotopo)
+            continue
+        if isotopo not in ISOTOPOS:
+            raise ValueError(f"Isotopo desconocido: {isotopo}")
+        elemento, masa = ISOTOPOS[isotopo]
+        if molecula.elementos[indice] != elemento:
+            raise ValueError(f"{isotopo} no puede sustituir al atomo {indice} ({molecula.elementos[indice]})")
+        masas[indice] = masa
+    return masas
+
+
+def vectores_externos(masas, coordenadas_bohr, proyeccion="traslacion_rotacion"):
+    # Base ortonormal (en coordenadas ponderadas por masa) de las traslaciones y, si procede, rotaciones
+    raiz = np.sqrt(masas)
+    n = len(masas)
+    if proyeccion == "ninguna":
+        return np.zeros((3 * n, 0))
+
+    vectores = []
+    for eje in np.eye(3):
+        vectores.append((eje * raiz[:, None]).ravel())
+    if proyeccion == "traslacion_rotacion":
+        centro = coordenadas_bohr - (masas[:, None] * coordenadas_bohr).sum(axis=0) / masas.sum()
+        for eje in np.eye(3):
+            vectores.append((np.cross(eje, centro) * raiz[:, None]).ravel())
+
+    base, valores, _ = np.linalg.svd(np.array(vectores).T, full_matrices=False)
+    # En moleculas lineales una de las rotaciones es nula
+    return base[:, valores > 1e-6 * valores.max()]
+
+
+def analisis_vibracional(hessiana, masas, coordenadas_bohr, proyeccion="traslacion_rotacion", factor_escala=1.0,
+                         derivadas_dipolo=None):
+    if proyeccion not in PROYECCIONES:
+        raise ValueError(f"Proyeccion desconocida: {proyeccion}")
+    masas = np.asarray(masas, dtype=float)
+    raiz = np.repeat(np.sqrt(masas), 3)
+    ponderada = hessiana / np.outer(raiz, raiz)
+    ponderada = 0.5 * (ponderada + ponderada.T)
+
+    externos = vectores_externos(masas, np.asarray(coordenadas_bohr, dtype=float), proyeccion)
+    if externos.shape[1]:
+        proyector = np.eye(len(raiz)) - externos @ externos.T
+        ponderada = proyector @ ponderada @ proyector
+
+    valores, vectores = np.linalg.eigh(ponderada)
+    frecuencias = np.sign(valores) * np.sqrt(np.abs(valores)) * FACTOR_FRECUENCIA * factor_escala
+
+    # Los modos que viven en el espacio proyectado van primero y a cero, como en el .hess de ORCA
+    es_externo = np.zeros(len(valores), dtype=bool)
+    if externos.shape[1]:
+        es_externo[np.argsort(-((externos.T @ vectores) ** 2).sum(axis=0))[:externos.shape[1]]] = True
+    orden = np.concatenate([np.flatnonzero(es_externo), np.flatnonzero(~es_externo)])
+    frecuencias, vectores = np.where(es_externo, 0.0, frecuencias)[orden], vectores[:, orden]
+
+    # Desplazamientos cartesianos normalizados (la convencion de $normal_modes)
+    cartesianos = vectores / raiz[:, None]
+    normas = np.linalg.norm(cartesianos, axis=0)
+    modos = cartesianos / normas
+    modos[:, es_externo[orden]] = 0.0
+
+    resultado = {"frecuencias": frecuencias, "modos": modos, "masas": masas, "proyeccion": proyeccion,
+                 "num_externos": int(externos.shape[1])}
+    if derivadas_dipolo is not None:
+        # dmu/dQ = sum_i (dmu/dx_i) L_i / sqrt(m_i), con L los vectores propios ponderados por masa
+        transiciones = (vectores / raiz[:, None]).T @ derivadas_dipolo
+        transiciones[es_externo[orden]] = 0.0
+        resultado["transiciones"] = transiciones
+        resultado["intensidades"] = FACTOR_INTENSIDAD_IR * (transiciones ** 2).sum(axis=1)
+    return resultado
+
+
+def isotopologo(datos_hess, sustituciones=None, proyeccion="traslacion_rotacion", factor_escala=1.0):
+    molecula = datos_hess["molecula"]
+    masas = masas_isotopologo(molecula, datos_hess["masas"], sustituciones or {})
+    resultado = analisis_vibracional(datos_hess["hessiana"], masas, molecula.coordenadas / BOHR_A_ANGSTROM,
+                                     proyeccion, factor_escala, datos_hess.get("derivadas_dipolo"))
+    resultado["constantes_rot_cm"] = constantes_rotacionales(masas, molecula.coordenadas)
+    resultado["masa_amu"] = float(masas.sum())
+    return resultado
+
+
+def parametros_termoquimica_isotopologo(parametros, resultado):
+    # Mismos parametros que parametros_desde_orca, con las frecuencias y la inercia del isotopologo
+    return dict(parametros, frecuencias_cm=resultado["frecuencias"], constantes_rot_cm=resultado["constantes_rot_cm"],
+                masa_amu=resultado["masa_amu"])
+
+
+def tabla_isotopologo(referencia, sustituido):
+    vibracionales = np.flatnonzero(np.abs(referencia["frecuencias"]) > 0)
+    tabla = pd.DataFrame({
+        "Modo": vibracionales,
+        "Frecuencia original (cm⁻¹)": referencia["frecuencias"][vibracionales],
+        "Frecuencia isotopólogo (cm⁻¹)": sustituido["frecuencias"][vibracionales],
+    })
+    tabla["Desplazamiento (cm⁻¹)"] = tabla["Frecuencia isotopólogo (cm⁻¹)"] - tabla["Frecuencia original (cm⁻¹)"]
+    if "intensidades" in sustituido:
+        tabla["Intensidad isotopólogo (km/mol)"] = sustituido["intensidades"][vibracionales]
+    return tabla
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Frecuencias de isotopologos a partir de un archivo .hess de ORCA")
+    parser.add_argument("ruta_hess", help="Archivo .hess (o .hess.zst)")
+    parser.add_argument("--sustituir", default="", help="Sustituciones 'indice:isotopo', p. ej. '1:D,2:D'")
+    parser.add_argument("--proyeccion", choices=sorted(PROYECCIONES), default="traslacion_rotacion")
+    parser.add_argument("--escala", type=float, default=1.0, help="Factor de escala de las frecuencias")
+    args = parser.parse_args(argumentos)
+
+    datos = leer_hessiana(args.ruta_hess)
+    referencia = isotopologo(datos, proyeccion=args.proyeccion, factor_escala=args.escala)
+    try:
+        sustituido = isotopologo(datos, interpretar_sustituciones(args.sustituir), args.proyeccion, args.escala)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(tabla_isotopologo(referencia, sustituido).to_string(index=False, float_format="%.2f"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import base64
+import json
+import os
+
+import numpy as np
+
+from constantes import SIMBOLOS
+
+# Copia local de 3Dmol.js servida por Streamlit como archivo estatico (enableStaticServing); si no, el CDN.
+# En ambos casos es un <script src> que el navegador guarda en cache, no una copia por iframe
+RUTA_3DMOL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "3Dmol-min.js")
+URL_3DMOL = os.environ.get("ORCA_URL_3DMOL", "/app/static/3Dmol-min.js" if os.path.exists(RUTA_3DMOL)
+                           else "https://cdn.jsdelivr.net/npm/3dmol@2.4.0/build/3Dmol-min.js")
+
+# Nivel de detalle segun el numero de atomos: (maximo de atomos, estilo de 3Dmol)
+NIVELES_DETALLE = (
+    (int(os.environ.get("ORCA_LOD_ESFERAS", 500)), {"stick": {"radius": 0.15}, "sphere": {"radius": 0.3}}),
+    (int(os.environ.get("ORCA_LOD_VARILLAS", 3000)), {"stick": {"radius": 0.1}}),
+    (None, {"line": {}}),
+)
+# Por encima de este tamano se dibuja una version reducida mientras el usuario rota o hace zoom
+UMBRAL_DECIMACION = int(os.environ.get("ORCA_LOD_DECIMACION", 1500))
+ESTILO_INTERACCION = {"line": {}}
+
+SCRIPT_VISOR = """
+function decodificar(texto, Tipo) {
+  const binario = atob(texto);
+  const bytes = new Uint8Array(binario.length);
+  for (let i = 0; i < binario.length; i++) bytes[i] = binario.charCodeAt(i);
+  return new Tipo(bytes.buffer);
+}
+
+const indices = decodificar(datos.elementos, Uint8Array);
+const coordenadas = decodificar(datos.coordenadas, Float32Array);
+const desplazamiento = datos.desplazamiento ? decodificar(datos.desplazamiento, Float32Array) : null;
+
+function cuadro(fase) {
+  const lineas = [indices.length, ""];
+  for (let i = 0; i < indices.length; i++) {
+    const p = [0, 1, 2].map(k => coordenadas[3 * i + k] + (desplazamiento ? fase * desplazamiento[3 * i + k] : 0));
+    lineas.push(datos.simbolos[indices[i]] + " " + p.map(v => v.toFixed(4)).join(" "));
+  }
+  return lineas.join("\\n") + "\\n";
+}
+
+const contenedor = document.getElementById("visor");
+const visor = $3Dmol.createViewer(contenedor, {backgroundColor: datos.fondo});
+if (desplazamiento) {
+  const cuadros = [];
+  for (let c = 0; c < datos.cuadros; c++) cuadros.push(cuadro(Math.sin(2 * Math.PI * c / datos.cuadros)));
+  visor.addModelsAsFrames(cuadros.join(""), "xyz");
+  visor.animate({loop: "forward", interval: 50});
+} else {
+  visor.addModel(cuadro(0), "xyz");
+}
+visor.setStyle({}, datos.estilo);
+visor.zoomTo();
+visor.render();
+
+if (datos.estilo_interaccion) {
+  let reducido = false;
+  let temporizador = null;
+  const restaurar = () => {
+    reducido = false;
+    visor.setStyle({}, datos.estilo);
+    visor.render();
+  };
+  const reducir = () => {
+    if (!reducido) {
+      reducido = true;
+      visor.setStyle({}, datos.estilo_interaccion);
+      if (datos.ocultar_h) visor.setStyle({elem: "H"}, {});
+      visor.render();
+    }
+    clearTimeout(temporizador);
+    temporizador = setTimeout(restaurar, 300);
+  };
+  contenedor.addEventListener("pointerdown", reducir, true);
+  contenedor.addEventListener("wheel", reducir, true);
+  contenedor.addEventListener("pointermove", e => { if (e.buttons) reducir(); }, true);
+}
+"""
+
+
+def desplazamiento_modo_normal(modo, amplitud=0.5):
+    desplazamiento = np.asarray(modo, dtype=float).reshape(-1, 3)
+    maximo = np.linalg.norm(desplazamiento, axis=1).max()
+    if maximo > 0:
+        desplazamiento = desplazamiento * (amplitud / maximo)
+    return desplazamiento
+
+
+def estilo_por_tamano(num_atomos):
+    for maximo, estilo in NIVELES_DETALLE:
+        if maximo is None or num_atomos <= maximo:
+            return estilo
+
+
+def _base64(arreglo, tipo):
+    return base64.b64encode(np.ascontiguousarray(arreglo, dtype=tipo).tobytes()).decode("ascii")
+
+
+def html_visor_3d(molecula, ancho=450, alto=450, desplazamiento=None, num_cuadros=20, fondo="#F7F7F7"):
+    # Elementos como indices uint8 y coordenadas en float32: ~3 veces menos que el XYZ en texto.
+    # El HTML es determinista, asi que en cada rerun el navegador conserva el visor ya cargado
+    numeros, indices = np.unique(molecula.numeros_atomicos, return_inverse=True)
+    datos = {
+        "simbolos": [SIMBOLOS[z] for z in numeros],
+        "elementos": _base64(indices, np.uint8),
+        "coordenadas": _base64(molecula.coordenadas, "<f4"),
+        "estilo": estilo_por_tamano(molecula.num_atomos),
+        "fondo": fondo,
+    }
+    if molecula.num_atomos > UMBRAL_DECIMACION:
+        datos["estilo_interaccion"] = ESTILO_INTERACCION
+        datos["ocultar_h"] = molecula.num_atomos > 4 * UMBRAL_DECIMACION
+    if desplazamiento is not None:
+        # La animacion viaja como un solo vector de desplazamiento; los cuadros se generan en el navegador
+        datos["desplazamiento"] = _base64(desplazamiento, "<f4")
+        datos["cuadros"] = num_cuadros
+
+    return (f'<div id="visor" style="width: {ancho}px; height: {alto}px; position: relative;"></div>\n'
+            f'<script src="{URL_3DMOL}"></script>\n'
+            f'<script>\n(function () {{\nconst datos = {json.dumps(datos, sort_keys=True)};\n'
+            f'{SCRIPT_VISOR}}})();\n</script>\n')